@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Loja falsa local para benchmarks do Berserk Tracker.
+Serve as paginas gravadas em benchmarks/pages com latencia, jitter, cauda lenta
+e taxa de erro configuraveis, sem depender de acesso a rede.
+
+Rotas:
+    /panini/in-stock/<id>      Pagina Panini disponivel
+    /panini/out-of-stock/<id>  Pagina Panini indisponivel (productalert)
+    /panini/json-ld/<id>       Pagina Panini disponivel com oferta em JSON-LD
+    /amazon/in-stock/<id>      Pagina Amazon disponivel
+    /amazon/out-of-stock/<id>  Pagina Amazon indisponivel
+    /catalogsearch/result/?q=<busca>&p=<pagina>
+                               Listagem paginada com --catalog-size volumes
+    /missing/<id>              Erro 404
+    POST /graphql              API GraphQL do Magento (filtro por SKU); SKUs
+                               numericos multiplos de 5 estao disponiveis
+
+Uso:
+    python benchmarks/fake_store.py --port 8000 --latency 0.05 --jitter 0.02 --error-rate 0.01
+    python benchmarks/fake_store.py --port 8000 --slow-rate 0.05 --slow-latency 2
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+PAGES_DIR = Path(__file__).resolve().parent / "pages"
+
+ROUTES = {
+    "panini/in-stock": "panini_in_stock.html",
+    "panini/out-of-stock": "panini_out_of_stock.html",
+    "panini/json-ld": "panini_json_ld.html",
+    "amazon/in-stock": "amazon_in_stock.html",
+    "amazon/out-of-stock": "amazon_out_of_stock.html",
+}
+
+LISTING_PAGE_SIZE = 12
+
+
+def volume_in_stock(volume: int) -> bool:
+    """Regra de estoque da loja falsa: 1 em cada 5 volumes disponivel."""
+    return volume % 5 == 0
+
+
+LISTING_IN_STOCK = (
+    '<form data-role="tocart-form" action="/checkout/cart/add/" method="post">'
+    '<button type="submit" title="Comprar" class="action tocart primary"><span>Comprar</span></button></form>'
+)
+LISTING_OUT_OF_STOCK = '<div class="stock unavailable"><span>Fora de estoque</span></div>'
+
+
+def load_pages() -> dict[str, str]:
+    """Carrega o corpus de paginas gravadas."""
+    return {path.name: path.read_text(encoding="utf-8") for path in PAGES_DIR.glob("*.html")}
+
+
+class FakeStoreHandler(BaseHTTPRequestHandler):
+    """Handler que responde com paginas gravadas, simulando uma loja real."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, headers: dict = None, content_type: str = "text/html; charset=UTF-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        store = self.server
+        store.record_request()
+
+        delay = store.delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        if random.random() < store.error_rate:
+            self._send(503, store.pages["error_503.html"].encode("utf-8"))
+            return
+
+        if self.path.startswith("/catalogsearch/result/"):
+            self._send(200, self._listing().encode("utf-8"))
+            return
+
+        route, _, product_id = self.path.lstrip("/").rpartition("/")
+        page = ROUTES.get(route)
+        if page is None:
+            self._send(404, store.pages["error_404.html"].encode("utf-8"))
+            return
+
+        body = store.pages[page].replace("__SKU__", product_id).encode("utf-8")
+        if not store.conditional:
+            self._send(200, body)
+            return
+
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(200, body, {"ETag": etag})
+
+    def do_POST(self):
+        store = self.server
+        store.record_request()
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+
+        if self.path != "/graphql" or not store.graphql:
+            self._send(404, store.pages["error_404.html"].encode("utf-8"))
+            return
+
+        delay = store.delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        if random.random() < store.error_rate:
+            self._send(503, store.pages["error_503.html"].encode("utf-8"))
+            return
+
+        self._send(200, json.dumps(self._graphql(request)).encode("utf-8"), content_type="application/json")
+
+    def _graphql(self, request: dict) -> dict:
+        """Resposta no formato do Magento; SKUs nao numericos nao sao encontrados."""
+        items = []
+        for sku in (request.get("variables") or {}).get("skus") or []:
+            if not sku.isdigit():
+                continue
+            items.append(
+                {
+                    "sku": sku.upper(),
+                    "stock_status": "IN_STOCK" if volume_in_stock(int(sku)) else "OUT_OF_STOCK",
+                    "price_range": {"minimum_price": {"final_price": {"value": 79.9, "currency": "BRL"}}},
+                }
+            )
+        return {"data": {"products": {"items": items}}}
+
+    def _listing(self) -> str:
+        """Pagina de busca: 1 em cada 7 volumes sem selo de estoque (ambiguo)."""
+        store = self.server
+        params = parse_qs(urlsplit(self.path).query)
+        query = params.get("q", [""])[0]
+        page = int(params.get("p", ["1"])[0])
+        pages = max(1, -(-store.catalog_size // LISTING_PAGE_SIZE))
+
+        first = (page - 1) * LISTING_PAGE_SIZE + 1
+        last = min(store.catalog_size, page * LISTING_PAGE_SIZE)
+        items = []
+        for volume in range(first, last + 1):
+            route = "in-stock" if volume_in_stock(volume) else "out-of-stock"
+            if volume % 7 == 0:
+                stock = ""
+            elif volume_in_stock(volume):
+                stock = LISTING_IN_STOCK
+            else:
+                stock = LISTING_OUT_OF_STOCK
+            items.append(
+                store.pages["panini_listing_item.html"]
+                .replace("__BASE__", store.base_url)
+                .replace("__ROUTE__", route)
+                .replace("__SKU__", f"{volume:03d}")
+                .replace("__STOCK__", stock)
+            )
+
+        pager = ""
+        if page < pages:
+            pager = (
+                f'<li class="item pages-item-next"><a class="action next" '
+                f'href="/catalogsearch/result/?q={quote_plus(query)}&amp;p={page + 1}"><span>Proxima</span></a></li>'
+            )
+
+        return (
+            store.pages["panini_listing.html"]
+            .replace("__QUERY__", html.escape(query))
+            .replace("__FIRST__", str(first))
+            .replace("__LAST__", str(last))
+            .replace("__TOTAL__", str(store.catalog_size))
+            .replace("__ITEMS__", "\n".join(items))
+            .replace("__PAGER__", pager)
+        )
+
+
+class FakeStoreServer(ThreadingHTTPServer):
+    """Servidor HTTP multithread da loja falsa."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        conditional=True,
+        catalog_size: int = 40,
+        graphql: bool = True,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+    ):
+        super().__init__(("127.0.0.1", port), FakeStoreHandler)
+        self.pages = load_pages()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.conditional = conditional
+        self.catalog_size = catalog_size
+        self.graphql = graphql
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def delay(self) -> float:
+        """Latencia da proxima resposta: base com jitter, mais `slow_latency` em uma fracao `slow_rate`."""
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay += self.slow_latency
+        return delay
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> "FakeStoreServer":
+        """Inicia o servidor em uma thread separada."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loja falsa local para benchmarks")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia base por resposta (segundos)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variacao maxima da latencia (segundos)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracao de respostas 503 (0 a 1)")
+    parser.add_argument("--no-conditional", action="store_true", help="Desativa ETag/304")
+    parser.add_argument("--catalog-size", type=int, default=40, help="Volumes na listagem de busca")
+    parser.add_argument("--no-graphql", action="store_true", help="Desativa a API GraphQL (404)")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fracao de respostas lentas (0 a 1)")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="Atraso extra das respostas lentas (segundos)")
+    args = parser.parse_args()
+
+    server = FakeStoreServer(
+        args.port,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        not args.no_conditional,
+        args.catalog_size,
+        not args.no_graphql,
+        args.slow_rate,
+        args.slow_latency,
+    )
+    print(f"Loja falsa em {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,599 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks offline do Berserk Tracker.
+Usa as paginas gravadas em benchmarks/pages e a loja falsa local
+(benchmarks/fake_store.py), sem acesso a rede.
+
+Mede:
+    - parse: deteccao de disponibilidade sobre o corpus, por loja/pagina
+    - fetch: check_panini_availability contra a loja falsa
+    - cycle: check_all_products com 10/100/1000 produtos (ciclo frio, com cache e
+      pela API GraphQL em lote)
+    - catalog: check_catalog sobre a listagem da loja falsa vs. um request por volume
+    - memory: RSS ao fim de cada ciclo com milhares de produtos, com LOW_MEMORY e com
+      os caches completos em memoria
+    - cold_start: processo novo com `import berserk_tracker` e com `--once --dry-run`
+      sobre 10 produtos (o custo de cada execucao de um timer do systemd)
+    - parse_pool: ciclo frio de paginas disponiveis com parse na thread e no pool
+      de processos (PARSE_WORKERS), com /live consultado a cada 10ms durante o ciclo
+    - tail: ciclos contra uma loja com cauda lenta (3% das respostas +1s), sem
+      protecao, com hedging e com hedging e prazo do ciclo (CYCLE_DEADLINE)
+    - events: latencia entre a publicacao de um evento e a chegada a clientes SSE
+      conectados em /events
+    - subscribers: muitos assinantes com listas sobrepostas (SUBSCRIBERS_FILE): um
+      ciclo com uma requisicao por URL unica vs. uma verificacao por assinante
+
+Reporta tempo de parede do ciclo, percentis de latencia por fase e RSS.
+
+Uso:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 10,100 --latency 0.05 --jitter 0.02 --json bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import berserk_tracker as bt  # noqa: E402
+from fake_store import FakeStoreServer, load_pages, volume_in_stock  # noqa: E402
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99 em milissegundos."""
+    if not samples:
+        return {"count": 0}
+    if len(samples) == 1:
+        value = samples[0] * 1000
+        return {"count": 1, "p50_ms": value, "p95_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+def rss_mb() -> dict:
+    """RSS atual (de /proc) e pico do processo, em MB."""
+    current = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"rss_mb": current, "peak_rss_mb": peak}
+
+
+def reset_state(data_dir: Path):
+    """Limpa cache e estado persistido entre cenarios."""
+    bt.state_store.close()
+    for path in data_dir.iterdir():
+        path.unlink()
+    bt.state_store = bt.StateStore()
+    bt.response_cache = bt.ResponseCache()
+    bt.price_tracker = bt.PriceTracker(bt.PRICE_HISTORY_SIZE)
+    bt.memory_monitor = bt.MemoryMonitor(0)
+
+
+def bench_parse(iterations: int) -> list[dict]:
+    """Deteccao sobre o corpus, sem rede: stream + analise da loja."""
+    pages = load_pages()
+    cases = [
+        ("panini", "panini_in_stock.html"),
+        ("panini", "panini_out_of_stock.html"),
+        ("panini", "panini_json_ld.html"),
+        ("amazon", "amazon_in_stock.html"),
+        ("amazon", "amazon_out_of_stock.html"),
+    ]
+    report = []
+
+    for store, page in cases:
+        checker = bt.STORE_CHECKERS[store]
+        body = pages[page].replace("__SKU__", "040").encode("utf-8")
+        samples = []
+        result = None
+
+        for _ in range(iterations):
+            started = time.perf_counter()
+            detector = bt.AvailabilityDetector(checker.stream_markers)
+            for offset in range(0, len(body), bt.STREAM_CHUNK_SIZE):
+                if detector.feed(body[offset : offset + bt.STREAM_CHUNK_SIZE]):
+                    break
+            result = (False, None) if detector.out_of_stock else checker.check_body(bytes(detector.body), "utf-8")
+            samples.append(time.perf_counter() - started)
+
+        report.append({"store": store, "page": page, "result": list(result), **percentiles(samples)})
+    return report
+
+
+def bench_fetch(store: FakeStoreServer, data_dir: Path, iterations: int) -> dict:
+    """check_panini_availability contra a loja falsa (conexao keep-alive, sem cache)."""
+    samples = []
+    for i in range(iterations):
+        reset_state(data_dir)
+        route = "in-stock" if i % 2 else "out-of-stock"
+        started = time.perf_counter()
+        bt.check_panini_availability(f"{store.base_url}/panini/{route}/{i}")
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def bench_cycle(store: FakeStoreServer, data_dir: Path, size: int) -> dict:
+    """check_all_products com `size` produtos: ciclo frio e com cache pelas paginas, e pela API em lote."""
+    reset_state(data_dir)
+
+    # 1 em cada 5 produtos disponivel, o resto indisponivel
+    bt.PRODUCTS = [
+        bt.Product(
+            name=f"Berserk Vol. {i}",
+            url=f"{store.base_url}/panini/{'in-stock' if volume_in_stock(i) else 'out-of-stock'}/{i}",
+        )
+        for i in range(size)
+    ]
+
+    captured = []
+    run_checks = bt.run_checks
+
+    def capture(products):
+        results = run_checks(products)
+        captured.extend(results)
+        return results
+
+    bt.run_checks = capture
+    report = {"products": size}
+    try:
+        for label in ("cold", "warm", "batch"):
+            bt.PANINI_GRAPHQL_URL = store.base_url + "/graphql" if label == "batch" else ""
+            captured.clear()
+            requests_before = store.requests
+            started = time.perf_counter()
+            bt.check_all_products()
+            wall = time.perf_counter() - started
+
+            report[label] = {
+                "wall_s": wall,
+                "store_requests": store.requests - requests_before,
+                "total": percentiles([r.elapsed for r in captured]),
+                "fetch": percentiles([r.timings["fetch"] for r in captured if "fetch" in r.timings]),
+                "parse": percentiles([r.timings["parse"] for r in captured if "parse" in r.timings]),
+                **rss_mb(),
+            }
+    finally:
+        bt.run_checks = run_checks
+        bt.PANINI_GRAPHQL_URL = ""
+    return report
+
+
+def bench_catalog(store: FakeStoreServer, data_dir: Path) -> dict:
+    """Modo catalogo sobre a listagem da loja falsa, comparado com um request por volume."""
+    reset_state(data_dir)
+    bt.PRODUCTS = []
+    bt.CATALOG_QUERIES = ["berserk edicao de luxo"]
+    bt.CATALOG_SEARCH_URL = store.base_url + "/catalogsearch/result/?q={query}&p={page}"
+
+    requests_before = store.requests
+    started = time.perf_counter()
+    results = bt.check_catalog(bt.AdaptiveScheduler([]))
+    catalog = {"wall_s": time.perf_counter() - started, "store_requests": store.requests - requests_before}
+
+    reset_state(data_dir)
+    requests_before = store.requests
+    started = time.perf_counter()
+    bt.check_all_products()
+    per_product = {"wall_s": time.perf_counter() - started, "store_requests": store.requests - requests_before}
+
+    return {"volumes": len(results), "catalog": catalog, "per_product": per_product}
+
+
+def bench_memory(store: FakeStoreServer, data_dir: Path, size: int, cycles: int) -> dict:
+    """RSS no fim de cada ciclo com `size` produtos: LOW_MEMORY (deve ficar estavel) e caches completos."""
+    bt.PRODUCTS = [
+        bt.Product(
+            name=f"Berserk Vol. {i}",
+            url=f"{store.base_url}/panini/{'in-stock' if volume_in_stock(i) else 'out-of-stock'}/{i}",
+        )
+        for i in range(size)
+    ]
+    report = {"products": size}
+    try:
+        # LOW_MEMORY primeiro: memoria liberada por um cenario anterior mascararia o crescimento
+        for label, low_memory in (("low_memory", True), ("default", False)):
+            bt.LOW_MEMORY = low_memory
+            reset_state(data_dir)
+            started = time.perf_counter()
+            for _ in range(cycles):
+                bt.check_all_products()
+            rss = [cycle["rss_mb"] or 0 for cycle in bt.memory_monitor.cycles]
+            report[label] = {
+                "wall_s": time.perf_counter() - started,
+                "rss_mb": rss,
+                "growth_mb": rss[-1] - rss[0],
+                "cache_entries": bt.memory_monitor.report()["cache_entries"],
+            }
+    finally:
+        bt.LOW_MEMORY = False
+    return report
+
+
+def bench_cold_start(store: FakeStoreServer, runs: int) -> dict:
+    """Partida a frio em processos novos: interpretador vazio, import do modulo e uma passada --once."""
+    script = Path(bt.__file__).resolve()
+    work_dir = Path(tempfile.mkdtemp(prefix="berserk-once-"))
+    products_file = work_dir / "products.json"
+    products = []
+    for i in range(1, 11):
+        status = "in-stock" if volume_in_stock(i) else "out-of-stock"
+        products.append({"name": f"Berserk Vol. {i}", "url": f"{store.base_url}/panini/{status}/{i}"})
+    products_file.write_text(json.dumps(products))
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(script.parent),
+        "PRODUCTS_FILE": str(products_file),
+        "NOTIFICATION_SERVICE": "none",
+        "RATE_LIMIT_PER_HOST": "0",
+        "PANINI_GRAPHQL_URL": "",
+        "WORKERS": "1",
+    }
+    env.pop("WORKER_INDEX", None)
+
+    commands = {
+        "python": [sys.executable, "-c", "pass"],
+        "import": [sys.executable, "-c", "import berserk_tracker"],
+        "once": [sys.executable, str(script), "--once", "--dry-run"],
+    }
+    samples = {label: [] for label in commands}
+    exit_code = None
+    for _ in range(runs):
+        for label, command in commands.items():
+            started = time.perf_counter()
+            completed = subprocess.run(command, cwd=work_dir, env=env, capture_output=True)
+            samples[label].append(time.perf_counter() - started)
+            if label == "once":
+                exit_code = completed.returncode
+
+    return {
+        "products": len(products),
+        "exit_code": exit_code,
+        **{label: percentiles(values) for label, values in samples.items()},
+        # Pico de RSS entre os processos filhos (o maior e o --once)
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def probe_health(url: str, samples: list[float], done: threading.Event):
+    """Consulta o health check a cada 10ms ate `done`, guardando a latencia de cada resposta."""
+    while not done.is_set():
+        started = time.perf_counter()
+        with urllib.request.urlopen(url, timeout=5) as response:
+            response.read()
+        samples.append(time.perf_counter() - started)
+        done.wait(0.01)
+
+
+def bench_parse_pool(store: FakeStoreServer, data_dir: Path, size: int, workers: int) -> dict:
+    """Ciclo frio com parse completo de cada pagina: parse na thread vs. pool de processos, medindo o /live."""
+    bt.PRODUCTS = [
+        bt.Product(name=f"Berserk Vol. {i}", url=f"{store.base_url}/panini/in-stock/{i}") for i in range(size)
+    ]
+    server = bt.HealthServer(("127.0.0.1", 0), bt.HealthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    probe_url = f"http://127.0.0.1:{server.server_address[1]}/live"
+
+    report = {"products": size, "workers": workers}
+    try:
+        for label, count in (("inline", 0), ("pool", workers)):
+            reset_state(data_dir)
+            if count:
+                bt.parse_pool = bt.ParsePool(count, 2 * count, bt.PARSE_SLOT_SIZE)
+                bt.parse_pool.warm_up()
+            probes = []
+            done = threading.Event()
+            prober = threading.Thread(target=probe_health, args=(probe_url, probes, done))
+            prober.start()
+            started = time.perf_counter()
+            try:
+                bt.check_all_products()
+            finally:
+                wall = time.perf_counter() - started
+                done.set()
+                prober.join()
+                if bt.parse_pool is not None:
+                    bt.parse_pool.shutdown()
+                    bt.parse_pool = None
+            report[label] = {"wall_s": wall, "probe": percentiles(probes), **rss_mb()}
+    finally:
+        server.shutdown()
+        server.server_close()
+    return report
+
+
+def bench_tail(size: int, cycles: int, deadline: float) -> dict:
+    """Tempo de parede por ciclo contra uma loja com cauda lenta: sem protecao, com hedging e com prazo."""
+    store = FakeStoreServer(latency=0.02, jitter=0.01, slow_rate=0.03, slow_latency=1.0).start()
+    bt.PRODUCTS = [
+        bt.Product(
+            name=f"Berserk Vol. {i}",
+            url=f"{store.base_url}/panini/{'in-stock' if volume_in_stock(i) else 'out-of-stock'}/{i}",
+        )
+        for i in range(size)
+    ]
+    report = {"products": size, "cycles": cycles, "deadline_s": deadline}
+    try:
+        for label, hedge, cycle_deadline in (("baseline", False, 0), ("hedge", True, 0), ("hedge_deadline", True, deadline)):
+            bt.HEDGE_REQUESTS = hedge
+            bt.CYCLE_DEADLINE = cycle_deadline
+            bt.host_latency = bt.HostLatency(bt.HEDGE_WINDOW, bt.HEDGE_PERCENTILE, bt.HEDGE_MIN_SAMPLES)
+            walls = []
+            unknown = 0
+            requests_before = store.requests
+            for _ in range(cycles):
+                started = time.perf_counter()
+                results = bt.run_checks(bt.PRODUCTS)
+                walls.append(time.perf_counter() - started)
+                unknown += sum(result.available is None for result in results)
+            report[label] = {
+                "wall": percentiles(walls),
+                "unknown": unknown,
+                "extra_requests": store.requests - requests_before - size * cycles + unknown,
+            }
+    finally:
+        bt.HEDGE_REQUESTS = False
+        bt.CYCLE_DEADLINE = 0
+        store.shutdown()
+    return report
+
+
+def read_sse(url: str, expected: int, arrivals: list[float], ready: threading.Barrier):
+    """Cliente SSE: registra o atraso de cada evento recebido ate `expected` eventos."""
+    request = urllib.request.Request(url, headers={"Accept": "text/event-stream"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        ready.wait()
+        received = 0
+        for line in response:
+            if line.startswith(b"data: "):
+                arrivals.append(time.time() - json.loads(line[6:])["published_at"])
+                received += 1
+                if received == expected:
+                    return
+
+
+def bench_events(clients: int, events: int) -> dict:
+    """Publica `events` eventos com `clients` clientes SSE conectados e mede o atraso ate cada cliente."""
+    server = bt.HealthServer(("127.0.0.1", 0), bt.HealthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bt.event_log = bt.EventLog(bt.EVENTS_BUFFER_SIZE, clients)
+    url = f"http://127.0.0.1:{server.server_address[1]}/events"
+
+    arrivals: list[float] = []
+    ready = threading.Barrier(clients + 1)
+    readers = [
+        threading.Thread(target=read_sse, args=(url, events, arrivals, ready), daemon=True) for _ in range(clients)
+    ]
+    for reader in readers:
+        reader.start()
+    try:
+        ready.wait(timeout=10)
+        for i in range(events):
+            bt.event_log.publish("availability", {"product": f"Berserk Vol. {i}", "published_at": time.time()})
+            time.sleep(0.01)
+        for reader in readers:
+            reader.join(timeout=10)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {"clients": clients, "events": events, "delivered": len(arrivals), "latency": percentiles(arrivals)}
+
+
+def bench_subscribers(store: FakeStoreServer, data_dir: Path, subscribers: int, watchlist: int, catalog: int) -> dict:
+    """
+    `subscribers` assinantes, cada um com `watchlist` produtos sorteados de um
+    catalogo de `catalog` volumes (os primeiros volumes sao mais populares).
+    Compara o ciclo deduplicado com uma verificacao por assinante.
+    """
+    reset_state(data_dir)
+    random.seed(42)
+    urls = [
+        f"{store.base_url}/panini/{'in-stock' if volume_in_stock(i) else 'out-of-stock'}/{i}" for i in range(catalog)
+    ]
+    weights = [1 / (i + 1) for i in range(catalog)]
+    rows = []
+    for n in range(subscribers):
+        picks = set()
+        while len(picks) < min(watchlist, catalog):
+            picks.add(random.choices(urls, weights)[0])
+        rows.append({"name": f"assinante-{n}", "notify": "none", "products": sorted(picks)})
+    path = data_dir / "subscribers.json"
+    path.write_text(json.dumps({"subscribers": rows}))
+
+    bt.PRODUCTS = []
+    bt.subscriber_registry = bt.SubscriberRegistry(str(path))
+    delivered_before = bt.notification_dispatcher.delivered
+    try:
+        bt.build_scheduler()
+        unique = len(bt.subscriber_registry.index)
+        requests_before = store.requests
+        started = time.perf_counter()
+        bt.check_products(list(bt.PRODUCTS))
+        dedup = {"wall_s": time.perf_counter() - started, "store_requests": store.requests - requests_before}
+        bt.notification_dispatcher.flush(30)
+        dedup["notifications"] = bt.notification_dispatcher.delivered - delivered_before
+
+        # Referencia: cada assinante verifica a propria lista
+        requests_before = store.requests
+        started = time.perf_counter()
+        for subscriber in bt.subscriber_registry.subscribers.values():
+            bt.run_checks([bt.subscriber_registry.products[url] for url in subscriber.urls])
+        naive = {"wall_s": time.perf_counter() - started, "store_requests": store.requests - requests_before}
+    finally:
+        bt.subscriber_registry = None
+        bt.PRODUCTS = []
+    return {
+        "subscribers": subscribers,
+        "watchlist": watchlist,
+        "unique_products": unique,
+        "dedup": dedup,
+        "per_subscriber": naive,
+    }
+
+
+def format_phase(name: str, stats: dict) -> str:
+    if not stats.get("count"):
+        return f"      {name:<6} -"
+    return (
+        f"      {name:<6} n={stats['count']:<5} p50={stats['p50_ms']:8.2f}ms "
+        f"p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do Berserk Tracker")
+    parser.add_argument("--sizes", default="10,100,1000", help="Numero de produtos por ciclo (separados por virgula)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latencia da loja falsa (segundos)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Jitter da loja falsa (segundos)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracao de respostas 503")
+    parser.add_argument("--concurrency", type=int, default=bt.MAX_CONCURRENCY, help="MAX_CONCURRENCY do tracker")
+    parser.add_argument("--rate", type=float, default=0.0, help="Limite por host (req/s, 0 = sem limite)")
+    parser.add_argument("--iterations", type=int, default=50, help="Repeticoes dos benchmarks de parse e fetch")
+    parser.add_argument("--memory-size", type=int, default=1000, help="Produtos do benchmark de memoria")
+    parser.add_argument("--memory-cycles", type=int, default=5, help="Ciclos do benchmark de memoria")
+    parser.add_argument("--cold-runs", type=int, default=5, help="Processos novos por medida de partida a frio")
+    parser.add_argument("--parse-pool-size", type=int, default=200, help="Produtos do benchmark do pool de parse")
+    parser.add_argument("--parse-workers", type=int, default=2, help="Processos do benchmark do pool de parse")
+    parser.add_argument("--tail-size", type=int, default=100, help="Produtos do benchmark de cauda lenta")
+    parser.add_argument("--tail-cycles", type=int, default=10, help="Ciclos de cada cenario de cauda lenta")
+    parser.add_argument("--tail-deadline", type=float, default=1.0, help="CYCLE_DEADLINE do cenario com prazo")
+    parser.add_argument("--event-clients", type=int, default=16, help="Clientes SSE do benchmark de eventos")
+    parser.add_argument("--events", type=int, default=100, help="Eventos publicados no benchmark de eventos")
+    parser.add_argument("--subscribers", type=int, default=200, help="Assinantes do benchmark de assinantes")
+    parser.add_argument("--watchlist", type=int, default=10, help="Produtos na lista de cada assinante")
+    parser.add_argument("--subscriber-catalog", type=int, default=100, help="Volumes de onde as listas sao sorteadas")
+    parser.add_argument("--json", help="Grava o relatorio em JSON neste arquivo")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    data_dir = Path(tempfile.mkdtemp(prefix="berserk-bench-"))
+    bt.get_data_path = lambda: data_dir
+    bt.NOTIFICATION_SERVICE = "none"
+    bt.PANINI_GRAPHQL_URL = ""
+    bt.MAX_CONCURRENCY = args.concurrency
+    bt.rate_limiter = bt.HostRateLimiter(args.rate, max(1, args.concurrency))
+    # Com hedging, cada verificacao pode ter duas conexoes abertas
+    bt.http_client = bt.HttpClient(
+        bt.HTTP_POOL_CONNECTIONS, max(2 * args.concurrency, 4), (bt.HTTP_CONNECT_TIMEOUT, bt.HTTP_READ_TIMEOUT)
+    )
+
+    store = FakeStoreServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+
+    report = {
+        "config": {**vars(args), "parser_backend": bt.parser_backend},
+        "parse": bench_parse(args.iterations),
+        "fetch": bench_fetch(store, data_dir, args.iterations),
+        "cycles": [bench_cycle(store, data_dir, int(size)) for size in args.sizes.split(",")],
+        "catalog": bench_catalog(store, data_dir),
+        "memory": bench_memory(store, data_dir, args.memory_size, args.memory_cycles),
+        "cold_start": bench_cold_start(store, args.cold_runs),
+        "parse_pool": bench_parse_pool(store, data_dir, args.parse_pool_size, args.parse_workers),
+        "tail": bench_tail(args.tail_size, args.tail_cycles, args.tail_deadline),
+        "events": bench_events(args.event_clients, args.events),
+        "subscribers": bench_subscribers(store, data_dir, args.subscribers, args.watchlist, args.subscriber_catalog),
+        "http": bt.http_client.stats.to_dict(),
+    }
+    store.shutdown()
+
+    print(f"Backend de parse: {bt.parser_backend} | concorrencia: {args.concurrency} | limite: {args.rate or '-'} req/s")
+    print("\nParse (corpus, sem rede)")
+    for entry in report["parse"]:
+        print(format_phase(entry["store"], entry) + f"  {entry['page']} -> {entry['result']}")
+
+    print("\nFetch (check_panini_availability, loja falsa)")
+    print(format_phase("total", report["fetch"]))
+
+    print("\nCiclos (check_all_products)")
+    for cycle in report["cycles"]:
+        for label in ("cold", "warm", "batch"):
+            data = cycle[label]
+            print(
+                f"  {cycle['products']:>5} produtos [{label}] parede={data['wall_s']:.2f}s "
+                f"requisicoes={data['store_requests']} rss={data['rss_mb'] or 0:.1f}MB pico={data['peak_rss_mb']:.1f}MB"
+            )
+            for phase in ("total", "fetch", "parse"):
+                print(format_phase(phase, data[phase]))
+
+    catalog = report["catalog"]
+    print(f"\nCatalogo ({catalog['volumes']} volumes)")
+    for label in ("catalog", "per_product"):
+        data = catalog[label]
+        print(f"  {label:<12} parede={data['wall_s']:.2f}s requisicoes={data['store_requests']}")
+
+    memory = report["memory"]
+    print(f"\nMemoria ({memory['products']} produtos)")
+    for label in ("low_memory", "default"):
+        data = memory[label]
+        rss = " ".join(f"{value:.1f}" for value in data["rss_mb"])
+        print(
+            f"  {label:<12} parede={data['wall_s']:.2f}s rss por ciclo={rss} MB "
+            f"crescimento={data['growth_mb']:+.1f}MB caches={data['cache_entries']}"
+        )
+
+    cold = report["cold_start"]
+    print(
+        f"\nPartida a frio ({cold['products']} produtos, codigo de saida {cold['exit_code']}, "
+        f"pico={cold['peak_rss_mb']:.1f}MB)"
+    )
+    for label in ("python", "import", "once"):
+        print(format_phase(label, cold[label]))
+
+    pool = report["parse_pool"]
+    print(f"\nPool de parse ({pool['products']} paginas disponiveis, {pool['workers']} processos)")
+    for label in ("inline", "pool"):
+        data = pool[label]
+        print(f"  {label:<12} parede={data['wall_s']:.2f}s rss={data['rss_mb'] or 0:.1f}MB")
+        print(format_phase("live", data["probe"]))
+
+    tail = report["tail"]
+    print(f"\nCauda lenta ({tail['products']} produtos, {tail['cycles']} ciclos, prazo {tail['deadline_s']}s)")
+    for label in ("baseline", "hedge", "hedge_deadline"):
+        data = tail[label]
+        print(f"  {label:<14} desconhecidos={data['unknown']} requisicoes extras={data['extra_requests']}")
+        print(format_phase("ciclo", data["wall"]))
+
+    events = report["events"]
+    print(f"\nEventos SSE ({events['clients']} clientes, {events['events']} eventos, {events['delivered']} entregas)")
+    print(format_phase("atraso", events["latency"]))
+
+    subs = report["subscribers"]
+    print(
+        f"\nAssinantes ({subs['subscribers']} assinantes, {subs['watchlist']} produtos cada, "
+        f"{subs['unique_products']} URLs unicas, {subs['dedup']['notifications']} avisos)"
+    )
+    for label in ("dedup", "per_subscriber"):
+        data = subs[label]
+        print(f"  {label:<14} parede={data['wall_s']:.2f}s requisicoes={data['store_requests']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRelatorio gravado em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,32 +7,99 @@ Inclui servidor HTTP para health check.
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+import importlib.util
+import argparse
+import atexit
 import time
 from datetime import datetime
 import logging
 import json
+import csv
+import codecs
+import hashlib
+import hmac
+import functools
+import gc
+import sqlite3
+import html
+import re
+import unicodedata
 from pathlib import Path
 import os
+import socket
+import sys
+import signal
+import subprocess
 from dataclasses import dataclass, field
-from typing import Optional
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Iterable, Iterator, Optional
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, quote_plus, urljoin, urlsplit
 import threading
+import bisect
+import queue
+import heapq
+import itertools
+import random
+from array import array
+from collections import defaultdict, deque
+
+
+# Backends de parse opcionais (mais rapidos que html.parser). Assim como bs4,
+# soupsieve e PyYAML, sao importados apenas no primeiro uso: o modo --once
+# nao paga o custo de importacao de modulos que nao vai usar
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+selectolax_available = _module_available("selectolax.lexbor")
+lxml_available = _module_available("lxml")
 
 # Configuracao de logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", handlers=[logging.StreamHandler()])
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# Registros com __slots__: sem __dict__ por instancia, milhares de produtos e
+# resultados por ciclo ocupam bem menos memoria
+@dataclass(slots=True)
 class Product:
     """Representa um produto a ser monitorado."""
 
     name: str
     url: str
+    store: str = "panini"
+    # Prioridade > 1 verifica com mais frequencia, < 1 com menos
+    priority: float = 1.0
+    # Data de lancamento (AAAA-MM-DD); perto dela o produto e verificado no intervalo minimo
+    release_date: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
+class CheckResult:
+    """
+    Resultado da verificacao de um produto. available=None indica resultado
+    desconhecido (erro de rede ou circuito aberto), que nao altera o estado.
+    """
+
+    product: Product
+    available: Optional[bool]
+    price: Optional[str]
+    elapsed: float
+    timings: dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    # Verificacao adiada (disjuntor ou prazo do ciclo): nova tentativa apos estes segundos, sem backoff de erro
+    retry_after: Optional[float] = None
+
+
+@dataclass(slots=True)
 class HealthStatus:
     """Status da aplicacao para health check."""
 
@@ -52,6 +119,17 @@ class HealthStatus:
             "total_checks": self.total_checks,
             "total_errors": self.total_errors,
             "products_available": self.products_available,
+            "notifications": {
+                "queued": notification_dispatcher.queue.qsize(),
+                "delivered": notification_dispatcher.delivered,
+                "failed": notification_dispatcher.failed,
+            },
+            "http": http_client.stats.to_dict(),
+            "cache": response_cache.stats(),
+            "circuits": circuit_breakers.status(),
+            **({"workers": supervisor.status()} if supervisor is not None else {}),
+            **({"parse_pool": parse_pool.status()} if parse_pool is not None else {}),
+            **({"subscribers": subscriber_registry.status()} if subscriber_registry is not None else {}),
             "uptime_seconds": (datetime.now() - datetime.fromisoformat(self.started_at)).total_seconds(),
         }
 
@@ -68,13 +146,218 @@ health_status = HealthStatus()
 # Padrao: 3600 = 1 hora
 CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", "3600"))
 
+# Limites do intervalo adaptativo por produto (em segundos)
+# Produtos que mudam com frequencia se aproximam do minimo; estaveis, do maximo
+MIN_CHECK_INTERVAL = int(os.getenv("MIN_CHECK_INTERVAL", str(max(60, CHECK_INTERVAL // 4))))
+MAX_CHECK_INTERVAL = int(os.getenv("MAX_CHECK_INTERVAL", str(CHECK_INTERVAL * 4)))
+
+# Variacao aleatoria aplicada a cada agendamento (fracao do intervalo)
+SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER", "0.1"))
+
+# Backoff exponencial apos erros: espera inicial e maxima (em segundos)
+ERROR_BACKOFF_BASE = int(os.getenv("ERROR_BACKOFF_BASE", "60"))
+ERROR_BACKOFF_MAX = int(os.getenv("ERROR_BACKOFF_MAX", "3600"))
+
+# Dias antes/depois de release_date em que o produto usa o intervalo minimo
+RELEASE_WINDOW_DAYS = int(os.getenv("RELEASE_WINDOW_DAYS", "7"))
+
+# Arquivo externo de produtos (JSON, YAML ou CSV). Se definido, substitui a
+# lista PRODUCTS e e recarregado a quente quando muda
+PRODUCTS_FILE = os.getenv("PRODUCTS_FILE", "")
+
+# Intervalo entre verificacoes do mtime do arquivo de produtos (em segundos)
+PRODUCTS_RELOAD_INTERVAL = float(os.getenv("PRODUCTS_RELOAD_INTERVAL", "10"))
+
+# Arquivo de assinantes (JSON ou YAML): cada um com sua lista de produtos e seu
+# canal de notificacao. Cada URL e verificada uma vez por ciclo, nao importa
+# quantos assinantes a acompanham. Recarregado a quente como o de produtos
+SUBSCRIBERS_FILE = os.getenv("SUBSCRIBERS_FILE", "")
+
+# Modo catalogo: buscas na loja (separadas por ';') cujos volumes sao
+# descobertos e verificados pela pagina de listagem, ex.: 'berserk edicao de luxo'
+CATALOG_QUERIES = [q.strip() for q in os.getenv("CATALOG_QUERIES", "").split(";") if q.strip()]
+
+# URL de busca da Panini ({query} e {page} sao substituidos)
+CATALOG_SEARCH_URL = os.getenv("CATALOG_SEARCH_URL", "https://panini.com.br/catalogsearch/result/?q={query}&p={page}")
+
+# Paginas de resultado lidas por busca e intervalo entre varreduras do catalogo (segundos)
+CATALOG_MAX_PAGES = int(os.getenv("CATALOG_MAX_PAGES", "5"))
+CATALOG_INTERVAL = int(os.getenv("CATALOG_INTERVAL", str(CHECK_INTERVAL)))
+
+# API estruturada da Panini (GraphQL do Magento): consulta varios SKUs em uma
+# unica requisicao. Opcional: vazio (padrao) verifica apenas pelas paginas HTML
+PANINI_GRAPHQL_URL = os.getenv("PANINI_GRAPHQL_URL", "")
+
+# SKUs consultados por requisicao na API estruturada
+STRUCTURED_BATCH_SIZE = int(os.getenv("STRUCTURED_BATCH_SIZE", "50"))
+
+# Modo supervisor: numero de processos de verificacao (1 = processo unico).
+# Cada worker fica com uma parte dos produtos por hash consistente
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Indice do worker, definido pelo supervisor (-1 = supervisor ou processo unico)
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "-1"))
+
+# Numero maximo de produtos verificados simultaneamente
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "4"))
+
+# Disjuntor por host: abre quando a fracao de falhas nas ultimas BREAKER_WINDOW
+# requisicoes chega a BREAKER_FAILURE_RATE (com ao menos BREAKER_MIN_REQUESTS)
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+
+# Tempo com o circuito aberto antes de uma sondagem (dobra a cada sondagem com falha)
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "60"))
+BREAKER_MAX_COOLDOWN = float(os.getenv("BREAKER_MAX_COOLDOWN", "1800"))
+
+# Limite de requisicoes por host (requisicoes por segundo, 0 = sem limite)
+# Padrao: 0.5 = uma requisicao a cada 2 segundos por host
+RATE_LIMIT_PER_HOST = float(os.getenv("RATE_LIMIT_PER_HOST", "0.5"))
+
+# Rajada maxima de requisicoes permitida por host
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "1"))
+
+# Prazo de cada ciclo de verificacao (em segundos, 0 = sem prazo). Produtos nao
+# verificados ate o prazo ficam com resultado desconhecido e voltam no ciclo
+# seguinte; os timeouts das requisicoes sao encurtados para terminar ate o prazo
+CYCLE_DEADLINE = float(os.getenv("CYCLE_DEADLINE", "0"))
+
+# Requisicoes duplicadas (hedging): se os headers nao chegam dentro do percentil
+# HEDGE_PERCENTILE das latencias recentes do host, uma segunda tentativa e
+# enviada (apenas se o limite por host permitir) e vale a primeira resposta
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+
+# Latencias guardadas por host para o percentil; o hedging so comeca com HEDGE_MIN_SAMPLES
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Pool de conexoes HTTP: numero de hosts mantidos e conexoes por host
+# (com hedging, cada verificacao pode ter duas requisicoes em andamento)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", str(max(MAX_CONCURRENCY * (2 if HEDGE_REQUESTS else 1), 4))))
+
+# Timeouts HTTP (em segundos) para conexao e leitura
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+# Tamanho dos blocos lidos ao analisar paginas em stream (bytes)
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "16384"))
+
+# Ao encerrar a leitura cedo, o restante da resposta e drenado (mantendo a
+# conexao keep-alive) se for menor que este limite; caso contrario a conexao e fechada
+STREAM_DRAIN_LIMIT = int(os.getenv("STREAM_DRAIN_LIMIT", "65536"))
+
+# Backend de parse HTML: 'auto', 'selectolax', 'lxml' ou 'html.parser'
+# 'auto' usa o mais rapido instalado, com html.parser como fallback
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "auto")
+
+# Processos dedicados ao parse HTML (0 = parse na propria thread da verificacao).
+# Cada processo carrega o tracker inteiro (~40MB de RSS)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))
+
+# Paginas aguardando parse ao mesmo tempo (0 = 2 por processo de parse). Com a
+# fila cheia, a verificacao seguinte espera antes de entregar a pagina
+PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", "0"))
+
+# Tamanho de cada vaga de memoria compartilhada da fila de parse (bytes);
+# paginas maiores sao analisadas na propria thread
+PARSE_SLOT_SIZE = int(os.getenv("PARSE_SLOT_SIZE", str(2 * 1024 * 1024)))
+
+# Espera maxima (segundos) por uma vaga livre e pelo resultado do pool de parse;
+# esgotada, a pagina e analisada na propria thread
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "10"))
+
+# Amostras de preco guardadas por produto; so mudancas de preco ou disponibilidade geram amostra
+PRICE_HISTORY_SIZE = int(os.getenv("PRICE_HISTORY_SIZE", "256"))
+
+# Alerta quando o preco de um produto disponivel cai ao menos esta porcentagem (0 = desativado)
+PRICE_DROP_PERCENT = float(os.getenv("PRICE_DROP_PERCENT", "10"))
+
+# Dias de historico de verificacoes mantidos no banco (0 = sem limite)
+HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", "90"))
+
+# Intervalo entre limpezas do historico em execucoes longas (segundos)
+HISTORY_PRUNE_INTERVAL = float(os.getenv("HISTORY_PRUNE_INTERVAL", "86400"))
+
+# Modo de pouca memoria: cache HTTP e series de preco sao lidos do banco por URL
+# e descartados no fim de cada ciclo, seguido de coleta de lixo
+LOW_MEMORY = os.getenv("LOW_MEMORY", "").lower() in ("1", "true", "yes")
+
+# Orcamento de RSS do processo (em MB, 0 = sem limite). Se o RSS passar dele no
+# fim de um ciclo, os caches em memoria sao descartados
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "0"))
+
+# Quadros de pilha guardados pelo tracemalloc para o /debug/memory
+# (0 = desativado; o rastreamento deixa alocacoes mais lentas e usa memoria extra)
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "0"))
+
+# Logs de tempo em JSON no stderr: uma linha por produto (dns, connect, tls, ttfb,
+# download, parse) e uma por ciclo (checks, notify, persist). Conexoes novas
+# resolvem o host uma vez a mais para medir o DNS separado
+TIMING_LOG = os.getenv("TIMING_LOG", "").lower() in ("1", "true", "yes")
+
+# Ciclos perfilados a partir da partida (0 = desligado). Sem reiniciar, o
+# perfilamento e armado com POST /debug/profile?cycles=N
+PROFILE_CYCLES = int(os.getenv("PROFILE_CYCLES", "0"))
+
+# Perfilador: 'cprofile' (arquivo .pstats) ou 'sampling' (amostras de pilha de
+# todas as threads do ciclo, arquivo .collapsed para flamegraph.pl ou speedscope)
+PROFILER = os.getenv("PROFILER", "cprofile")
+
+# Intervalo entre amostras do perfilador por amostragem (em segundos)
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Arquivos de perfil mantidos em <diretorio de dados>/profiles (os mais antigos sao apagados)
+PROFILE_KEEP_FILES = int(os.getenv("PROFILE_KEEP_FILES", "20"))
+
+# Token exigido no POST /debug/profile (header "Authorization: Bearer <token>").
+# Vazio: o POST so e aceito de localhost
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
 # Porta do servidor HTTP para health check
 HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8080"))
 
+# Timeout (em segundos) de cada conexao ao servidor de health check
+HEALTH_REQUEST_TIMEOUT = float(os.getenv("HEALTH_REQUEST_TIMEOUT", "5"))
+
+# Eventos de disponibilidade e preco guardados em memoria para /events (retomada
+# com Last-Event-ID); eventos mais antigos que isso se perdem
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "1000"))
+
+# Conexoes simultaneas em /events, SSE ou long-poll (cada uma ocupa uma thread do servidor)
+EVENTS_MAX_CLIENTS = int(os.getenv("EVENTS_MAX_CLIENTS", "32"))
+
+# Intervalo entre comentarios keep-alive nas conexoes SSE (em segundos)
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+
+# Espera maxima de um long-poll em /events sem eventos novos (em segundos)
+EVENTS_POLL_TIMEOUT = float(os.getenv("EVENTS_POLL_TIMEOUT", "30"))
+
 # Configuracao de notificacao
 # Opcoes: 'pushover', 'ntfy', 'telegram', 'none'
+# Varios servicos podem ser combinados separados por virgula: 'pushover,telegram'
 NOTIFICATION_SERVICE = os.getenv("NOTIFICATION_SERVICE", "pushover")
 
+# Tentativas extras por canal quando o envio falha e espera inicial (dobrada a cada falha)
+NOTIFY_RETRIES = int(os.getenv("NOTIFY_RETRIES", "3"))
+NOTIFY_RETRY_BACKOFF = float(os.getenv("NOTIFY_RETRY_BACKOFF", "5"))
+
+# Limites de envio respeitados para cada provedor: (mensagens por segundo, rajada)
+NOTIFY_RATE_LIMITS = {
+    "pushover": (1.0, 5),
+    "ntfy": (0.2, 10),
+    "telegram": (1.0, 1),
+    "none": (0.0, 1),
+}
+
+# Verifica normalmente mas nao envia notificacoes (tambem via --dry-run)
+DRY_RUN = os.getenv("DRY_RUN", "").lower() in ("1", "true", "yes")
+
+# Modo --once: tempo maximo (em segundos) aguardando a entrega das notificacoes antes de sair
+ONCE_NOTIFY_TIMEOUT = float(os.getenv("ONCE_NOTIFY_TIMEOUT", "60"))
+
 # Pushover (https://pushover.net) - $5 unico, excelente para iOS
 PUSHOVER_USER_KEY = os.getenv("PUSHOVER_USER_KEY", "")
 PUSHOVER_API_TOKEN = os.getenv("PUSHOVER_API_TOKEN", "")
@@ -98,202 +381,379 @@ PRODUCTS = [
     Product(name="Berserk Edicao de Luxo Vol. 37", url="https://panini.com.br/berserk-edicao-de-luxo-vol-37-amaxs037r"),
 ]
 
+# URLs da lista embutida antes do shard (PRODUCTS fica so com as do worker)
+BUILTIN_PRODUCT_URLS = frozenset(product.url for product in PRODUCTS)
+
+# Brotli so e anunciado se o urllib3 conseguir decodificar a resposta
+try:
+    import brotli  # noqa: F401
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
 # Headers para simular um navegador
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
     "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Accept-Encoding": ACCEPT_ENCODING,
     "Connection": "keep-alive",
 }
 
 
 # ============================================================================
-# SERVIDOR HTTP PARA HEALTH CHECK
+# METRICAS (PROMETHEUS)
 # ============================================================================
 
 
-class HealthHandler(BaseHTTPRequestHandler):
-    """Handler HTTP para endpoints de health check."""
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
 
-    def log_message(self, format, *args):
-        """Silencia logs de requisicoes HTTP."""
-        pass
 
-    def do_GET(self):
-        if self.path == "/health" or self.path == "/":
-            self.send_response(200 if health_status.last_check_success else 503)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            response = json.dumps(health_status.to_dict(), indent=2)
-            self.wfile.write(response.encode("utf-8"))
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
 
-        elif self.path == "/ready":
-            # Readiness check - pronto para receber trafego
-            is_ready = health_status.last_check is not None
-            self.send_response(200 if is_ready else 503)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            response = json.dumps({"ready": is_ready})
-            self.wfile.write(response.encode("utf-8"))
 
-        elif self.path == "/live":
-            # Liveness check - aplicacao esta viva
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            response = json.dumps({"alive": True})
-            self.wfile.write(response.encode("utf-8"))
+class Metric:
+    """Base das metricas: nome, ajuda e nomes de labels."""
 
-        else:
-            self.send_response(404)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            response = json.dumps({"error": "Not found", "endpoints": ["/health", "/ready", "/live"]})
-            self.wfile.write(response.encode("utf-8"))
+    kind = ""
 
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
 
-def start_health_server():
-    """Inicia o servidor HTTP para health check em uma thread separada."""
-    server = HTTPServer(("0.0.0.0", HEALTH_PORT), HealthHandler)
-    logger.info(f"Servidor de health check iniciado na porta {HEALTH_PORT}")
-    server.serve_forever()
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
 
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
 
-# ============================================================================
-# FUNCOES DE NOTIFICACAO
-# ============================================================================
+    def samples(self) -> list[str]:
+        raise NotImplementedError
 
 
-def send_pushover(title: str, message: str, url: Optional[str] = None):
-    """Envia notificacao via Pushover."""
-    if not PUSHOVER_USER_KEY or not PUSHOVER_API_TOKEN:
-        logger.warning("Pushover nao configurado. Defina PUSHOVER_USER_KEY e PUSHOVER_API_TOKEN")
-        return False
+class Counter(Metric):
+    """Contador monotono, opcionalmente lido de uma funcao."""
 
-    try:
-        data = {
-            "token": PUSHOVER_API_TOKEN,
-            "user": PUSHOVER_USER_KEY,
-            "title": title,
-            "message": message,
-            "priority": 1,
-            "sound": "cashregister",
-        }
-        if url:
-            data["url"] = url
-            data["url_title"] = "Comprar Agora"
+    kind = "counter"
 
-        response = requests.post("https://api.pushover.net/1/messages.json", data=data, timeout=10)
-        response.raise_for_status()
-        logger.info("Notificacao Pushover enviada com sucesso!")
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao enviar Pushover: {e}")
-        return False
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), func=None):
+        super().__init__(name, documentation, labels)
+        self.func = func
+        self._values: dict[tuple[str, ...], float] = {}
 
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
 
-def send_ntfy(title: str, message: str, url: Optional[str] = None):
-    """Envia notificacao via Ntfy.sh."""
-    try:
-        headers = {
-            "Title": title,
-            "Priority": "high",
-            "Tags": "book,moneybag",
-        }
-        if url:
-            headers["Click"] = url
-            headers["Actions"] = f"view, Comprar Agora, {url}"
+    def samples(self) -> list[str]:
+        if self.func is not None:
+            return [f"{self.name} {self.func()}"]
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self._values.items()]
 
-        response = requests.post(f"{NTFY_SERVER}/{NTFY_TOPIC}", data=message.encode("utf-8"), headers=headers, timeout=10)
-        response.raise_for_status()
-        logger.info("Notificacao Ntfy enviada com sucesso!")
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao enviar Ntfy: {e}")
-        return False
 
+class Gauge(Counter):
+    """Valor instantaneo, definido diretamente ou lido de uma funcao."""
 
-def send_telegram(title: str, message: str, url: Optional[str] = None):
-    """Envia notificacao via Telegram Bot."""
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        logger.warning("Telegram nao configurado. Defina TELEGRAM_BOT_TOKEN e TELEGRAM_CHAT_ID")
-        return False
+    kind = "gauge"
 
-    try:
-        text = f"*{title}*\n\n{message}"
-        if url:
-            text += f"\n\n[Comprar Agora]({url})"
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
 
-        response = requests.post(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-            json={
-                "chat_id": TELEGRAM_CHAT_ID,
-                "text": text,
-                "parse_mode": "Markdown",
-                "disable_web_page_preview": False,
-            },
-            timeout=10,
-        )
-        response.raise_for_status()
-        logger.info("Notificacao Telegram enviada com sucesso!")
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao enviar Telegram: {e}")
-        return False
 
+class Histogram(Metric):
+    """Histograma com buckets cumulativos, soma e contagem por combinacao de labels."""
+
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labels, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de metricas expostas em /metrics."""
+
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
 
-def send_notification(title: str, message: str, url: Optional[str] = None):
-    """Envia notificacao pelo servico configurado."""
-    service = NOTIFICATION_SERVICE.lower()
-
-    if service == "pushover":
-        return send_pushover(title, message, url)
-    elif service == "ntfy":
-        return send_ntfy(title, message, url)
-    elif service == "telegram":
-        return send_telegram(title, message, url)
-    elif service == "none":
-        logger.info(f"Notificacao (modo none): {title} - {message}")
-        return True
-    else:
-        logger.warning(f"Servico de notificacao desconhecido: {service}")
-        return False
+
+metrics = MetricsRegistry()
+
+FETCH_SECONDS = metrics.register(
+    Histogram("berserk_fetch_seconds", "Duracao do download da pagina do produto", ("store", "product", "status"))
+)
+PARSE_SECONDS = metrics.register(Histogram("berserk_parse_seconds", "Duracao da analise da pagina", ("store", "product")))
+STATE_SAVE_SECONDS = metrics.register(Histogram("berserk_state_save_seconds", "Duracao da gravacao do estado no fim do ciclo"))
+NOTIFY_SECONDS = metrics.register(
+    Histogram("berserk_notify_seconds", "Duracao de cada tentativa de envio de notificacao", ("channel", "result"))
+)
+CYCLE_SECONDS = metrics.register(Histogram("berserk_cycle_duration_seconds", "Duracao de cada ciclo de verificacao"))
+CHECKS_TOTAL = metrics.register(Counter("berserk_checks_total", "Verificacoes de produtos por resultado", ("store", "result")))
+HEDGED_TOTAL = metrics.register(
+    Counter(
+        "berserk_hedged_requests_total",
+        "Requisicoes lentas duplicadas (sent), vencidas pela segunda tentativa (won) ou barradas pelo limite (skipped)",
+        ("host", "result"),
+    )
+)
+CIRCUIT_STATE = metrics.register(
+    Gauge("berserk_circuit_state", "Estado do disjuntor por host (0 = fechado, 1 = meio-aberto, 2 = aberto)", ("host",))
+)
+SCHEDULER_LAG = metrics.register(Gauge("berserk_scheduler_lag_seconds", "Atraso do produto mais atrasado no ultimo ciclo"))
+metrics.register(
+    Counter("berserk_bytes_downloaded_total", "Bytes recebidos pela rede", func=lambda: http_client.stats.bytes_downloaded)
+)
+metrics.register(
+    Counter(
+        "berserk_http_connections_opened_total", "Conexoes TCP/TLS abertas", func=lambda: http_client.stats.connections_opened
+    )
+)
+metrics.register(Counter("berserk_http_requests_total", "Requisicoes HTTP feitas", func=lambda: http_client.stats.requests))
+metrics.register(
+    Gauge(
+        "berserk_notification_queue_depth",
+        "Notificacoes aguardando entrega",
+        func=lambda: notification_dispatcher.queue.qsize(),
+    )
+)
+metrics.register(Gauge("berserk_products_available", "Produtos disponiveis", func=lambda: health_status.products_available))
+metrics.register(Gauge("berserk_process_resident_memory_bytes", "RSS atual do processo", func=lambda: current_rss() or 0))
+metrics.register(
+    Counter(
+        "berserk_cache_evictions_total",
+        "Entradas descartadas dos caches em memoria (LOW_MEMORY ou orcamento de RSS)",
+        func=lambda: memory_monitor.evictions,
+    )
+)
+metrics.register(Gauge("berserk_event_clients", "Conexoes abertas em /events (SSE e long-poll)", func=lambda: event_log.clients))
+metrics.register(Counter("berserk_events_total", "Eventos publicados em /events", func=lambda: event_log.published))
+metrics.register(
+    Gauge(
+        "berserk_subscribers",
+        "Assinantes carregados de SUBSCRIBERS_FILE",
+        func=lambda: len(subscriber_registry) if subscriber_registry is not None else 0,
+    )
+)
+metrics.register(
+    Gauge(
+        "berserk_parse_queue_depth",
+        "Paginas no pool de parse (em parse ou aguardando um processo)",
+        func=lambda: parse_pool.in_use() if parse_pool is not None else 0,
+    )
+)
+
+
+def product_label(url: str) -> str:
+    """Label curto e estavel para um produto: o ultimo segmento do caminho da URL."""
+    return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1] or url
 
 
 # ============================================================================
-# FUNCOES DE VERIFICACAO
+# CLIENTE HTTP COMPARTILHADO
 # ============================================================================
 
 
-def check_panini_availability(url: str) -> tuple[bool, Optional[str]]:
+class HttpStats:
+    """Contadores de uso do cliente HTTP."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.bytes_downloaded = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def record_bytes(self, count: int):
+        with self._lock:
+            self.bytes_downloaded += count
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": max(0, self.requests - self.connections_opened),
+                "bytes_downloaded": self.bytes_downloaded,
+            }
+
+
+# Fases da requisicao em andamento em cada thread; as conexoes novas do pool
+# acrescentam dns, connect e tls ao dicionario
+request_phases = threading.local()
+
+
+class TimedConnection:
+    """Mixin das conexoes do pool que mede DNS, TCP e TLS de cada conexao nova."""
+
+    def _new_conn(self):
+        timings = getattr(request_phases, "timings", None)
+        if timings is None:
+            return super()._new_conn()
+
+        started = time.perf_counter()
+        if TIMING_LOG:
+            # Erros de resolucao aparecem logo abaixo, com a excecao do urllib3
+            try:
+                socket.getaddrinfo(self._dns_host, self.port, type=socket.SOCK_STREAM)
+            except OSError:
+                pass
+            timings["dns"] = time.perf_counter() - started
+        connecting = time.perf_counter()
+        sock = super()._new_conn()
+        timings["connect"] = time.perf_counter() - connecting
+        return sock
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        timings = getattr(request_phases, "timings", None)
+        if timings is not None and isinstance(self, HTTPSConnectionPool.ConnectionCls):
+            timings["tls"] = time.perf_counter() - started - timings.get("dns", 0.0) - timings.get("connect", 0.0)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter que contabiliza (e mede) cada nova conexao TCP/TLS aberta."""
+
+    def __init__(self, stats: HttpStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        # urllib3 reaproveita o objeto de conexao e reconecta sob demanda,
+        # entao a contagem e feita em connect() e nao em _new_conn()
+        class CountingHTTPConnection(TimedConnection, HTTPConnectionPool.ConnectionCls):
+            def connect(self):
+                stats.record_connection()
+                return super().connect()
+
+        class CountingHTTPSConnection(TimedConnection, HTTPSConnectionPool.ConnectionCls):
+            def connect(self):
+                stats.record_connection()
+                return super().connect()
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
     """
-    Verifica disponibilidade na loja Panini.
-    Retorna (disponivel, preco ou None).
+    Sessao HTTP keep-alive compartilhada por verificadores e notificadores.
+    Mantem um pool de conexoes por host e contabiliza bytes e conexoes.
     """
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=30)
-        response.raise_for_status()
 
-        html_text = response.text
-        soup = BeautifulSoup(html_text, "html.parser")
+    def __init__(self, pool_connections: int, pool_maxsize: int, timeout: tuple[float, float]):
+        self.timeout = timeout
+        self.stats = HttpStats()
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = PooledHTTPAdapter(self.stats, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
-        # Produtos indisponiveis mostram link para 'productalert'
-        if "productalert" in html_text:
-            return False, None
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Executa uma requisicao pelo pool. Respostas em stream devem chamar record_download."""
+        kwargs.setdefault("timeout", self.timeout)
+        self.stats.record_request()
+        response = self.session.request(method, url, **kwargs)
+        if not kwargs.get("stream"):
+            self.record_download(response)
+        return response
 
-        # Tenta encontrar o preco
-        price_element = soup.find("span", {"class": "price"})
-        price = price_element.get_text(strip=True) if price_element else None
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
 
-        return True, price
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
 
-    except requests.RequestException as e:
-        logger.error(f"Erro ao acessar Panini: {e}")
-        return False, None
+    def record_download(self, response: requests.Response):
+        """Contabiliza os bytes recebidos pela rede (antes da descompressao)."""
+        try:
+            self.stats.record_bytes(response.raw.tell())
+        except Exception:
+            self.stats.record_bytes(len(response.content or b""))
+
+
+http_client = HttpClient(HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+
+# ============================================================================
+# ESTADO PERSISTENTE (SQLITE)
+# ============================================================================
 
 
+@functools.lru_cache(maxsize=None)
 def get_data_path() -> Path:
-    """Retorna o caminho para armazenar dados persistentes."""
+    """Retorna o caminho para armazenar dados persistentes (resolvido uma vez)."""
     # Verifica caminhos em ordem de preferencia
     for path in ["/var/lib/berserk-tracker", "/data", "."]:
         p = Path(path)
@@ -302,99 +762,4200 @@ def get_data_path() -> Path:
     return Path(".")
 
 
-def load_notified_products() -> set:
-    """Carrega lista de produtos ja notificados."""
-    notified_file = get_data_path() / "notified_products.json"
+class StateStore:
+    """
+    Estado do tracker em SQLite (modo WAL): produtos notificados, cache HTTP e
+    historico de verificacoes. Cada ciclo grava apenas o que mudou.
+    """
 
-    if notified_file.exists():
-        try:
-            with open(notified_file, "r") as f:
-                data = json.load(f)
-                return set(data.get("notified", []))
-        except Exception:
-            pass
-    return set()
+    FILENAME = "berserk_tracker.db"
+    LEGACY_NOTIFIED_FILE = "notified_products.json"
 
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS notified (
+            url TEXT PRIMARY KEY,
+            notified_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS http_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT,
+            available INTEGER NOT NULL,
+            price TEXT
+        );
+        CREATE TABLE IF NOT EXISTS checks (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL,
+            checked_at REAL NOT NULL,
+            available INTEGER NOT NULL,
+            price TEXT,
+            latency_ms REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_checks_url_time ON checks (url, checked_at);
+        CREATE INDEX IF NOT EXISTS idx_checks_time ON checks (checked_at);
+        CREATE TABLE IF NOT EXISTS price_history (
+            url TEXT PRIMARY KEY,
+            times BLOB NOT NULL,
+            cents BLOB NOT NULL,
+            flags BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS notify_claims (
+            url TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            claimed_at REAL NOT NULL
+        );
+    """
 
-def save_notified_products(notified: set):
-    """Salva lista de produtos ja notificados."""
-    notified_file = get_data_path() / "notified_products.json"
+    # Reservas de notificacao mais antigas que isto sao de processos que morreram (segundos)
+    CLAIM_TTL = 600
 
-    try:
-        with open(notified_file, "w") as f:
-            json.dump({"notified": list(notified), "updated": datetime.now().isoformat()}, f)
-    except Exception as e:
-        logger.error(f"Erro ao salvar produtos notificados: {e}")
+    def __init__(self):
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = get_data_path() / self.FILENAME
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+            self._migrate_legacy_notified()
+        return self._conn
 
-def check_all_products():
-    """Verifica todos os produtos e notifica se algum estiver disponivel."""
-    global health_status
+    def _migrate_legacy_notified(self):
+        """Importa o notified_products.json de versoes anteriores."""
+        legacy_file = get_data_path() / self.LEGACY_NOTIFIED_FILE
+        if not legacy_file.exists():
+            return
 
-    logger.info("=" * 50)
-    logger.info(f"Verificacao iniciada: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-    logger.info("=" * 50)
+        try:
+            with open(legacy_file, "r") as f:
+                urls = json.load(f).get("notified", [])
+            self.update_notified(added=urls, removed=())
+            legacy_file.rename(legacy_file.with_suffix(".json.migrated"))
+            logger.info(f"{len(urls)} produtos notificados migrados para {self.FILENAME}")
+        except Exception as e:
+            logger.error(f"Erro ao migrar {self.LEGACY_NOTIFIED_FILE}: {e}")
 
-    health_status.last_check = datetime.now().isoformat()
-    health_status.total_checks += 1
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
-    try:
-        notified_products = load_notified_products()
-        new_available = []
-        available_count = 0
+    def load_notified(self) -> set:
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT url FROM notified")}
 
-        for product in PRODUCTS:
-            logger.info(f"Verificando: {product.name}")
+    def update_notified(self, added: Iterable[str], removed: Iterable[str]):
+        """Aplica, em uma transacao, apenas as URLs que mudaram de estado."""
+        now = datetime.now().isoformat()
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute("BEGIN")
+                added = [(url,) for url in added]
+                conn.executemany(
+                    "INSERT INTO notified (url, notified_at) VALUES (?, ?) ON CONFLICT(url) DO NOTHING",
+                    [(url, now) for url, in added],
+                )
+                conn.executemany("DELETE FROM notify_claims WHERE url = ?", added)
+                conn.executemany("DELETE FROM notified WHERE url = ?", [(url,) for url in removed])
+
+    def claim_notifications(self, urls: Iterable[str]) -> set[str]:
+        """
+        Reserva URLs para notificacao em uma transacao exclusiva (BEGIN IMMEDIATE).
+        Retorna apenas as URLs reservadas por este processo: as ja notificadas ou
+        reservadas por outro worker ficam de fora, entao cada produto e notificado uma vez.
+        """
+        urls = list(urls)
+        if not urls:
+            return set()
 
-            is_available, price = check_panini_availability(product.url)
+        now = time.time()
+        owner = str(os.getpid())
+        claimed = set()
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM notify_claims WHERE claimed_at < ?", (now - self.CLAIM_TTL,))
+                for url in urls:
+                    if conn.execute("SELECT 1 FROM notified WHERE url = ?", (url,)).fetchone():
+                        continue
+                    cursor = conn.execute(
+                        "INSERT INTO notify_claims (url, owner, claimed_at) VALUES (?, ?, ?) ON CONFLICT(url) DO NOTHING",
+                        (url, owner, now),
+                    )
+                    if cursor.rowcount:
+                        claimed.add(url)
+        return claimed
 
-            if is_available:
-                available_count += 1
-                price_info = f" - {price}" if price else ""
-                logger.info(f"  -> DISPONIVEL!{price_info}")
+    def release_claims(self, urls: Optional[Iterable[str]] = None):
+        """Libera reservas de notificacao (todas, se `urls` nao for informado)."""
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute("BEGIN")
+                if urls is None:
+                    conn.execute("DELETE FROM notify_claims")
+                else:
+                    conn.executemany("DELETE FROM notify_claims WHERE url = ?", [(url,) for url in urls])
 
-                if product.url not in notified_products:
-                    new_available.append({"name": product.name, "url": product.url, "price": price})
-                    notified_products.add(product.url)
+    def load_http_cache(self, url: Optional[str] = None) -> dict[str, "CacheEntry"]:
+        """Entradas do cache HTTP (todas, ou apenas a da URL informada)."""
+        query = "SELECT url, etag, last_modified, body_hash, available, price FROM http_cache"
+        with self._lock:
+            if url is None:
+                rows = self.conn.execute(query).fetchall()
             else:
-                logger.info("  -> Indisponivel")
-                notified_products.discard(product.url)
+                rows = self.conn.execute(query + " WHERE url = ?", (url,)).fetchall()
+        return {
+            url: CacheEntry(etag, modified, body_hash, bool(available), price)
+            for url, etag, modified, body_hash, available, price in rows
+        }
 
-            time.sleep(2)
+    def upsert_http_cache(self, entries: dict[str, "CacheEntry"]):
+        if not entries:
+            return
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    """
+                    INSERT INTO http_cache (url, etag, last_modified, body_hash, available, price)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        etag = excluded.etag,
+                        last_modified = excluded.last_modified,
+                        body_hash = excluded.body_hash,
+                        available = excluded.available,
+                        price = excluded.price
+                    """,
+                    [(url, e.etag, e.last_modified, e.body_hash, int(e.available), e.price) for url, e in entries.items()],
+                )
 
-        # Envia notificacoes para novos produtos disponiveis
-        if new_available:
-            for prod in new_available:
-                price_info = f" por {prod['price']}" if prod["price"] else ""
-                send_notification(
-                    title="Berserk Disponivel!", message=f"{prod['name']}{price_info} esta disponivel para compra!", url=prod["url"]
+    def record_checks(self, results: list["CheckResult"]):
+        """Acrescenta o resultado de cada verificacao ao historico."""
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO checks (url, checked_at, available, price, latency_ms) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (r.product.url, now, int(r.available), r.price, r.elapsed * 1000)
+                        for r in results
+                        if r.available is not None
+                    ],
                 )
 
-        save_notified_products(notified_products)
+    def prune_history(self, retention_days: int):
+        """Remove do historico verificacoes mais antigas que a retencao."""
+        if retention_days <= 0:
+            return
+        with self._lock:
+            self.conn.execute("DELETE FROM checks WHERE checked_at < ?", (time.time() - retention_days * 86400,))
 
-        # Atualiza status de saude
-        health_status.last_check_success = True
-        health_status.products_available = available_count
+    def load_price_history(self, url: Optional[str] = None) -> dict[str, tuple[bytes, bytes, bytes]]:
+        """Series de preco serializadas (todas, ou apenas a da URL informada)."""
+        query = "SELECT url, times, cents, flags FROM price_history"
+        with self._lock:
+            if url is None:
+                rows = self.conn.execute(query).fetchall()
+            else:
+                rows = self.conn.execute(query + " WHERE url = ?", (url,)).fetchall()
+        return {row[0]: row[1:] for row in rows}
 
-        logger.info(f"Proxima verificacao em {CHECK_INTERVAL} segundos ({CHECK_INTERVAL//60} min)")
-        logger.info("=" * 50 + "\n")
+    def upsert_price_history(self, series: dict[str, tuple[bytes, bytes, bytes]]):
+        if not series:
+            return
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    """
+                    INSERT INTO price_history (url, times, cents, flags) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET times = excluded.times, cents = excluded.cents, flags = excluded.flags
+                    """,
+                    [(url, *blobs) for url, blobs in series.items()],
+                )
 
-    except Exception as e:
-        logger.error(f"Erro durante verificacao: {e}")
-        health_status.last_check_success = False
-        health_status.total_errors += 1
-        raise
+    def history(self, url: str, since: Optional[float] = None, limit: int = 100) -> Iterator[tuple]:
+        """
+        Historico de uma URL, do mais recente para o mais antigo, via indice.
+        Gera tuplas (checked_at, available, price, latency_ms).
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT checked_at, available, price, latency_ms FROM checks
+                WHERE url = ? AND checked_at >= ?
+                ORDER BY checked_at DESC LIMIT ?
+                """,
+                (url, since or 0, limit),
+            ).fetchall()
+        yield from rows
 
 
-def main():
-    """Funcao principal."""
-    global health_status
+state_store = StateStore()
 
-    logger.info(
-        """
-    ========================================================
-              BERSERK MANGA TRACKER
-              
+
+# ============================================================================
+# CACHE DE RESPOSTAS (GET CONDICIONAL)
+# ============================================================================
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """Validadores HTTP e ultimo resultado conhecido de uma URL."""
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: Optional[str]
+    available: bool
+    price: Optional[str]
+
+
+class ResponseCache:
+    """
+    Cache persistente por URL com ETag/Last-Modified e hash do corpo.
+    Permite pular download (304) e parse (hash identico) de paginas inalteradas.
+    """
+
+    def __init__(self):
+        self._entries: Optional[dict[str, CacheEntry]] = None
+        # Parcial: as entradas sao lidas do banco uma a uma, sob demanda (LOW_MEMORY ou apos evict)
+        self._partial = LOW_MEMORY
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.unchanged = 0
+        self.misses = 0
+
+    def _load(self) -> dict[str, CacheEntry]:
+        if self._entries is None:
+            try:
+                self._entries = {} if self._partial else state_store.load_http_cache()
+            except Exception as e:
+                logger.warning(f"Cache de respostas ignorado: {e}")
+                self._entries = {}
+        return self._entries
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(url)
+            if entry is None and self._partial:
+                try:
+                    entry = state_store.load_http_cache(url).get(url)
+                except Exception as e:
+                    logger.warning(f"Cache de respostas ignorado para {url}: {e}")
+                if entry is not None:
+                    entries[url] = entry
+            return entry
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries or ())
+
+    def evict(self) -> int:
+        """
+        Descarta da memoria as entradas ja gravadas no banco. Retorna quantas
+        foram descartadas; daqui em diante o cache passa a ler por URL.
+        """
+        with self._lock:
+            entries = self._entries or {}
+            kept = {url: entries[url] for url in self._dirty}
+            self._entries = kept
+            self._partial = True
+            return len(entries) - len(kept)
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> dict:
+        """Headers If-None-Match/If-Modified-Since para a entrada em cache."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url: str, entry: CacheEntry):
+        with self._lock:
+            entries = self._load()
+            if entries.get(url) != entry:
+                entries[url] = entry
+                self._dirty.add(url)
+
+    def record(self, outcome: str):
+        """Contabiliza 'not_modified', 'unchanged' ou 'misses'."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {"not_modified": self.not_modified, "unchanged": self.unchanged, "misses": self.misses}
+
+    def save(self):
+        """Grava apenas as entradas alteradas desde o ultimo save."""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            changed = {url: self._entries[url] for url in self._dirty}
+            self._dirty = set()
+
+        try:
+            state_store.upsert_http_cache(changed)
+        except Exception as e:
+            logger.error(f"Erro ao salvar cache de respostas: {e}")
+
+
+response_cache = ResponseCache()
+
+
+# ============================================================================
+# HISTORICO DE PRECOS
+# ============================================================================
+
+BRL_PATTERN = re.compile(r"(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{1,2}))?")
+
+
+def parse_brl_cents(price: Optional[str]) -> Optional[int]:
+    """Converte um preco em reais para centavos (ex.: 'R$ 1.234,50' -> 123450)."""
+    if not price:
+        return None
+    match = BRL_PATTERN.search(price)
+    if match is None:
+        return None
+    reais = int(match.group(1).replace(".", ""))
+    cents = int((match.group(2) or "0").ljust(2, "0"))
+    return reais * 100 + cents
+
+
+class PriceHistory:
+    """
+    Serie de (timestamp, centavos, disponivel) de um produto em arrays de
+    tamanho fixo usados como ring buffer: memoria limitada por produto. Cada
+    amostra marca uma mudanca; leituras repetidas nao ocupam espaco.
+    """
+
+    NO_PRICE = -1
+
+    def __init__(self, capacity: int):
+        self.capacity = max(2, capacity)
+        self.times = array("d")
+        self.cents = array("q")
+        self.flags = array("b")
+        self.start = 0
+
+    def __len__(self):
+        return len(self.times)
+
+    def _order(self) -> list[int]:
+        size = len(self.times)
+        return [(self.start + i) % size for i in range(size)]
+
+    def last(self) -> Optional[tuple[float, Optional[int], bool]]:
+        if not self.times:
+            return None
+        i = (self.start - 1) % len(self.times)
+        return self.times[i], None if self.cents[i] == self.NO_PRICE else self.cents[i], bool(self.flags[i])
+
+    def last_price(self) -> Optional[int]:
+        """Ultimo preco conhecido (ignora amostras sem preco)."""
+        for i in reversed(self._order()):
+            if self.cents[i] != self.NO_PRICE:
+                return self.cents[i]
+        return None
+
+    def append(self, timestamp: float, cents: Optional[int], available: bool) -> bool:
+        """Grava a amostra se preco ou disponibilidade mudaram. Retorna True se gravou."""
+        last = self.last()
+        if last is not None and last[1] == cents and last[2] == available:
+            return False
+
+        value = self.NO_PRICE if cents is None else cents
+        if len(self.times) < self.capacity:
+            self.times.append(timestamp)
+            self.cents.append(value)
+            self.flags.append(int(available))
+            self.start = 0
+        else:
+            # Buffer cheio: sobrescreve a amostra mais antiga
+            self.times[self.start] = timestamp
+            self.cents[self.start] = value
+            self.flags[self.start] = int(available)
+            self.start = (self.start + 1) % self.capacity
+        return True
+
+    def samples(self, since: Optional[float] = None, limit: Optional[int] = None) -> list[tuple[float, Optional[int], bool]]:
+        """Amostras da mais antiga para a mais recente, a partir de `since` (busca binaria)."""
+        size = len(self.times)
+        first = self._find(since) if since is not None else 0
+        if limit is not None:
+            first = max(first, size - limit)
+        positions = ((self.start + k) % size for k in range(first, size))
+        return [
+            (self.times[i], None if self.cents[i] == self.NO_PRICE else self.cents[i], bool(self.flags[i]))
+            for i in positions
+        ]
+
+    def _find(self, since: float) -> int:
+        """
+        Posicao logica (0 = mais antiga) da primeira amostra com timestamp >= since.
+        O ring sao dois trechos ordenados: times[start:] (os mais antigos) e
+        times[:start]; a busca binaria roda direto no trecho certo, sem copiar.
+        """
+        size = len(self.times)
+        if self.start == 0:
+            return bisect.bisect_left(self.times, since)
+        if since <= self.times[size - 1]:
+            return bisect.bisect_left(self.times, since, self.start, size) - self.start
+        return size - self.start + bisect.bisect_left(self.times, since, 0, self.start)
+
+    def to_blobs(self) -> tuple[bytes, bytes, bytes]:
+        order = self._order()
+        return (
+            array("d", (self.times[i] for i in order)).tobytes(),
+            array("q", (self.cents[i] for i in order)).tobytes(),
+            array("b", (self.flags[i] for i in order)).tobytes(),
+        )
+
+    @classmethod
+    def from_blobs(cls, capacity: int, times: bytes, cents: bytes, flags: bytes) -> "PriceHistory":
+        history = cls(capacity)
+        history.times.frombytes(times)
+        history.cents.frombytes(cents)
+        history.flags.frombytes(flags)
+        # Capacidade reduzida desde a ultima gravacao: mantem as amostras mais recentes
+        excess = len(history.times) - history.capacity
+        if excess > 0:
+            del history.times[:excess], history.cents[:excess], history.flags[:excess]
+        return history
+
+
+@dataclass(slots=True)
+class PriceDrop:
+    """Queda de preco de um produto disponivel."""
+
+    product: Product
+    old_cents: int
+    new_cents: int
+
+    @property
+    def percent(self) -> float:
+        return (self.old_cents - self.new_cents) * 100 / self.old_cents
+
+
+class PriceTracker:
+    """
+    Series de preco de todos os produtos, carregadas do banco uma unica vez e
+    gravadas no fim de cada ciclo (apenas as que mudaram).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._series: Optional[dict[str, PriceHistory]] = None
+        # Parcial: as series sao lidas do banco uma a uma, sob demanda (LOW_MEMORY ou apos evict)
+        self._partial = LOW_MEMORY
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, PriceHistory]:
+        if self._series is None:
+            try:
+                rows = {} if self._partial else state_store.load_price_history()
+            except Exception as e:
+                logger.warning(f"Historico de precos ignorado: {e}")
+                rows = {}
+            self._series = {url: PriceHistory.from_blobs(self.capacity, *blobs) for url, blobs in rows.items()}
+        return self._series
+
+    def _history(self, url: str) -> Optional[PriceHistory]:
+        """Serie da URL, lida do banco se o tracker for parcial. Chamado com o lock."""
+        series = self._load()
+        history = series.get(url)
+        if history is None and self._partial:
+            try:
+                blobs = state_store.load_price_history(url).get(url)
+            except Exception as e:
+                logger.warning(f"Historico de precos ignorado para {url}: {e}")
+                blobs = None
+            if blobs:
+                history = series[url] = PriceHistory.from_blobs(self.capacity, *blobs)
+        return history
+
+    def __len__(self):
+        with self._lock:
+            return len(self._series or ())
+
+    def record(self, result: CheckResult, timestamp: Optional[float] = None) -> Optional[PriceDrop]:
+        """Acrescenta o resultado a serie do produto. Retorna a queda de preco, se houver."""
+        url = result.product.url
+        cents = parse_brl_cents(result.price)
+        with self._lock:
+            history = self._history(url)
+            if history is None:
+                history = self._load()[url] = PriceHistory(self.capacity)
+            previous = history.last_price()
+            if not history.append(time.time() if timestamp is None else timestamp, cents, bool(result.available)):
+                return None
+            self._dirty.add(url)
+
+        if (
+            PRICE_DROP_PERCENT > 0
+            and result.available
+            and cents is not None
+            and previous
+            and cents <= previous * (1 - PRICE_DROP_PERCENT / 100)
+        ):
+            return PriceDrop(result.product, previous, cents)
+        return None
+
+    def samples(self, url: str, since: Optional[float] = None, limit: Optional[int] = None, fresh: bool = False) -> list:
+        """
+        Amostras de um produto. Com `fresh`, le a serie direto do banco pela chave
+        (usado pelo supervisor, cujos workers e que gravam as series).
+        """
+        if fresh:
+            blobs = state_store.load_price_history(url).get(url)
+            return PriceHistory.from_blobs(self.capacity, *blobs).samples(since, limit) if blobs else []
+        with self._lock:
+            history = self._history(url)
+            return history.samples(since, limit) if history is not None else []
+
+    def evict(self) -> int:
+        """Descarta da memoria as series ja gravadas no banco. Retorna quantas foram descartadas."""
+        with self._lock:
+            series = self._series or {}
+            kept = {url: series[url] for url in self._dirty}
+            self._series = kept
+            self._partial = True
+            return len(series) - len(kept)
+
+    def save(self):
+        """Grava apenas as series alteradas desde o ultimo save."""
+        with self._lock:
+            if not self._dirty or self._series is None:
+                return
+            changed = {url: self._series[url].to_blobs() for url in self._dirty}
+            self._dirty = set()
+
+        try:
+            state_store.upsert_price_history(changed)
+        except Exception as e:
+            logger.error(f"Erro ao salvar historico de precos: {e}")
+
+
+price_tracker = PriceTracker(PRICE_HISTORY_SIZE)
+
+
+# ============================================================================
+# MEMORIA (ORCAMENTO DE RSS E DIAGNOSTICO)
+# ============================================================================
+
+MB = 1024 * 1024
+
+
+def current_rss() -> Optional[int]:
+    """RSS atual do processo em bytes (de /proc), ou None fora do Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _malloc_trim() -> Optional[Callable]:
+    """malloc_trim da glibc, ou None em outras libcs (musl, macOS)."""
+    try:
+        import ctypes
+
+        return ctypes.CDLL("libc.so.6").malloc_trim
+    except (OSError, AttributeError):
+        return None
+
+
+def release_free_memory():
+    """Coleta ciclos e devolve ao sistema a memoria livre do heap, para o RSS cair de fato."""
+    gc.collect()
+    trim = _malloc_trim()
+    if trim is not None:
+        trim(0)
+
+
+class MemoryMonitor:
+    """
+    Mede o RSS no fim de cada ciclo e aplica o orcamento de memoria: acima de
+    MEMORY_BUDGET_MB (ou sempre, com LOW_MEMORY) os caches em memoria ja
+    gravados no banco sao descartados. Guarda as ultimas medidas para o
+    /debug/memory.
+    """
+
+    def __init__(self, budget_mb: float, history: int = 120):
+        self.budget = int(budget_mb * MB)
+        self.cycles: deque = deque(maxlen=history)
+        self.evictions = 0
+        self._cycle = 0
+        self._lock = threading.Lock()
+
+    def start_tracing(self, frames: int):
+        """Liga o tracemalloc (chamado na partida, antes das alocacoes que interessam)."""
+        if frames > 0:
+            import tracemalloc
+
+            tracemalloc.start(frames)
+            logger.info(f"tracemalloc ativo ({frames} quadros por alocacao)")
+
+    def after_cycle(self, products: int):
+        rss = current_rss()
+        over_budget = self.budget > 0 and rss is not None and rss > self.budget
+        evicted = 0
+
+        if LOW_MEMORY or over_budget:
+            evicted = response_cache.evict() + price_tracker.evict()
+            release_free_memory()
+            before, rss = rss, current_rss()
+            self.evictions += evicted
+            # Sem nada para descartar, o aviso se repetiria a cada ciclo
+            if over_budget and evicted:
+                logger.warning(
+                    f"RSS de {before / MB:.1f} MB acima do orcamento de {self.budget / MB:.0f} MB: "
+                    f"{evicted} entradas de cache descartadas, RSS agora {(rss or 0) / MB:.1f} MB"
+                )
+
+        sample = {
+            "cycle": self._cycle,
+            "timestamp": time.time(),
+            "products": products,
+            "rss_mb": round(rss / MB, 2) if rss is not None else None,
+            "evicted": evicted,
+        }
+        tracemalloc = sys.modules.get("tracemalloc")
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+            sample["traced_mb"] = round(traced / MB, 2)
+            sample["traced_peak_mb"] = round(peak / MB, 2)
+            tracemalloc.reset_peak()
+
+        with self._lock:
+            self._cycle += 1
+            self.cycles.append(sample)
+
+    def report(self, limit: int = 20, group: str = "lineno") -> dict:
+        """RSS por ciclo, tamanho dos caches e, se ativo, os maiores alocadores do tracemalloc."""
+        with self._lock:
+            cycles = list(self.cycles)
+        rss = current_rss()
+        data = {
+            "rss_mb": round(rss / MB, 2) if rss is not None else None,
+            "budget_mb": self.budget / MB if self.budget else None,
+            "low_memory": LOW_MEMORY,
+            "evictions": self.evictions,
+            "cache_entries": {"http": len(response_cache), "price_history": len(price_tracker)},
+            "gc": {"counts": gc.get_count(), "objects": len(gc.get_objects())},
+            "cycles": cycles,
+            "tracemalloc": None,
+        }
+
+        tracemalloc = sys.modules.get("tracemalloc")
+        if tracemalloc is None or not tracemalloc.is_tracing():
+            return data
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            )
+        )
+        traced, peak = tracemalloc.get_traced_memory()
+        top = []
+        for stat in snapshot.statistics(group)[:limit]:
+            if group == "filename":
+                location = stat.traceback[0].filename
+            else:
+                frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+                location = frames if group == "traceback" else frames[0]
+            top.append(
+                {
+                    "location": location,
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+            )
+        data["tracemalloc"] = {"traced_mb": round(traced / MB, 2), "peak_mb": round(peak / MB, 2), "top": top}
+        return data
+
+
+memory_monitor = MemoryMonitor(MEMORY_BUDGET_MB)
+
+
+# ============================================================================
+# PERFILAMENTO E LOGS DE TEMPO
+# ============================================================================
+
+PROFILER_MODES = ("cprofile", "sampling")
+
+# Limite de ciclos armados de uma vez (cada ciclo perfilado grava um arquivo)
+PROFILE_MAX_CYCLES = 50
+
+# Logs de tempo em JSON, uma linha por evento e sem o prefixo dos demais logs
+timing_logger = logging.getLogger(__name__ + ".timing")
+timing_logger.propagate = False
+if TIMING_LOG:
+    _timing_handler = logging.StreamHandler()
+    _timing_handler.setFormatter(logging.Formatter("%(message)s"))
+    timing_logger.addHandler(_timing_handler)
+
+
+def log_cycle_timings(description: str, results: list[CheckResult], phases: dict[str, float]):
+    """Uma linha JSON por produto (fases da requisicao) e uma para o ciclo (TIMING_LOG)."""
+    if not TIMING_LOG:
+        return
+    now = round(time.time(), 3)
+    for result in results:
+        if result.available is None:
+            outcome = "unknown"
+        else:
+            outcome = "available" if result.available else "unavailable"
+        timing_logger.info(
+            json.dumps(
+                {
+                    "event": "check",
+                    "ts": now,
+                    "product": product_label(result.product.url),
+                    "store": get_store_checker(result.product).name,
+                    "result": outcome,
+                    "elapsed_ms": round(result.elapsed * 1000, 2),
+                    "phases_ms": {phase: round(value * 1000, 2) for phase, value in result.timings.items()},
+                    **({"error": result.error} if result.error else {}),
+                }
+            )
+        )
+    timing_logger.info(
+        json.dumps(
+            {
+                "event": "cycle",
+                "ts": now,
+                "description": description,
+                "products": len(results),
+                "phases_ms": {phase: round(value * 1000, 2) for phase, value in phases.items()},
+            }
+        )
+    )
+
+
+class StackSampler:
+    """
+    Perfilador por amostragem: a cada intervalo, le a pilha das threads do
+    ciclo e conta cada pilha no formato "collapsed" (flamegraph.pl, speedscope).
+    Threads bloqueadas em rede tambem aparecem, entao o perfil e de tempo de parede.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.threads: set[int] = set()
+        self.counts: dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_thread(self):
+        self.threads.add(threading.get_ident())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join([names.get(ident, str(ident)), *reversed(stack)])
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def write(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """
+    Perfil de um ciclo. Com cProfile, a thread do ciclo e cada thread de
+    verificacao tem o seu perfil, somados no fim; com amostragem, as mesmas
+    threads sao registradas no StackSampler.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.sampler = StackSampler(PROFILE_SAMPLE_INTERVAL) if mode == "sampling" else None
+        self._profiles: list = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _profile(self):
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            import cProfile
+
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def start(self):
+        if self.sampler is not None:
+            self.sampler.add_thread()
+            self.sampler.start()
+        else:
+            self._profile().enable()
+            self._local.active = True
+
+    def wrap(self, fn: Callable) -> Callable:
+        """Perfila as chamadas de `fn` na thread em que rodarem."""
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if self.sampler is not None:
+                self.sampler.add_thread()
+                return fn(*args, **kwargs)
+            if getattr(self._local, "active", False):
+                return fn(*args, **kwargs)
+            profile = self._profile()
+            self._local.active = True
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._local.active = False
+
+        return wrapper
+
+    def finish(self, directory: Path, description: str) -> Path:
+        """Encerra o perfil e grava o arquivo (.pstats ou .collapsed)."""
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        if self.sampler is not None:
+            self.sampler.stop()
+            path = directory / f"cycle-{stamp}.collapsed"
+            self.sampler.write(path)
+            logger.info(f"Perfil do ciclo ({description}): {self.sampler.samples} amostras em {path}")
+            return path
+
+        import pstats
+
+        self._profile().disable()
+        self._local.active = False
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        path = directory / f"cycle-{stamp}.pstats"
+        stats.dump_stats(str(path))
+        logger.info(f"Perfil do ciclo ({description}): {len(profiles)} threads em {path}")
+        return path
+
+
+class CycleProfiler:
+    """
+    Perfilamento sob demanda: arma os proximos N ciclos (PROFILE_CYCLES ou
+    POST /debug/profile) e grava um arquivo por ciclo em <dados>/profiles.
+    """
+
+    def __init__(self):
+        self.remaining = 0
+        self.mode = "cprofile"
+        self.session: Optional[ProfileSession] = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return get_data_path() / "profiles"
+
+    def arm(self, cycles: int, mode: str):
+        if mode not in PROFILER_MODES:
+            raise ValueError(f"perfilador deve ser um de: {', '.join(PROFILER_MODES)}")
+        if not 1 <= cycles <= PROFILE_MAX_CYCLES:
+            raise ValueError(f"ciclos deve estar entre 1 e {PROFILE_MAX_CYCLES}")
+        with self._lock:
+            self.remaining = cycles
+            self.mode = mode
+        logger.info(f"Perfilamento armado: proximos {cycles} ciclos ({mode})")
+
+    def begin(self):
+        """Inicia o perfil do ciclo, se armado."""
+        with self._lock:
+            if self.remaining <= 0 or self.session is not None:
+                return
+            self.remaining -= 1
+            self.session = ProfileSession(self.mode)
+        self.session.start()
+
+    def wrap(self, fn: Callable) -> Callable:
+        """`fn` perfilada no ciclo em andamento, ou a propria `fn` se nao ha perfil."""
+        session = self.session
+        return fn if session is None else session.wrap(fn)
+
+    def end(self, description: str):
+        session, self.session = self.session, None
+        if session is None:
+            return
+        try:
+            self.directory.mkdir(exist_ok=True)
+            session.finish(self.directory, description)
+            self._prune()
+        except Exception as e:
+            logger.error(f"Erro ao gravar perfil: {e}")
+
+    def _prune(self):
+        files = sorted(self.directory.glob("cycle-*"), key=lambda path: path.stat().st_mtime)
+        for path in files[: max(0, len(files) - PROFILE_KEEP_FILES)]:
+            path.unlink(missing_ok=True)
+
+    def status(self) -> dict:
+        directory = self.directory
+        files = sorted(directory.glob("cycle-*"), reverse=True) if directory.is_dir() else []
+        with self._lock:
+            return {
+                "remaining_cycles": self.remaining,
+                "mode": self.mode,
+                "active": self.session is not None,
+                "directory": str(directory),
+                "files": [path.name for path in files],
+            }
+
+
+cycle_profiler = CycleProfiler()
+
+
+# ============================================================================
+# LIMITE DE TAXA POR HOST
+# ============================================================================
+
+
+class TokenBucket:
+    """Token bucket thread-safe para limitar a taxa de requisicoes."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """
+        Bloqueia ate haver um token disponivel. Com `deadline` (time.monotonic),
+        desiste e retorna False se o token so estaria disponivel depois dele.
+        """
+        if self.rate <= 0:
+            return True
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Mantem um token bucket independente para cada host."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def acquire(self, url: str, deadline: Optional[float] = None) -> bool:
+        """Aguarda permissao para fazer uma requisicao ao host da URL (False se passaria do `deadline`)."""
+        return self.bucket(url).acquire(deadline)
+
+    def try_acquire(self, url: str) -> bool:
+        """Pega um token do host apenas se houver um disponivel agora, sem esperar."""
+        return self.bucket(url).acquire(deadline=time.monotonic())
+
+
+# Com varios workers, o limite por host e dividido entre eles: o total enviado a loja nao muda
+rate_limiter = HostRateLimiter(RATE_LIMIT_PER_HOST / max(1, WORKERS), RATE_LIMIT_BURST)
+
+
+# ============================================================================
+# PRAZO DO CICLO E REQUISICOES DUPLICADAS (HEDGING)
+# ============================================================================
+
+
+def request_timeout(deadline: Optional[float]) -> tuple[float, float]:
+    """Timeouts (conexao, leitura) de uma requisicao, encurtados para terminar ate o prazo do ciclo."""
+    connect, read = http_client.timeout
+    if deadline is None:
+        return connect, read
+    remaining = max(0.1, deadline - time.monotonic())
+    return min(connect, remaining), min(read, remaining)
+
+
+def deadline_capped(deadline: Optional[float]) -> bool:
+    """Indica se o prazo do ciclo encurta o timeout de leitura de uma requisicao enviada agora."""
+    return deadline is not None and deadline - time.monotonic() < http_client.timeout[1]
+
+
+def is_timeout(error: requests.RequestException) -> bool:
+    """Timeout de conexao ou de leitura, inclusive durante o download do corpo em stream."""
+    if isinstance(error, requests.Timeout):
+        return True
+    return isinstance(error, requests.ConnectionError) and any(isinstance(arg, ReadTimeoutError) for arg in error.args)
+
+
+class HostLatency:
+    """
+    Latencias recentes ate os headers, por host. O percentil HEDGE_PERCENTILE
+    define quanto uma requisicao espera antes de ser duplicada. Cada tentativa
+    registra a propria latencia, entao as duplicadas nao encurtam a amostra.
+    """
+
+    def __init__(self, window: int, percentile: float, min_samples: int):
+        self.window = window
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, url: str, seconds: float):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = self._samples[host] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def hedge_delay(self, url: str) -> Optional[float]:
+        """Espera antes de duplicar uma requisicao ao host (None = amostras insuficientes)."""
+        with self._lock:
+            samples = sorted(self._samples.get(urlsplit(url).hostname or "", ()))
+        if len(samples) < max(1, self.min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+
+
+host_latency = HostLatency(HEDGE_WINDOW, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+
+# Threads das tentativas de requisicoes duplicadas (criadas sob demanda)
+hedge_executor = ThreadPoolExecutor(max_workers=max(2, 2 * MAX_CONCURRENCY), thread_name_prefix="hedge")
+
+
+def _timed_get(url: str, headers: dict, timeout: tuple[float, float]) -> tuple[requests.Response, dict[str, float]]:
+    """Uma tentativa de GET em stream: resposta com os headers recebidos e fases da conexao."""
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+    request_phases.timings = timings
+    try:
+        response = http_client.get(url, headers=headers, stream=True, timeout=timeout)
+    finally:
+        request_phases.timings = None
+    host_latency.observe(url, time.perf_counter() - started)
+    return response, timings
+
+
+def _discard_attempt(future: Future):
+    """Fecha a resposta de uma tentativa que chegou depois da vencedora."""
+    if not future.cancelled() and future.exception() is None:
+        future.result()[0].close()
+
+
+def hedged_get(url: str, headers: dict, timeout: tuple[float, float], timings: dict[str, float]) -> requests.Response:
+    """
+    GET em stream com hedging: se os headers nao chegam dentro do percentil do
+    host, uma segunda tentativa e enviada (se o limite por host permitir) e a
+    primeira resposta vence. Sem hedging, a requisicao roda na thread atual.
+    """
+    delay = host_latency.hedge_delay(url) if HEDGE_REQUESTS else None
+    if delay is None:
+        response, attempt = _timed_get(url, headers, timeout)
+        timings.update(attempt)
+        return response
+
+    primary = hedge_executor.submit(_timed_get, url, headers, timeout)
+    done, _ = wait([primary], timeout=delay)
+    attempts = {primary}
+    if not done:
+        host = urlsplit(url).hostname or ""
+        if rate_limiter.try_acquire(url):
+            attempts.add(hedge_executor.submit(_timed_get, url, headers, timeout))
+            HEDGED_TOTAL.inc(host=host, result="sent")
+        else:
+            HEDGED_TOTAL.inc(host=host, result="skipped")
+
+    error = None
+    pending = attempts
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((future for future in done if future.exception() is None), None)
+        if winner is None:
+            error = next(iter(done)).exception()
+            continue
+        for future in (done | pending) - {winner}:
+            future.add_done_callback(_discard_attempt)
+        if winner is not primary:
+            HEDGED_TOTAL.inc(host=urlsplit(url).hostname or "", result="won")
+        response, attempt = winner.result()
+        timings.update(attempt)
+        return response
+    raise error
+
+
+# ============================================================================
+# DISJUNTOR POR HOST
+# ============================================================================
+
+
+class CircuitOpenError(requests.RequestException):
+    """Requisicao nao enviada porque o circuito do host esta aberto."""
+
+
+def is_host_failure(error: requests.RequestException) -> bool:
+    """Falhas do host (rede, 5xx, 429) contam para o disjuntor; 404 e afins sao do produto."""
+    response = getattr(error, "response", None)
+    if isinstance(error, requests.HTTPError) and response is not None:
+        return response.status_code >= 500 or response.status_code == 429
+    return True
+
+
+class CircuitBreaker:
+    """
+    Disjuntor de um host. Fechado: tudo passa e as falhas sao contadas em uma
+    janela deslizante. Aberto: nada passa ate o fim do cooldown. Meio-aberto:
+    uma unica sondagem passa; sucesso fecha o circuito, falha reabre com o
+    cooldown dobrado.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    METRIC_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = self.CLOSED
+        self.outcomes: deque[bool] = deque(maxlen=max(1, BREAKER_WINDOW))
+        self.cooldown = BREAKER_COOLDOWN
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.set(self.METRIC_VALUES[state], host=self.host)
+
+    def _open(self, now: float):
+        self._set_state(self.OPEN)
+        self.opened_at = now
+        self.trips += 1
+        logger.warning(f"Circuito aberto para {self.host}: pausando verificacoes por {self.cooldown:.0f}s")
+
+    def allow(self) -> bool:
+        """Indica se uma requisicao pode ser enviada agora (no maximo uma sondagem por vez)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """Devolve a sondagem reservada por allow() sem registrar resultado (requisicao nao enviada)."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success: bool):
+        with self._lock:
+            now = time.monotonic()
+            if self.state != self.CLOSED:
+                self._probing = False
+                if success:
+                    self._set_state(self.CLOSED)
+                    self.outcomes.clear()
+                    self.cooldown = BREAKER_COOLDOWN
+                    logger.info(f"Circuito fechado para {self.host}: sondagem bem-sucedida")
+                else:
+                    self.cooldown = min(BREAKER_MAX_COOLDOWN, self.cooldown * 2)
+                    self._open(now)
+                return
+
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= BREAKER_MIN_REQUESTS and failures / len(self.outcomes) >= BREAKER_FAILURE_RATE:
+                self._open(now)
+
+    def retry_after(self) -> float:
+        """Segundos ate valer a pena tentar de novo um produto barrado pelo disjuntor."""
+        with self._lock:
+            if self.state == self.OPEN:
+                return max(1.0, self.cooldown - (time.monotonic() - self.opened_at))
+            # Sondagem em andamento: o resultado sai em instantes
+            return min(self.cooldown, 60.0)
+
+    def to_dict(self):
+        with self._lock:
+            failures = self.outcomes.count(False)
+            data = {
+                "state": self.state,
+                "failure_rate": round(failures / len(self.outcomes), 3) if self.outcomes else 0.0,
+                "requests": len(self.outcomes),
+                "trips": self.trips,
+            }
+            if self.state == self.OPEN:
+                data["retry_in_seconds"] = round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+            return data
+
+
+class HostCircuitBreakers:
+    """Mantem um disjuntor independente para cada host."""
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host)
+            return breaker
+
+    def allow(self, url: str) -> bool:
+        return self.breaker(url).allow()
+
+    def record(self, url: str, success: bool):
+        self.breaker(url).record(success)
+
+    def record_error(self, url: str, error: requests.RequestException):
+        """Registra o resultado de uma requisicao que falhou, conforme o tipo de erro."""
+        if not isinstance(error, CircuitOpenError):
+            self.breaker(url).record(not is_host_failure(error))
+
+    def status(self) -> dict:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.host: breaker.to_dict() for breaker in breakers}
+
+
+circuit_breakers = HostCircuitBreakers()
+
+
+# ============================================================================
+# AGENDADOR ADAPTATIVO
+# ============================================================================
+
+
+@dataclass(slots=True)
+class ScheduleEntry:
+    """Estado de agendamento de um produto."""
+
+    product: Product
+    interval: float
+    next_due: float = 0.0
+    # Sequencia da entrada valida no heap (as anteriores sao descartadas ao sair)
+    seq: int = -1
+    errors: int = 0
+    last_result: Optional[tuple[bool, Optional[str]]] = None
+    # Coberto pela varredura do catalogo ate este horario: nao vence antes dele
+    covered_until: float = 0.0
+
+
+class AdaptiveScheduler:
+    """
+    Agendador baseado em heap com um proximo horario por produto.
+    O intervalo de cada produto cai pela metade quando a pagina muda e cresce
+    25% quando nao muda, dentro de [MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL].
+    Prioridade e janela de lancamento encurtam o intervalo; erros aplicam
+    backoff exponencial.
+    """
+
+    SPEEDUP = 0.5
+    SLOWDOWN = 1.25
+
+    def __init__(self, products: Iterable[Product] = ()):
+        self.entries: dict[str, ScheduleEntry] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self.last_lag = 0.0
+        for product in products:
+            self.add(product)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _push(self, entry: ScheduleEntry, due: float):
+        due = max(due, entry.covered_until)
+        entry.next_due = due
+        entry.seq = next(self._seq)
+        heapq.heappush(self._heap, (due, entry.seq, entry.product.url))
+
+    def add(self, product: Product, due: Optional[float] = None):
+        """Agenda um produto novo (por padrao, para verificacao imediata)."""
+        if product.url in self.entries:
+            self.entries[product.url].product = product
+            return
+        entry = ScheduleEntry(product=product, interval=CHECK_INTERVAL)
+        self.entries[product.url] = entry
+        self._push(entry, time.time() if due is None else due)
+
+    def remove(self, url: str):
+        """Remove um produto; a entrada no heap e descartada ao ser retirada."""
+        self.entries.pop(url, None)
+
+    def cover(self, url: str, until: float):
+        """Adia a verificacao individual de um produto ate `until` (coberto pela listagem do catalogo)."""
+        entry = self.entries.get(url)
+        if entry is None:
+            return
+        entry.covered_until = until
+        if entry.next_due < until:
+            self._push(entry, until)
+
+    def _is_current(self, seq: int, url: str) -> bool:
+        entry = self.entries.get(url)
+        return entry is not None and entry.seq == seq
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        """Segundos ate o proximo produto vencer, ou None se nao houver produtos."""
+        now = time.time() if now is None else now
+        while self._heap and not self._is_current(self._heap[0][1], self._heap[0][2]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
+
+    def pop_due(self, now: Optional[float] = None) -> list[Product]:
+        """Retira todos os produtos vencidos, do mais atrasado para o mais recente."""
+        now = time.time() if now is None else now
+        due = []
+        lag = 0.0
+        while self._heap and self._heap[0][0] <= now:
+            when, seq, url = heapq.heappop(self._heap)
+            if self._is_current(seq, url):
+                due.append(self.entries[url].product)
+                lag = max(lag, now - when)
+        if due:
+            self.last_lag = lag
+        return due
+
+    def _target_interval(self, entry: ScheduleEntry) -> float:
+        product = entry.product
+        interval = entry.interval / max(product.priority, 0.01)
+        if product.release_date:
+            try:
+                days = abs((datetime.now().date() - datetime.fromisoformat(product.release_date).date()).days)
+                if days <= RELEASE_WINDOW_DAYS:
+                    interval = MIN_CHECK_INTERVAL
+            except ValueError:
+                logger.warning(f"release_date invalida para {product.name}: {product.release_date}")
+        return min(MAX_CHECK_INTERVAL, max(MIN_CHECK_INTERVAL, interval))
+
+    def reschedule(self, result: CheckResult, now: Optional[float] = None):
+        """Agenda a proxima verificacao de acordo com o resultado."""
+        entry = self.entries.get(result.product.url)
+        if entry is None:
+            return
+        now = time.time() if now is None else now
+
+        # Barrado pelo disjuntor: volta quando o host puder ser sondado, sem backoff de erro
+        if result.retry_after is not None:
+            self._push(entry, now + result.retry_after * (1 + random.uniform(0, SCHEDULE_JITTER)))
+            return
+
+        if result.error:
+            entry.errors += 1
+            delay = min(ERROR_BACKOFF_MAX, ERROR_BACKOFF_BASE * 2 ** (entry.errors - 1))
+        else:
+            entry.errors = 0
+            current = (result.available, result.price)
+            if entry.last_result is not None:
+                factor = self.SPEEDUP if current != entry.last_result else self.SLOWDOWN
+                entry.interval = min(MAX_CHECK_INTERVAL, max(MIN_CHECK_INTERVAL, entry.interval * factor))
+            entry.last_result = current
+            delay = self._target_interval(entry)
+
+        delay *= 1 + random.uniform(-SCHEDULE_JITTER, SCHEDULE_JITTER)
+        self._push(entry, now + delay)
+
+
+# ============================================================================
+# EVENTOS DE DISPONIBILIDADE (SSE E LONG-POLL)
+# ============================================================================
+
+
+@dataclass(slots=True)
+class Event:
+    """Mudanca de disponibilidade ou de preco de um produto, publicada em /events."""
+
+    id: int
+    kind: str
+    timestamp: float
+    data: dict
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "event": self.kind, "timestamp": self.timestamp, **self.data}
+
+    def sse(self) -> bytes:
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {json.dumps(self.to_dict())}\n\n".encode("utf-8")
+
+
+class EventLog:
+    """
+    Buffer circular dos ultimos eventos, com espera por eventos novos. Os ids
+    comecam no instante da partida (em ms): um Last-Event-ID de uma execucao
+    anterior, ou mais antigo que o buffer, e reportado como lacuna (gap).
+    """
+
+    def __init__(self, size: int, max_clients: int):
+        self._events: deque[Event] = deque(maxlen=max(1, size))
+        self._next_id = int(time.time() * 1000)
+        self._changed = threading.Condition()
+        self.max_clients = max_clients
+        self.clients = 0
+        self.published = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def publish(self, kind: str, data: dict) -> Event:
+        with self._changed:
+            event = Event(self._next_id, kind, round(time.time(), 3), data)
+            self._next_id += 1
+            self._events.append(event)
+            self.published += 1
+            self._changed.notify_all()
+        return event
+
+    def _since(self, last_id: int) -> tuple[list[Event], bool]:
+        first = self._events[0].id if self._events else self._next_id
+        if last_id > self.last_id or last_id < first - 1:
+            return list(self._events), True
+        return [event for event in self._events if event.id > last_id], False
+
+    def since(self, last_id: Optional[int]) -> tuple[list[Event], bool]:
+        """Eventos depois de `last_id` e se houve lacuna (None = apenas os proximos eventos)."""
+        if last_id is None:
+            return [], False
+        with self._changed:
+            return self._since(last_id)
+
+    def wait(self, last_id: int, timeout: float) -> tuple[list[Event], bool]:
+        """Como `since`, mas espera ate `timeout` segundos se ainda nao ha eventos novos."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                events, gap = self._since(last_id)
+                remaining = deadline - time.monotonic()
+                if events or gap or remaining <= 0:
+                    return events, gap
+                self._changed.wait(remaining)
+
+    def open_client(self) -> bool:
+        """Reserva uma conexao em /events; False se o limite EVENTS_MAX_CLIENTS foi atingido."""
+        with self._changed:
+            if self.clients >= self.max_clients:
+                return False
+            self.clients += 1
+            return True
+
+    def close_client(self):
+        with self._changed:
+            self.clients -= 1
+
+
+event_log = EventLog(EVENTS_BUFFER_SIZE, EVENTS_MAX_CLIENTS)
+
+
+def publish_changes(result: CheckResult, previous_available: Optional[bool], previous_price: Optional[str]):
+    """Publica as mudancas de um resultado conhecido em relacao ao anterior (produto novo = indisponivel)."""
+    product = result.product
+    base = {"product": product.name, "url": product.url}
+    if result.available != bool(previous_available):
+        event_log.publish(
+            "availability",
+            {
+                **base,
+                "available": result.available,
+                "previous": previous_available,
+                "price": result.price,
+                "price_cents": parse_brl_cents(result.price),
+            },
+        )
+    if result.price and previous_price and result.price != previous_price:
+        event_log.publish(
+            "price",
+            {
+                **base,
+                "available": result.available,
+                "price": result.price,
+                "price_cents": parse_brl_cents(result.price),
+                "previous_price": previous_price,
+                "previous_price_cents": parse_brl_cents(previous_price),
+            },
+        )
+
+
+# ============================================================================
+# SERVIDOR HTTP PARA HEALTH CHECK
+# ============================================================================
+
+
+class HealthSnapshot:
+    """
+    Respostas dos endpoints de saude ja serializadas.
+    Montadas pelo loop de verificacao e trocadas de uma vez so, para que os
+    probes apenas copiem bytes prontos. Apenas o uptime e calculado por requisicao.
+    """
+
+    LIVE_BODY = json.dumps({"alive": True}).encode("utf-8")
+
+    def __init__(self, status: HealthStatus):
+        data = status.to_dict()
+        data.pop("uptime_seconds", None)
+        is_ready = status.last_check is not None
+
+        self.started = datetime.fromisoformat(status.started_at).timestamp()
+        self.health_code = 200 if status.last_check_success else 503
+        # JSON sem a chave de fechamento, completado com o uptime na resposta
+        self.health_prefix = json.dumps(data)[:-1].encode("utf-8")
+        self.ready_code = 200 if is_ready else 503
+        self.ready_body = json.dumps({"ready": is_ready}).encode("utf-8")
+
+    def health_body(self) -> bytes:
+        return self.health_prefix + b', "uptime_seconds": %.3f}' % (time.time() - self.started)
+
+
+health_snapshot: Optional[HealthSnapshot] = None
+
+
+def publish_health():
+    """Gera um novo snapshot de saude e o publica atomicamente."""
+    global health_snapshot
+    health_snapshot = HealthSnapshot(health_status)
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Handler HTTP para endpoints de health check."""
+
+    # Timeout de socket por requisicao: clientes lentos nao prendem a thread
+    timeout = HEALTH_REQUEST_TIMEOUT
+
+    def log_message(self, format, *args):
+        """Silencia logs de requisicoes HTTP."""
+        pass
+
+    def _send(self, code: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code: int, data: dict):
+        self._send(code, json.dumps(data).encode("utf-8"))
+
+    def _send_history(self, query: str):
+        """Serie de precos de um produto (URL, SKU ou ultimo trecho da URL)."""
+        params = parse_qs(query)
+        key = params.get("product", [""])[0].strip()
+        if not key:
+            self._send_json(400, {"error": "Parametro 'product' obrigatorio"})
+            return
+
+        try:
+            since = float(params["since"][0]) if "since" in params else None
+            limit = int(params["limit"][0]) if "limit" in params else None
+        except ValueError:
+            self._send_json(400, {"error": "Parametros 'since' e 'limit' devem ser numericos"})
+            return
+
+        product = find_product(key)
+        url = product.url if product is not None else key
+        samples = price_tracker.samples(url, since, limit, fresh=supervisor is not None)
+        if product is None and not samples:
+            self._send_json(404, {"error": f"Produto nao encontrado: {key}"})
+            return
+
+        prices = [cents for _, cents, _ in samples if cents is not None]
+        self._send_json(
+            200,
+            {
+                "product": product.name if product is not None else None,
+                "url": url,
+                "min_price_cents": min(prices) if prices else None,
+                "samples": [
+                    {
+                        "timestamp": timestamp,
+                        "price_cents": cents,
+                        "price": format_brl(cents / 100) if cents is not None else None,
+                        "available": available,
+                    }
+                    for timestamp, cents, available in samples
+                ],
+            },
+        )
+
+    def _send_memory(self, query: str):
+        """RSS por ciclo e maiores alocadores do tracemalloc (se TRACEMALLOC_FRAMES > 0)."""
+        params = parse_qs(query)
+        group = params.get("group", ["lineno"])[0]
+        if group not in ("lineno", "filename", "traceback"):
+            self._send_json(400, {"error": "Parametro 'group' deve ser lineno, filename ou traceback"})
+            return
+        try:
+            limit = int(params.get("limit", ["20"])[0])
+        except ValueError:
+            self._send_json(400, {"error": "Parametro 'limit' deve ser numerico"})
+            return
+        self._send_json(200, memory_monitor.report(limit, group))
+
+    def _profile_allowed(self) -> bool:
+        """POST /debug/profile: com PROFILE_TOKEN, exige o token; sem ele, apenas clientes locais."""
+        if PROFILE_TOKEN:
+            supplied = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if hmac.compare_digest(supplied.encode(), PROFILE_TOKEN.encode()):
+                return True
+            self._send_json(401, {"error": "Token invalido ou ausente (Authorization: Bearer <PROFILE_TOKEN>)"})
+            return False
+        client = self.client_address[0]
+        if client == "::1" or client.startswith("127.") or client.startswith("::ffff:127."):
+            return True
+        self._send_json(403, {"error": "POST /debug/profile so e aceito de localhost sem PROFILE_TOKEN"})
+        return False
+
+    def _arm_profile(self, query: str):
+        """Arma o perfilamento dos proximos ciclos (?cycles=N&mode=cprofile|sampling)."""
+        if not self._profile_allowed():
+            return
+        params = parse_qs(query)
+        try:
+            cycles = int(params.get("cycles", ["1"])[0])
+            cycle_profiler.arm(cycles, params.get("mode", [PROFILER])[0])
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(202, cycle_profiler.status())
+
+    def _send_events(self, query: str):
+        """
+        Eventos de disponibilidade e preco. Com `Accept: text/event-stream`, abre
+        um stream SSE; caso contrario, long-poll em JSON (?since=ID&timeout=S).
+        A retomada usa o header Last-Event-ID ou ?since=ID.
+        """
+        if supervisor is not None:
+            # O supervisor nao verifica produtos: os eventos saem do /events de cada worker
+            host = urlsplit(f"//{self.headers.get('Host', '')}").hostname or "localhost"
+            host = f"[{host}]" if ":" in host else host
+            self._send_json(
+                409,
+                {
+                    "error": "O supervisor nao publica eventos; conecte-se ao /events de cada worker",
+                    "workers": [f"http://{host}:{worker['health_port']}/events" for worker in supervisor.status()],
+                },
+            )
+            return
+
+        params = parse_qs(query)
+        try:
+            since = params.get("since", [self.headers.get("Last-Event-ID")])[0]
+            since = int(since) if since not in (None, "") else None
+            timeout = min(EVENTS_POLL_TIMEOUT, float(params.get("timeout", [EVENTS_POLL_TIMEOUT])[0]))
+        except ValueError:
+            self._send_json(400, {"error": "Parametros 'since' e 'timeout' devem ser numericos"})
+            return
+
+        if not event_log.open_client():
+            self._send_json(503, {"error": f"Limite de {event_log.max_clients} conexoes em /events"})
+            return
+        try:
+            if "text/event-stream" in self.headers.get("Accept", ""):
+                self._stream_events(since)
+                return
+            cursor = event_log.last_id if since is None else since
+            events, gap = event_log.wait(cursor, max(0.0, timeout))
+        finally:
+            event_log.close_client()
+        last_id = events[-1].id if events else (event_log.last_id if gap else cursor)
+        self._send_json(200, {"events": [event.to_dict() for event in events], "last_id": last_id, "gap": gap})
+
+    def _stream_events(self, since: Optional[int]):
+        """Stream SSE: eventos perdidos desde `since`, depois os novos, com keep-alive."""
+        # Cursor definido antes dos headers: eventos publicados enquanto o cliente conecta nao se perdem
+        events, gap = event_log.since(since)
+        cursor = event_log.last_id if since is None else since
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("X-Accel-Buffering", "no")
+            self.end_headers()
+            self.wfile.write(b"retry: 3000\n\n")
+            while True:
+                if gap:
+                    # O cliente perdeu eventos: deve recarregar o estado em /health antes de seguir
+                    self.wfile.write(f"event: gap\ndata: {json.dumps({'last_id': event_log.last_id})}\n\n".encode())
+                    cursor = event_log.last_id
+                for event in events:
+                    self.wfile.write(event.sse())
+                    cursor = event.id
+                if not events and not gap:
+                    self.wfile.write(b": keep-alive\n\n")
+                events, gap = event_log.wait(cursor, EVENTS_KEEPALIVE)
+        except OSError:
+            # Cliente desconectou (BrokenPipe, ConnectionReset ou timeout de escrita)
+            self.close_connection = True
+
+    def do_POST(self):
+        route, _, query = self.path.partition("?")
+        if route == "/debug/profile":
+            self._arm_profile(query)
+        else:
+            self._send_json(404, {"error": "Not found", "endpoints": ["/debug/profile"]})
+
+    def do_GET(self):
+        snapshot = health_snapshot
+        if snapshot is None:
+            publish_health()
+            snapshot = health_snapshot
+
+        route, _, query = self.path.partition("?")
+
+        if route == "/health" or route == "/":
+            self._send(snapshot.health_code, snapshot.health_body())
+
+        elif route == "/history":
+            self._send_history(query)
+
+        elif route == "/events":
+            self._send_events(query)
+
+        elif route == "/debug/memory":
+            self._send_memory(query)
+
+        elif route == "/debug/profile":
+            self._send_json(200, cycle_profiler.status())
+
+        elif route == "/metrics":
+            self._send(200, metrics.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+        elif route == "/ready":
+            # Readiness check - pronto para receber trafego
+            self._send(snapshot.ready_code, snapshot.ready_body)
+
+        elif route == "/live":
+            # Liveness check - aplicacao esta viva
+            self._send(200, HealthSnapshot.LIVE_BODY)
+
+        else:
+            endpoints = [
+                "/health",
+                "/ready",
+                "/live",
+                "/metrics",
+                "/history",
+                "/events",
+                "/debug/memory",
+                "/debug/profile",
+            ]
+            self._send_json(404, {"error": "Not found", "endpoints": endpoints})
+
+
+class HealthServer(ThreadingHTTPServer):
+    """Servidor multithread: cada probe e atendido em sua propria thread."""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+
+def start_health_server():
+    """Inicia o servidor HTTP para health check em uma thread separada."""
+    publish_health()
+    server = HealthServer(("0.0.0.0", HEALTH_PORT), HealthHandler)
+    logger.info(f"Servidor de health check iniciado na porta {HEALTH_PORT}")
+    server.serve_forever()
+
+
+# ============================================================================
+# FUNCOES DE NOTIFICACAO
+# ============================================================================
+
+
+def send_pushover(
+    title: str, message: str, url: Optional[str] = None, user_key: Optional[str] = None, api_token: Optional[str] = None
+):
+    """Envia notificacao via Pushover (credenciais do assinante ou das variaveis de ambiente)."""
+    user_key = user_key or PUSHOVER_USER_KEY
+    api_token = api_token or PUSHOVER_API_TOKEN
+    if not user_key or not api_token:
+        logger.warning("Pushover nao configurado. Defina PUSHOVER_USER_KEY e PUSHOVER_API_TOKEN")
+        return False
+
+    try:
+        data = {
+            "token": api_token,
+            "user": user_key,
+            "title": title,
+            "message": message,
+            "priority": 1,
+            "sound": "cashregister",
+        }
+        if url:
+            data["url"] = url
+            data["url_title"] = "Comprar Agora"
+
+        response = http_client.post("https://api.pushover.net/1/messages.json", data=data, timeout=10)
+        response.raise_for_status()
+        logger.info("Notificacao Pushover enviada com sucesso!")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao enviar Pushover: {e}")
+        return False
+
+
+def send_ntfy(
+    title: str, message: str, url: Optional[str] = None, topic: Optional[str] = None, server: Optional[str] = None
+):
+    """Envia notificacao via Ntfy.sh (topico do assinante ou NTFY_TOPIC)."""
+    try:
+        headers = {
+            "Title": title,
+            "Priority": "high",
+            "Tags": "book,moneybag",
+        }
+        if url:
+            headers["Click"] = url
+            headers["Actions"] = f"view, Comprar Agora, {url}"
+
+        response = http_client.post(
+            f"{server or NTFY_SERVER}/{topic or NTFY_TOPIC}", data=message.encode("utf-8"), headers=headers, timeout=10
+        )
+        response.raise_for_status()
+        logger.info("Notificacao Ntfy enviada com sucesso!")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao enviar Ntfy: {e}")
+        return False
+
+
+def send_telegram(
+    title: str, message: str, url: Optional[str] = None, chat_id: Optional[str] = None, bot_token: Optional[str] = None
+):
+    """Envia notificacao via Telegram Bot (chat do assinante ou TELEGRAM_CHAT_ID)."""
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    bot_token = bot_token or TELEGRAM_BOT_TOKEN
+    if not bot_token or not chat_id:
+        logger.warning("Telegram nao configurado. Defina TELEGRAM_BOT_TOKEN e TELEGRAM_CHAT_ID")
+        return False
+
+    try:
+        text = f"*{title}*\n\n{message}"
+        if url:
+            text += f"\n\n[Comprar Agora]({url})"
+
+        response = http_client.post(
+            f"https://api.telegram.org/bot{bot_token}/sendMessage",
+            json={
+                "chat_id": chat_id,
+                "text": text,
+                "parse_mode": "Markdown",
+                "disable_web_page_preview": False,
+            },
+            timeout=10,
+        )
+        response.raise_for_status()
+        logger.info("Notificacao Telegram enviada com sucesso!")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao enviar Telegram: {e}")
+        return False
+
+
+def send_none(title: str, message: str, url: Optional[str] = None):
+    """Apenas registra a notificacao no log."""
+    logger.info(f"Notificacao (modo none): {title} - {message}")
+    return True
+
+
+NOTIFIERS = {
+    "pushover": send_pushover,
+    "ntfy": send_ntfy,
+    "telegram": send_telegram,
+    "none": send_none,
+}
+
+# Opcoes de cada canal aceitas no arquivo de assinantes (como <canal>_<opcao>);
+# a primeira e obrigatoria, as demais usam as variaveis de ambiente como padrao
+CHANNEL_OPTIONS = {
+    "pushover": ("user_key", "api_token"),
+    "ntfy": ("topic", "server"),
+    "telegram": ("chat_id", "bot_token"),
+    "none": (),
+}
+
+
+def notification_services() -> list[str]:
+    """Servicos configurados em NOTIFICATION_SERVICE (separados por virgula)."""
+    services = []
+    for service in NOTIFICATION_SERVICE.lower().split(","):
+        service = service.strip()
+        if service in NOTIFIERS:
+            services.append(service)
+        elif service:
+            logger.warning(f"Servico de notificacao desconhecido: {service}")
+    return services
+
+
+def send_notification(title: str, message: str, url: Optional[str] = None):
+    """Envia notificacao por todos os servicos configurados (sincrono)."""
+    results = [NOTIFIERS[service](title, message, url) for service in notification_services()]
+    return any(results)
+
+
+# ============================================================================
+# DESPACHO ASSINCRONO DE NOTIFICACOES
+# ============================================================================
+
+
+@dataclass
+class NotificationJob:
+    """
+    Mensagem a entregar. `dedup_urls` sao as chaves (ver notify_key) marcadas
+    como notificadas apos a entrega. Sem `subscriber`, vai para os canais de
+    NOTIFICATION_SERVICE; com ele, para os canais do assinante.
+    """
+
+    title: str
+    message: str
+    url: Optional[str] = None
+    dedup_urls: list[str] = field(default_factory=list)
+    subscriber: Optional[str] = None
+
+
+def notify_key(subscriber: Optional[str], url: str) -> str:
+    """Chave de notificacao de um produto: a URL para os canais globais, URL#assinante para um assinante."""
+    return url if subscriber is None else f"{url}#{subscriber}"
+
+
+def build_availability_digest(events: list[dict], subscriber: Optional[str] = None) -> NotificationJob:
+    """Agrupa os produtos que ficaram disponiveis no ciclo em uma unica mensagem."""
+    urls = [notify_key(subscriber, event["url"]) for event in events]
+
+    if len(events) == 1:
+        event = events[0]
+        price_info = f" por {event['price']}" if event["price"] else ""
+        return NotificationJob(
+            title="Berserk Disponivel!",
+            message=f"{event['name']}{price_info} esta disponivel para compra!",
+            url=event["url"],
+            dedup_urls=urls,
+            subscriber=subscriber,
+        )
+
+    lines = []
+    for event in events:
+        price_info = f" - {event['price']}" if event["price"] else ""
+        lines.append(f"- {event['name']}{price_info}\n  {event['url']}")
+    return NotificationJob(
+        title=f"Berserk Disponivel! ({len(events)} produtos)",
+        message="Disponiveis para compra:\n" + "\n".join(lines),
+        url=events[0]["url"],
+        dedup_urls=urls,
+        subscriber=subscriber,
+    )
+
+
+def build_price_drop_digest(drops: list[PriceDrop], subscriber: Optional[str] = None) -> NotificationJob:
+    """Agrupa as quedas de preco do ciclo em uma unica mensagem."""
+    lines = [
+        f"- {drop.product.name}: {format_brl(drop.old_cents / 100)} -> {format_brl(drop.new_cents / 100)} (-{drop.percent:.0f}%)"
+        for drop in drops
+    ]
+    title = "Berserk: preco caiu!" if len(drops) == 1 else f"Berserk: preco caiu! ({len(drops)} produtos)"
+    return NotificationJob(title=title, message="\n".join(lines), url=drops[0].product.url, subscriber=subscriber)
+
+
+class NotificationDispatcher:
+    """
+    Fila de notificacoes entregue por uma thread em segundo plano.
+    Cada mensagem e enviada a todos os canais em paralelo, com retentativas,
+    backoff e limite de taxa por provedor. Os produtos so sao marcados como
+    notificados depois que ao menos um canal confirma a entrega.
+    """
+
+    def __init__(self):
+        self.queue: "queue.Queue[NotificationJob]" = queue.Queue()
+        self.pending: set[str] = set()
+        self.delivered = 0
+        self.failed = 0
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_pending(self, url: str) -> bool:
+        with self._lock:
+            return url in self.pending
+
+    def submit(self, job: NotificationJob):
+        """Enfileira uma mensagem sem bloquear o chamador."""
+        with self._lock:
+            self.pending.update(job.dedup_urls)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._thread.start()
+        self.queue.put(job)
+
+    def submit_availability(self, events: list[dict], subscriber: Optional[str] = None):
+        """Enfileira um resumo unico com os produtos disponiveis do ciclo (para o assinante, se informado)."""
+        if events:
+            self.submit(build_availability_digest(events, subscriber))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda a fila esvaziar. Retorna False se o timeout expirar antes."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _bucket(self, service: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(service)
+            if bucket is None:
+                rate, burst = NOTIFY_RATE_LIMITS.get(service, (1.0, 1))
+                bucket = self._buckets[service] = TokenBucket(rate, burst)
+            return bucket
+
+    def _send_with_retry(self, service: str, job: NotificationJob, options: dict[str, str]) -> bool:
+        for attempt in range(NOTIFY_RETRIES + 1):
+            self._bucket(service).acquire()
+            started = time.perf_counter()
+            sent = NOTIFIERS[service](job.title, job.message, job.url, **options)
+            NOTIFY_SECONDS.observe(time.perf_counter() - started, channel=service, result="ok" if sent else "error")
+            if sent:
+                return True
+            if attempt < NOTIFY_RETRIES:
+                delay = NOTIFY_RETRY_BACKOFF * 2**attempt
+                logger.warning(f"Falha ao notificar via {service}, nova tentativa em {delay:g}s")
+                time.sleep(delay)
+        return False
+
+    def _deliver(self, job: NotificationJob):
+        if job.subscriber is None:
+            services = notification_services()
+            channel_options = {}
+        else:
+            # Assinante removido depois do envio a fila: a mensagem nao e entregue e a reserva e liberada
+            subscriber = subscriber_registry.subscribers.get(job.subscriber) if subscriber_registry else None
+            services = subscriber.services if subscriber is not None else []
+            channel_options = {service: subscriber.options(service) for service in services}
+        delivered = False
+
+        if services:
+            with ThreadPoolExecutor(max_workers=len(services), thread_name_prefix="notify") as executor:
+                delivered = any(
+                    list(
+                        executor.map(
+                            lambda service: self._send_with_retry(service, job, channel_options.get(service, {})),
+                            services,
+                        )
+                    )
+                )
+
+        try:
+            if delivered:
+                self.delivered += 1
+                if job.dedup_urls:
+                    state_store.update_notified(added=job.dedup_urls, removed=())
+            else:
+                self.failed += 1
+                recipient = f" ({job.subscriber})" if job.subscriber else ""
+                logger.error(f"Notificacao nao entregue{recipient}: {job.title}")
+                if job.dedup_urls:
+                    state_store.release_claims(job.dedup_urls)
+        finally:
+            with self._lock:
+                self.pending.difference_update(job.dedup_urls)
+            publish_health()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._deliver(job)
+            except Exception as e:
+                logger.error(f"Erro no despacho de notificacoes: {e}")
+            finally:
+                self.queue.task_done()
+
+
+notification_dispatcher = NotificationDispatcher()
+
+
+# ============================================================================
+# PARSE EM PROCESSOS SEPARADOS
+# ============================================================================
+
+# Vagas de memoria compartilhada ja abertas neste processo de parse (por nome)
+_attached_slots: dict = {}
+
+
+def _start_parse_worker() -> int:
+    """Tarefa vazia: forca a criacao do processo de parse antes do primeiro ciclo."""
+    return os.getpid()
+
+
+def _parse_in_worker(slot_name: str, size: int, encoding: str, store: str) -> tuple[bool, Optional[str]]:
+    """Executada no processo de parse: le a pagina da vaga compartilhada e aplica o verificador da loja."""
+    slot = _attached_slots.get(slot_name)
+    if slot is None:
+        from multiprocessing import shared_memory
+
+        # O processo de parse usa o resource_tracker do processo principal: a vaga
+        # continua registrada uma unica vez e e apagada pelo dono no shutdown
+        slot = _attached_slots[slot_name] = shared_memory.SharedMemory(name=slot_name)
+    return STORE_CHECKERS[store].check_body(bytes(slot.buf[:size]), encoding)
+
+
+class ParsePool:
+    """
+    Etapa de parse fora do GIL: as paginas sao analisadas em processos separados,
+    entao downloads e o servidor de health check nao param durante o parse.
+    Cada pagina e copiada para uma vaga de memoria compartilhada e o pipe leva
+    apenas o nome da vaga. As vagas livres formam a fila limitada entre download
+    e parse: sem vaga, a thread da verificacao espera (backpressure).
+    """
+
+    def __init__(self, workers: int, slots: int, slot_size: int, timeout: float = PARSE_TIMEOUT):
+        import multiprocessing
+        from multiprocessing import shared_memory
+
+        self.workers = workers
+        self.slot_size = slot_size
+        self.timeout = timeout
+        # forkserver: os processos de parse nao herdam threads nem locks do processo principal
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._executor = self._new_executor()
+        self._slots = [shared_memory.SharedMemory(create=True, size=slot_size) for _ in range(slots)]
+        self._free: "queue.Queue" = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+        self._lock = threading.Lock()
+        self.parsed = 0
+        self.inline = 0
+        self.restarts = 0
+        self.timeouts = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, mp_context=self._context)
+
+    def warm_up(self):
+        """Cria os processos de parse agora, fora do caminho da primeira verificacao."""
+        futures = [self._executor.submit(_start_parse_worker) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def in_use(self) -> int:
+        return len(self._slots) - self._free.qsize()
+
+    def _count(self, attribute: str):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def check_body(
+        self, checker: "StoreChecker", body: bytearray, encoding: str, timings: dict[str, float]
+    ) -> tuple[bool, Optional[str]]:
+        """
+        Analisa a pagina em um processo de parse. Paginas maiores que a vaga, e
+        as que esperam mais que `timeout` por uma vaga ou pelo resultado, ficam
+        na thread atual.
+        """
+        size = len(body)
+        if size > self.slot_size:
+            self._count("inline")
+            return checker.check_body(bytes(body), encoding)
+
+        waiting = time.perf_counter()
+        try:
+            slot = self._free.get(timeout=self.timeout)
+        except queue.Empty:
+            timings["parse_queue"] = time.perf_counter() - waiting
+            logger.warning(f"Fila de parse cheia por {self.timeout:.0f}s; analisando a pagina na thread")
+            return self._inline_after_timeout(checker, body, encoding)
+        timings["parse_queue"] = time.perf_counter() - waiting
+
+        slot.buf[:size] = body
+        executor = self._executor
+        future = None
+        try:
+            future = executor.submit(_parse_in_worker, slot.name, size, encoding, checker.name)
+            result = future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            self._restart(executor)
+            self._count("inline")
+            return checker.check_body(bytes(body), encoding)
+        except TimeoutError:
+            logger.warning(f"Parse sem resposta em {self.timeout:.0f}s; analisando a pagina na thread")
+            return self._inline_after_timeout(checker, body, encoding)
+        finally:
+            # A vaga so volta para a fila quando nenhum processo pode mais le-la
+            if future is None or future.done() or future.cancel():
+                self._free.put(slot)
+            else:
+                future.add_done_callback(lambda _: self._free.put(slot))
+        self._count("parsed")
+        return result
+
+    def _inline_after_timeout(
+        self, checker: "StoreChecker", body: bytearray, encoding: str
+    ) -> tuple[bool, Optional[str]]:
+        self._count("timeouts")
+        self._count("inline")
+        return checker.check_body(bytes(body), encoding)
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Um processo de parse morreu: recria o pool (uma vez, mesmo com varias threads afetadas)."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            logger.error("Processo de parse encerrado inesperadamente; recriando o pool de parse")
+            self._executor = self._new_executor()
+            self.restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "slots": len(self._slots),
+            "in_use": self.in_use(),
+            "parsed": self.parsed,
+            "inline": self.inline,
+            "restarts": self.restarts,
+            "timeouts": self.timeouts,
+        }
+
+
+# Pool de parse do processo atual (None = parse na thread da verificacao)
+parse_pool: Optional[ParsePool] = None
+
+
+def start_parse_pool():
+    """Inicia o pool de parse configurado por PARSE_WORKERS no processo que verifica produtos."""
+    global parse_pool
+
+    if PARSE_WORKERS <= 0 or parse_pool is not None:
+        return
+    slots = PARSE_QUEUE_SIZE if PARSE_QUEUE_SIZE > 0 else 2 * PARSE_WORKERS
+    parse_pool = ParsePool(PARSE_WORKERS, slots, PARSE_SLOT_SIZE)
+    atexit.register(parse_pool.shutdown)
+    parse_pool.warm_up()
+    logger.info(f"Pool de parse: {PARSE_WORKERS} processos, {slots} paginas na fila")
+
+
+# ============================================================================
+# FUNCOES DE VERIFICACAO
+# ============================================================================
+
+
+class Selector:
+    """Seletor CSS compilado uma unica vez e reutilizado em todas as paginas."""
+
+    def __init__(self, css: str):
+        self.css = css
+
+    @functools.cached_property
+    def compiled(self):
+        """Seletor do soupsieve, usado apenas pelos backends do BeautifulSoup."""
+        import soupsieve
+
+        return soupsieve.compile(self.css)
+
+
+class HtmlNode:
+    """Elemento HTML com consultas por seletor, independente do backend."""
+
+    def __init__(self, tree, backend: str):
+        self.tree = tree
+        self.backend = backend
+
+    def _select(self, selector: Selector):
+        if self.backend == "selectolax":
+            return self.tree.css_first(selector.css)
+        return selector.compiled.select_one(self.tree)
+
+    def select(self, selector: Selector) -> list["HtmlNode"]:
+        """Todos os elementos que casam com o seletor."""
+        if self.backend == "selectolax":
+            elements = self.tree.css(selector.css)
+        else:
+            elements = selector.compiled.select(self.tree)
+        return [HtmlNode(element, self.backend) for element in elements]
+
+    def exists(self, selector: Selector) -> bool:
+        return self._select(selector) is not None
+
+    def select_text(self, selector: Selector, separator: str = "") -> Optional[str]:
+        """Texto do primeiro elemento que casa com o seletor, ou None."""
+        element = self._select(selector)
+        if element is None:
+            return None
+        if self.backend == "selectolax":
+            return element.text(separator=separator, strip=True)
+        return element.get_text(separator, strip=True)
+
+    def select_attr(self, selector: Selector, name: str) -> Optional[str]:
+        """Atributo do primeiro elemento que casa com o seletor, ou None."""
+        element = self._select(selector)
+        if element is None:
+            return None
+        if self.backend == "selectolax":
+            return element.attributes.get(name)
+        return element.get(name)
+
+
+class HtmlDocument(HtmlNode):
+    """
+    Documento HTML completo, montado com o backend de parse informado a partir
+    dos bytes da resposta: o texto decodificado existe apenas dentro do parser.
+    Usado como context manager, a arvore e liberada ao sair do bloco.
+    """
+
+    def __init__(self, body: bytes, encoding: str, backend: str):
+        if backend == "selectolax":
+            from selectolax.lexbor import LexborHTMLParser
+
+            # O lexbor le UTF-8 direto dos bytes; outras codificacoes sao convertidas antes
+            if codecs.lookup(encoding).name != "utf-8":
+                body = body.decode(encoding, errors="replace")
+            tree = LexborHTMLParser(body)
+        else:
+            from bs4 import BeautifulSoup
+
+            tree = BeautifulSoup(body, backend, from_encoding=encoding)
+        super().__init__(tree, backend)
+
+    def close(self):
+        """Libera a arvore. A do BeautifulSoup tem ciclos e so sairia da memoria na coleta de lixo."""
+        if self.tree is not None and self.backend != "selectolax":
+            self.tree.decompose()
+        self.tree = None
+
+    def __enter__(self) -> "HtmlDocument":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def resolve_parser_backend(preferred: str) -> str:
+    """Escolhe o backend de parse disponivel, com html.parser como fallback."""
+    available = {"selectolax": selectolax_available, "lxml": lxml_available, "html.parser": True}
+    preferred = preferred.lower()
+
+    if preferred == "auto":
+        return next(name for name, ok in available.items() if ok)
+    if available.get(preferred):
+        return preferred
+
+    logger.warning(f"Backend de parse '{preferred}' indisponivel, usando html.parser")
+    return "html.parser"
+
+
+parser_backend = resolve_parser_backend(PARSER_BACKEND)
+
+
+def parse_html(body: bytes, encoding: str) -> HtmlDocument:
+    """Monta o documento com o backend de parse configurado."""
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    return HtmlDocument(body, encoding, parser_backend)
+
+
+class AvailabilityDetector:
+    """
+    Detector incremental de disponibilidade.
+    Recebe a resposta em blocos e chega a um veredito assim que encontra um
+    marcador de produto indisponivel, sem montar a arvore DOM.
+    """
+
+    def __init__(self, markers: tuple[bytes, ...]):
+        self.markers = markers
+        self.overlap = max((len(m) for m in markers), default=1) - 1
+        self.body = bytearray()
+        self.hasher = hashlib.blake2b(digest_size=16)
+        self.out_of_stock = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """Adiciona um bloco. Retorna True quando o veredito ja esta definido."""
+        # Reexamina o final do bloco anterior caso o marcador esteja dividido
+        start = max(0, len(self.body) - self.overlap)
+        self.body += chunk
+        self.hasher.update(chunk)
+        if any(self.body.find(marker, start) != -1 for marker in self.markers):
+            self.out_of_stock = True
+        return self.out_of_stock
+
+    @property
+    def body_hash(self) -> str:
+        return self.hasher.hexdigest()
+
+    def take_body(self) -> bytes:
+        """Corpo lido ate aqui. O buffer e liberado para nao manter duas copias durante o parse."""
+        body = bytes(self.body)
+        self.body = bytearray()
+        return body
+
+
+def format_brl(value) -> Optional[str]:
+    """Formata um valor numerico como preco em reais (ex.: 79.9 -> 'R$ 79,90')."""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return "R$ " + f"{amount:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+# Disponibilidades do schema.org que permitem comprar o produto
+JSON_LD_AVAILABLE = {"instock", "limitedavailability", "onlineonly", "preorder", "presale"}
+JSON_LD_PATTERN = re.compile(
+    rb"""<script\b[^>]*\btype\s*=\s*["']application/ld\+json["'][^>]*>(.*?)</script>""",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _json_ld_products(data) -> Iterator[dict]:
+    """Percorre um bloco JSON-LD (objeto, lista ou @graph) retornando os itens do tipo Product."""
+    if isinstance(data, list):
+        for item in data:
+            yield from _json_ld_products(item)
+    elif isinstance(data, dict):
+        kind = data.get("@type")
+        if kind == "Product" or (isinstance(kind, list) and "Product" in kind):
+            yield data
+        yield from _json_ld_products(data.get("@graph"))
+
+
+def parse_json_ld(body: bytes) -> Optional[tuple[bool, Optional[str]]]:
+    """
+    Le a oferta do produto nos blocos JSON-LD da pagina, sem montar o DOM.
+    Retorna (disponivel, preco ou None), ou None se a pagina nao traz a informacao.
+    """
+    if b"application/ld+json" not in body:
+        return None
+
+    for match in JSON_LD_PATTERN.finditer(body):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+
+        for product in _json_ld_products(data):
+            offers = product.get("offers")
+            offer = offers[0] if isinstance(offers, list) and offers else offers
+            if not isinstance(offer, dict) or not offer.get("availability"):
+                continue
+
+            availability = str(offer["availability"]).rsplit("/", 1)[-1].lower()
+            if availability not in JSON_LD_AVAILABLE:
+                return False, None
+            return True, format_brl(offer.get("price", offer.get("lowPrice")))
+    return None
+
+
+class StoreChecker:
+    """
+    Verificador de uma loja. Cada loja declara uma unica vez seus seletores e
+    marcadores de indisponibilidade; a pagina e analisada em uma so passada.
+    """
+
+    name = ""
+    label = ""
+    hosts: tuple[str, ...] = ()
+
+    # Marcadores encontrados no HTML bruto que encerram a leitura em stream
+    stream_markers: tuple[bytes, ...] = ()
+
+    # SKUs por consulta em lote (0 = a loja nao tem API estruturada)
+    batch_size = 0
+
+    def check_body(self, body: bytes, encoding: str) -> tuple[bool, Optional[str]]:
+        """
+        Analisa a pagina completa. Retorna (disponivel, preco ou None).
+        Dados estruturados (JSON-LD) tem prioridade sobre o HTML renderizado.
+        """
+        structured = parse_json_ld(body)
+        if structured is not None:
+            return structured
+        with parse_html(body, encoding) as doc:
+            return self.parse(doc)
+
+    def parse(self, doc: HtmlDocument) -> tuple[bool, Optional[str]]:
+        raise NotImplementedError
+
+    def listing_url(self, query: str, page: int) -> Optional[str]:
+        """URL da pagina de busca, ou None se a loja nao suporta o modo catalogo."""
+        return None
+
+    def parse_listing(self, doc: HtmlDocument) -> tuple[list["ListingEntry"], bool]:
+        """Extrai os produtos de uma pagina de listagem. Retorna (itens, ha_proxima_pagina)."""
+        raise NotImplementedError
+
+    def sku(self, url: str) -> Optional[str]:
+        """SKU do produto derivado da URL, ou None se nao puder ser consultado em lote."""
+        return None
+
+    @property
+    def batch_url(self) -> Optional[str]:
+        """URL da API estruturada (usada pelo disjuntor e limite de taxa do host)."""
+        return None
+
+    def fetch_batch(self, skus: list[str], deadline: Optional[float] = None) -> dict[str, tuple[bool, Optional[str]]]:
+        """
+        Consulta varios SKUs de uma vez na API estruturada da loja, terminando ate
+        o prazo do ciclo. Retorna {sku: (disponivel, preco ou None)}; SKUs
+        ausentes voltam para o HTML.
+        """
+        return {}
+
+
+@dataclass(slots=True)
+class ListingEntry:
+    """Produto extraido de uma pagina de listagem. available=None indica item ambiguo."""
+
+    name: str
+    url: str
+    available: Optional[bool]
+    price: Optional[str]
+
+
+STORE_CHECKERS: dict[str, StoreChecker] = {}
+
+
+def register_store_checker(checker: StoreChecker) -> StoreChecker:
+    """Registra o verificador de uma loja pelo seu nome."""
+    STORE_CHECKERS[checker.name] = checker
+    return checker
+
+
+def get_store_checker(product: Product) -> StoreChecker:
+    """Retorna o verificador da loja do produto (pelo nome ou pelo host da URL)."""
+    checker = STORE_CHECKERS.get(product.store.lower())
+    if checker is not None:
+        return checker
+
+    host = urlsplit(product.url).hostname or ""
+    for checker in STORE_CHECKERS.values():
+        if any(host == h or host.endswith("." + h) for h in checker.hosts):
+            return checker
+    raise ValueError(f"Loja desconhecida para {product.name}: {product.store}")
+
+
+class PaniniChecker(StoreChecker):
+    """Loja Panini: produtos indisponiveis mostram link para 'productalert'."""
+
+    name = "panini"
+    label = "Panini"
+    hosts = ("panini.com.br",)
+    stream_markers = (b"productalert",)
+
+    PRICE = Selector("span.price")
+    PRICE_PATTERN = re.compile(
+        rb"""<span\b[^>]*\bclass\s*=\s*["'](?:[^"']*\s)?price(?:\s[^"']*)?["'][^>]*>(.*?)</span>""",
+        re.IGNORECASE | re.DOTALL,
+    )
+
+    def check_body(self, body: bytes, encoding: str) -> tuple[bool, Optional[str]]:
+        # O marcador ja foi procurado no stream; falta apenas o preco
+        structured = parse_json_ld(body)
+        if structured is not None:
+            return structured
+
+        match = self.PRICE_PATTERN.search(body)
+        if match is None:
+            return True, None
+
+        content = match.group(1)
+        if b"<" not in content:
+            return True, html.unescape(content.decode(encoding, errors="replace")).strip() or None
+
+        # Preco com marcacao interna: recorre ao parser completo
+        return super().check_body(body, encoding)
+
+    def parse(self, doc: HtmlDocument) -> tuple[bool, Optional[str]]:
+        return True, doc.select_text(self.PRICE)
+
+    LISTING_ITEM = Selector("li.product-item")
+    LISTING_LINK = Selector("a.product-item-link")
+    LISTING_OUT_OF_STOCK = Selector(".stock.unavailable")
+    LISTING_IN_STOCK = Selector("button.tocart, form[data-role='tocart-form']")
+    LISTING_NEXT_PAGE = Selector("a.action.next")
+
+    def listing_url(self, query: str, page: int) -> Optional[str]:
+        return CATALOG_SEARCH_URL.format(query=quote_plus(query), page=page)
+
+    def parse_listing(self, doc: HtmlDocument) -> tuple[list[ListingEntry], bool]:
+        entries = []
+        for item in doc.select(self.LISTING_ITEM):
+            url = item.select_attr(self.LISTING_LINK, "href")
+            name = item.select_text(self.LISTING_LINK, " ")
+            if not url or not name:
+                continue
+
+            # Selo de estoque: indisponivel, botao de compra, ou nenhum dos dois (ambiguo)
+            if item.exists(self.LISTING_OUT_OF_STOCK):
+                entries.append(ListingEntry(name, url, False, None))
+            elif item.exists(self.LISTING_IN_STOCK):
+                entries.append(ListingEntry(name, url, True, item.select_text(self.PRICE)))
+            else:
+                entries.append(ListingEntry(name, url, None, None))
+        return entries, doc.exists(self.LISTING_NEXT_PAGE)
+
+    GRAPHQL_QUERY = (
+        "query($skus: [String], $size: Int) { products(filter: {sku: {in: $skus}}, pageSize: $size) "
+        "{ items { sku stock_status price_range { minimum_price { final_price { value currency } } } } } }"
+    )
+
+    @property
+    def batch_size(self) -> int:
+        return STRUCTURED_BATCH_SIZE if PANINI_GRAPHQL_URL else 0
+
+    def sku(self, url: str) -> Optional[str]:
+        # URLs da Panini terminam no SKU: /berserk-edicao-de-luxo-vol-40-amaxs040r
+        slug = urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1].removesuffix(".html")
+        token = slug.rsplit("-", 1)[-1].lower()
+        return token if any(c.isdigit() for c in token) else None
+
+    @property
+    def batch_url(self) -> Optional[str]:
+        return PANINI_GRAPHQL_URL or None
+
+    def fetch_batch(self, skus: list[str], deadline: Optional[float] = None) -> dict[str, tuple[bool, Optional[str]]]:
+        response = http_client.post(
+            PANINI_GRAPHQL_URL,
+            json={"query": self.GRAPHQL_QUERY, "variables": {"skus": skus, "size": len(skus)}},
+            headers={**HEADERS, "Accept": "application/json"},
+            timeout=request_timeout(deadline),
+        )
+        response.raise_for_status()
+
+        payload = response.json()
+        products = (payload.get("data") or {}).get("products")
+        if products is None:
+            raise ValueError(f"resposta sem produtos: {payload.get('errors')}")
+
+        results = {}
+        for item in products.get("items") or []:
+            price = ((item.get("price_range") or {}).get("minimum_price") or {}).get("final_price") or {}
+            available = item.get("stock_status") == "IN_STOCK"
+            results[str(item.get("sku", "")).lower()] = (available, format_brl(price.get("value")) if available else None)
+        return results
+
+
+class AmazonChecker(StoreChecker):
+    """Loja Amazon: disponibilidade pelo bloco #availability e botoes de compra."""
+
+    name = "amazon"
+    label = "Amazon"
+    hosts = ("amazon.com.br", "amazon.com")
+
+    UNAVAILABLE_INDICATORS = tuple(
+        indicator.lower() for indicator in ("Atualmente indisponivel", "Currently unavailable", "Temporariamente esgotado")
+    )
+    AVAILABILITY = Selector("div#availability")
+    ADD_TO_CART = Selector("input#add-to-cart-button")
+    BUY_NOW = Selector("input#buy-now-button")
+    PRICE_WHOLE = Selector("span.a-price-whole")
+    PRICE_FRACTION = Selector("span.a-price-fraction")
+
+    def parse(self, doc: HtmlDocument) -> tuple[bool, Optional[str]]:
+        availability = " ".join((doc.select_text(self.AVAILABILITY, " ") or "").lower().split())
+        if any(indicator in availability for indicator in self.UNAVAILABLE_INDICATORS):
+            return False, None
+
+        if not (doc.exists(self.ADD_TO_CART) or doc.exists(self.BUY_NOW)):
+            return False, None
+
+        price_whole = doc.select_text(self.PRICE_WHOLE)
+        if not price_whole:
+            return True, None
+        return True, f"R$ {price_whole}{doc.select_text(self.PRICE_FRACTION) or ''}"
+
+
+register_store_checker(PaniniChecker())
+register_store_checker(AmazonChecker())
+
+
+def finish_stream(response: requests.Response):
+    """Encerra uma resposta em stream, drenando o restante se for pequeno."""
+    try:
+        remaining = int(response.headers.get("Content-Length", "-1")) - response.raw.tell()
+        if 0 <= remaining <= STREAM_DRAIN_LIMIT:
+            response.raw.drain_conn()
+    except (ValueError, requests.RequestException, OSError):
+        pass
+    http_client.record_download(response)
+    response.close()
+
+
+def parse_body(
+    checker: StoreChecker, detector: AvailabilityDetector, encoding: str, timings: dict[str, float]
+) -> tuple[bool, Optional[str]]:
+    """Etapa de parse: no pool de processos (PARSE_WORKERS) ou na thread atual."""
+    if parse_pool is None:
+        return checker.check_body(detector.take_body(), encoding)
+    try:
+        return parse_pool.check_body(checker, detector.body, encoding, timings)
+    finally:
+        detector.body = bytearray()
+
+
+def fetch_store_availability(
+    url: str, checker: StoreChecker, timings: Optional[dict[str, float]] = None, deadline: Optional[float] = None
+) -> tuple[bool, Optional[str]]:
+    """
+    Verifica disponibilidade de uma URL com o verificador da loja.
+    Retorna (disponivel, preco ou None) e propaga requests.RequestException.
+    Se informado, `timings` recebe a duracao em segundos das fases 'fetch' (e das
+    subfases dns, connect, tls, ttfb e download) e 'parse'. Com `deadline`
+    (prazo do ciclo), os timeouts da requisicao terminam ate ele.
+    """
+    timings = {} if timings is None else timings
+    cached = response_cache.get(url)
+    label = product_label(url)
+    started = time.perf_counter()
+
+    headers = {**HEADERS, **response_cache.conditional_headers(cached)}
+    try:
+        response = hedged_get(url, headers, request_timeout(deadline), timings)
+    except requests.RequestException:
+        FETCH_SECONDS.observe(time.perf_counter() - started, store=checker.name, product=label, status="error")
+        raise
+
+    # Tempo ate os headers, descontado o estabelecimento de uma conexao nova
+    headers_at = time.perf_counter()
+    setup = sum(timings.get(phase, 0.0) for phase in ("dns", "connect", "tls"))
+    timings["ttfb"] = max(0.0, headers_at - started - setup)
+
+    try:
+        if response.status_code == 304 and cached is not None:
+            response_cache.record("not_modified")
+            return cached.available, cached.price
+
+        response.raise_for_status()
+
+        # A leitura para assim que um marcador de indisponibilidade aparece
+        detector = AvailabilityDetector(checker.stream_markers)
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            if detector.feed(chunk):
+                break
+    finally:
+        finish_stream(response)
+        timings["fetch"] = time.perf_counter() - started
+        timings["download"] = timings["fetch"] - (headers_at - started)
+        FETCH_SECONDS.observe(timings["fetch"], store=checker.name, product=label, status=response.status_code)
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    if detector.out_of_stock:
+        response_cache.record("misses")
+        response_cache.store(url, CacheEntry(etag, last_modified, None, False, None))
+        return False, None
+
+    # Pagina identica a ultima vista: reaproveita o resultado sem parse
+    body_hash = detector.body_hash
+    if cached is not None and cached.body_hash == body_hash:
+        response_cache.record("unchanged")
+        response_cache.store(url, CacheEntry(etag, last_modified, body_hash, cached.available, cached.price))
+        return cached.available, cached.price
+
+    response_cache.record("misses")
+    parse_started = time.perf_counter()
+    available, price = parse_body(checker, detector, response.encoding or "utf-8", timings)
+    timings["parse"] = time.perf_counter() - parse_started
+    PARSE_SECONDS.observe(timings["parse"], store=checker.name, product=label)
+    response_cache.store(url, CacheEntry(etag, last_modified, body_hash, available, price))
+    return available, price
+
+
+def check_store_availability(
+    url: str, checker: StoreChecker, timings: Optional[dict[str, float]] = None
+) -> tuple[Optional[bool], Optional[str]]:
+    """
+    Verifica disponibilidade de uma URL com o verificador da loja, pelo mesmo
+    caminho de check_product (disjuntor e limite de taxa do host).
+    Retorna (disponivel, preco ou None); em erros, disponivel e None (desconhecido).
+    """
+    result = check_product(Product(name=product_label(url), url=url, store=checker.name))
+    if timings is not None:
+        timings.update(result.timings)
+    return result.available, result.price
+
+
+def check_panini_availability(url: str) -> tuple[Optional[bool], Optional[str]]:
+    """
+    Verifica disponibilidade na loja Panini.
+    Retorna (disponivel, preco ou None); disponivel e None se a loja nao respondeu.
+    """
+    return check_store_availability(url, STORE_CHECKERS["panini"])
+
+
+def check_amazon_availability(url: str) -> tuple[Optional[bool], Optional[str]]:
+    """Verifica disponibilidade na Amazon."""
+    return check_store_availability(url, STORE_CHECKERS["amazon"])
+
+
+DEADLINE_ERROR = "prazo do ciclo esgotado"
+
+
+def deadline_result(product: Product, elapsed: float = 0.0, count: bool = True) -> CheckResult:
+    """Produto nao verificado ate o prazo do ciclo: desconhecido, volta no ciclo seguinte sem backoff."""
+    if count:
+        CHECKS_TOTAL.inc(store=get_store_checker(product).name, result="deadline")
+    return CheckResult(
+        product=product,
+        available=None,
+        price=None,
+        elapsed=elapsed,
+        error=DEADLINE_ERROR,
+        retry_after=0.0,
+    )
+
+
+class CheckCutoff:
+    """
+    Corte do ciclo no prazo. Cada verificacao registra o proprio resultado ao
+    terminar; depois de close(), as que ainda terminarem ja foram contadas como
+    "deadline" por run_checks e nao contam de novo em berserk_checks_total.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._closed = False
+        self._finished: set[str] = set()
+
+    def finish(self, url: str) -> bool:
+        """Marca a verificacao como terminada no prazo; False se o ciclo ja a abandonou."""
+        with self._lock:
+            if self._closed:
+                return False
+            self._finished.add(url)
+            return True
+
+    def close(self) -> set[str]:
+        """Encerra o ciclo e retorna as URLs que terminaram a tempo."""
+        with self._lock:
+            self._closed = True
+            return set(self._finished)
+
+
+def check_product(
+    product: Product, deadline: Optional[float] = None, cutoff: Optional[CheckCutoff] = None
+) -> CheckResult:
+    """
+    Verifica um produto respeitando o disjuntor, o limite de taxa do host e o
+    prazo do ciclo (`deadline`, em time.monotonic). Erros, circuito aberto e
+    prazo esgotado resultam em disponibilidade desconhecida (None). Com
+    `cutoff`, o resultado so e contado se o ciclo ainda o estiver esperando.
+    """
+    checker = get_store_checker(product)
+
+    def counted() -> bool:
+        return cutoff is None or cutoff.finish(product.url)
+
+    breaker = circuit_breakers.breaker(product.url)
+    if not breaker.allow():
+        if counted():
+            CHECKS_TOTAL.inc(store=checker.name, result="skipped")
+        return CheckResult(
+            product=product,
+            available=None,
+            price=None,
+            elapsed=0.0,
+            error=f"circuito aberto para {breaker.host}",
+            retry_after=breaker.retry_after(),
+        )
+
+    # Sem requisicao enviada, uma sondagem do circuito meio-aberto e devolvida:
+    # sem isso o disjuntor ficaria esperando um resultado que nunca chega
+    waiting = time.monotonic()
+    if (deadline is not None and waiting >= deadline) or not rate_limiter.acquire(product.url, deadline):
+        breaker.release()
+        return deadline_result(product, count=counted())
+
+    logger.info(f"Verificando: {product.name}")
+    started = time.monotonic()
+    # Espera no limite de taxa do host, fora do tempo da verificacao
+    timings: dict[str, float] = {"wait": started - waiting}
+    capped = deadline_capped(deadline)
+    error = None
+
+    try:
+        is_available, price = fetch_store_availability(product.url, checker, timings, deadline)
+        circuit_breakers.record(product.url, True)
+    except requests.RequestException as e:
+        if capped and is_timeout(e):
+            # Timeout encurtado pelo prazo do ciclo: o host pode so estar lento, entao
+            # nao conta para o disjuntor e o produto volta no proximo ciclo sem backoff
+            breaker.release()
+            logger.warning(f"Prazo do ciclo esgotado verificando {product.name}")
+            return deadline_result(product, time.monotonic() - started, count=counted())
+        circuit_breakers.record_error(product.url, e)
+        logger.error(f"Erro ao acessar {checker.label}: {e}")
+        is_available, price, error = None, None, str(e)
+    except Exception as e:
+        # Erro local (parse, pool de processos): nao diz nada sobre o host, mas a
+        # sondagem do circuito meio-aberto precisa ser devolvida
+        breaker.release()
+        logger.error(f"Erro ao verificar {product.name}: {e!r}")
+        is_available, price, error = None, None, repr(e)
+
+    if counted():
+        CHECKS_TOTAL.inc(store=checker.name, result="error" if error else ("available" if is_available else "unavailable"))
+    return CheckResult(
+        product=product,
+        available=is_available,
+        price=price,
+        elapsed=time.monotonic() - started,
+        timings=timings,
+        error=error,
+    )
+
+
+def check_batch(
+    checker: StoreChecker, products: list[Product], deadline: Optional[float] = None
+) -> dict[str, CheckResult]:
+    """
+    Verifica um lote de produtos com uma unica consulta a API estruturada.
+    Retorna {url: resultado}; em caso de erro ou sem token do limite de taxa
+    ate o prazo, retorna {} e os produtos voltam para o HTML.
+    """
+    url = checker.batch_url
+    breaker = circuit_breakers.breaker(url)
+    if not breaker.allow():
+        return {}
+    if not rate_limiter.acquire(url, deadline):
+        breaker.release()
+        return {}
+
+    by_sku = {checker.sku(product.url): product for product in products}
+    started = time.monotonic()
+    capped = deadline_capped(deadline)
+    try:
+        found = checker.fetch_batch(list(by_sku), deadline)
+        circuit_breakers.record(url, True)
+    except (requests.RequestException, ValueError) as e:
+        if isinstance(e, requests.RequestException) and capped and is_timeout(e):
+            breaker.release()
+        elif isinstance(e, requests.RequestException):
+            circuit_breakers.record_error(url, e)
+        else:
+            circuit_breakers.record(url, True)
+        FETCH_SECONDS.observe(time.monotonic() - started, store=checker.name, product="batch", status="error")
+        logger.warning(f"Consulta em lote na {checker.label} falhou, usando as paginas: {e}")
+        return {}
+
+    elapsed = time.monotonic() - started
+    FETCH_SECONDS.observe(elapsed, store=checker.name, product="batch", status=200)
+
+    results = {}
+    for sku, product in by_sku.items():
+        if sku not in found:
+            continue
+        is_available, price = found[sku]
+        CHECKS_TOTAL.inc(store=checker.name, result="available" if is_available else "unavailable")
+        results[product.url] = CheckResult(
+            product=product, available=is_available, price=price, elapsed=elapsed, timings={"fetch": elapsed}
+        )
+    return results
+
+
+def check_batches(products: list[Product], deadline: Optional[float] = None) -> dict[str, CheckResult]:
+    """
+    Verifica em lote os produtos das lojas com API estruturada. Retorna {url: resultado}.
+    Lotes que nao comecam ate o prazo ficam de fora (e viram resultados de prazo esgotado).
+    """
+    groups: dict[str, list[Product]] = {}
+    for product in products:
+        checker = get_store_checker(product)
+        if checker.batch_size and checker.sku(product.url):
+            groups.setdefault(checker.name, []).append(product)
+
+    results = {}
+    for name, group in groups.items():
+        checker = STORE_CHECKERS[name]
+        for start in range(0, len(group), checker.batch_size):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            results.update(check_batch(checker, group[start : start + checker.batch_size], deadline))
+
+    if results:
+        logger.info(f"{len(results)} produtos verificados pela API estruturada")
+    return results
+
+
+def run_checks(products: list[Product]) -> list[CheckResult]:
+    """
+    Verifica os produtos, preservando a ordem da lista. Lojas com API estruturada
+    sao consultadas em lote; o restante tem a pagina verificada em paralelo.
+    Com CYCLE_DEADLINE, o que nao terminar no prazo fica para o proximo ciclo.
+    """
+    if not products:
+        return []
+
+    started = time.monotonic()
+    deadline = started + CYCLE_DEADLINE if CYCLE_DEADLINE > 0 else None
+    batched = check_batches(products, deadline)
+    remaining = [product for product in products if product.url not in batched]
+    if not remaining:
+        return [batched[product.url] for product in products]
+
+    workers = max(1, min(MAX_CONCURRENCY, len(remaining)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="checker")
+    cutoff = CheckCutoff() if deadline is not None else None
+    try:
+        check = cycle_profiler.wrap(functools.partial(check_product, deadline=deadline, cutoff=cutoff))
+        futures = [executor.submit(check, product) for product in remaining]
+        if deadline is not None:
+            wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        else:
+            wait(futures)
+
+        # Verificacoes ainda em andamento no prazo terminam em segundo plano e sao
+        # descartadas. Elas ainda atualizam disjuntor e cache (a resposta e real), e
+        # os tokens que ja tomaram do limite por host saem do orcamento do proximo ciclo
+        finished = cutoff.close() if cutoff is not None else None
+        late = 0
+        checked = []
+        for product, future in zip(remaining, futures):
+            if finished is None or product.url in finished:
+                checked.append(future.result())
+            else:
+                late += 1
+                checked.append(deadline_result(product, time.monotonic() - started))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    skipped = sum(result.error == DEADLINE_ERROR for result in checked)
+    if skipped:
+        logger.warning(
+            f"Prazo do ciclo ({CYCLE_DEADLINE:g}s) esgotado: {skipped} produtos ficam para o proximo ciclo "
+            f"({late} interrompidos)"
+        )
+    checked = iter(checked)
+    return [batched[product.url] if product.url in batched else next(checked) for product in products]
+
+
+def load_notified_products() -> set:
+    """Carrega lista de produtos ja notificados."""
+    return state_store.load_notified()
+
+
+# Ultima disponibilidade conhecida de cada produto (para o health check)
+latest_availability: dict[str, bool] = {}
+
+# Ultimo preco conhecido de cada produto (para os eventos de mudanca de preco)
+latest_prices: dict[str, str] = {}
+
+
+def run_cycle(description: str, fetch: Callable[[], list[CheckResult]]) -> list[CheckResult]:
+    """
+    Executa um ciclo de verificacao: obtem os resultados com `fetch` e aplica
+    notificacoes, estado persistido e status de saude.
+    """
+    global health_status
+
+    logger.info("=" * 50)
+    logger.info(f"Verificacao iniciada: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} ({description})")
+    logger.info("=" * 50)
+
+    health_status.last_check = datetime.now().isoformat()
+    health_status.total_checks += 1
+    publish_health()
+
+    cycle_profiler.begin()
+    try:
+        notified_products = load_notified_products()
+        # Avisos agrupados por destinatario (None = canais globais): cada URL foi
+        # buscada uma vez e o resultado e distribuido a quem a acompanha
+        new_available: dict[Optional[str], list[dict]] = defaultdict(list)
+        price_drops: dict[Optional[str], list[PriceDrop]] = defaultdict(list)
+        cleared = []
+
+        cycle_started = time.monotonic()
+        results = fetch()
+        phases = {"checks": time.monotonic() - cycle_started}
+
+        unknown = 0
+        for result in results:
+            product = result.product
+
+            # Resultado desconhecido: mantem a ultima disponibilidade e o estado de notificacao
+            if result.available is None:
+                unknown += 1
+                continue
+
+            publish_changes(result, latest_availability.get(product.url), latest_prices.get(product.url))
+            latest_availability[product.url] = result.available
+            if result.price:
+                latest_prices[product.url] = result.price
+            recipients = notification_recipients(product.url)
+            drop = price_tracker.record(result)
+            if drop is not None:
+                logger.info(f"{product.name} -> preco caiu {drop.percent:.0f}%")
+                for recipient in recipients:
+                    price_drops[recipient].append(drop)
+
+            if result.available:
+                price_info = f" - {result.price}" if result.price else ""
+                logger.info(f"{product.name} -> DISPONIVEL!{price_info}")
+
+                event = {"name": product.name, "url": product.url, "price": result.price}
+                for recipient in recipients:
+                    key = notify_key(recipient, product.url)
+                    if key not in notified_products and not notification_dispatcher.is_pending(key):
+                        new_available[recipient].append(event)
+            else:
+                logger.info(f"{product.name} -> Indisponivel")
+                cleared.extend(
+                    key for key in (notify_key(recipient, product.url) for recipient in recipients) if key in notified_products
+                )
+
+        logger.info(f"{len(results)} produtos verificados em {time.monotonic() - cycle_started:.1f}s")
+        if unknown:
+            logger.warning(f"{unknown} produtos sem resultado (erro ou circuito aberto): estado mantido")
+        http = http_client.stats.to_dict()
+        logger.info(
+            f"HTTP: {http['requests']} requisicoes, {http['connections_opened']} conexoes abertas, "
+            f"{http['connections_reused']} reutilizadas, {http['bytes_downloaded']} bytes"
+        )
+
+        # Notificacoes sao agrupadas e entregues em segundo plano; o produto so
+        # e marcado como notificado depois da entrega. A reserva no banco garante
+        # que, com varios workers, apenas um deles notifica cada produto
+        notify_started = time.perf_counter()
+        if DRY_RUN:
+            if new_available or price_drops:
+                logger.info(
+                    f"Dry-run: {sum(map(len, new_available.values()))} avisos de disponibilidade e "
+                    f"{sum(map(len, price_drops.values()))} quedas de preco nao enviados"
+                )
+        else:
+            claimed = state_store.claim_notifications(
+                notify_key(recipient, event["url"]) for recipient, events in new_available.items() for event in events
+            )
+            for recipient, events in new_available.items():
+                notification_dispatcher.submit_availability(
+                    [event for event in events if notify_key(recipient, event["url"]) in claimed], recipient
+                )
+            for recipient, drops in price_drops.items():
+                notification_dispatcher.submit(build_price_drop_digest(drops, recipient))
+        phases["notify"] = time.perf_counter() - notify_started
+
+        save_started = time.perf_counter()
+        state_store.update_notified(added=(), removed=cleared)
+        state_store.record_checks(results)
+        response_cache.save()
+        price_tracker.save()
+        phases["persist"] = time.perf_counter() - save_started
+        STATE_SAVE_SECONDS.observe(phases["persist"])
+        phases["total"] = time.monotonic() - cycle_started
+        CYCLE_SECONDS.observe(phases["total"])
+        memory_monitor.after_cycle(len(results))
+        log_cycle_timings(description, results, phases)
+
+        # Atualiza status de saude
+        health_status.last_check_success = True
+        health_status.products_available = sum(latest_availability.values())
+        publish_health()
+
+        logger.info("=" * 50 + "\n")
+        return results
+
+    except Exception as e:
+        logger.error(f"Erro durante verificacao: {e}")
+        health_status.last_check_success = False
+        health_status.total_errors += 1
+        publish_health()
+        raise
+
+    finally:
+        cycle_profiler.end(description)
+
+
+def check_products(products: list[Product]) -> list[CheckResult]:
+    """Verifica os produtos informados e notifica os que ficaram disponiveis."""
+    return run_cycle(f"{len(products)} produtos", lambda: run_checks(products))
+
+
+# ============================================================================
+# MODO CATALOGO (PAGINAS DE LISTAGEM)
+# ============================================================================
+
+
+def _normalize(text: str) -> str:
+    """Texto em minusculas e sem acentos, para comparar nomes."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def discover_catalog(query: str, checker: StoreChecker) -> list[ListingEntry]:
+    """
+    Le as paginas de busca da loja e retorna os volumes cujo nome contem todas
+    as palavras da busca. Cada pagina traz varios volumes de uma vez.
+    """
+    words = _normalize(query).split()
+    entries: dict[str, ListingEntry] = {}
+
+    for page in range(1, CATALOG_MAX_PAGES + 1):
+        url = checker.listing_url(query, page)
+        if url is None:
+            break
+
+        if not circuit_breakers.allow(url):
+            raise CircuitOpenError(f"circuito aberto para {urlsplit(url).hostname}")
+        rate_limiter.acquire(url)
+        try:
+            response = http_client.get(url, headers=HEADERS)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            circuit_breakers.record_error(url, e)
+            raise
+        circuit_breakers.record(url, True)
+
+        with parse_html(response.content, response.encoding or "utf-8") as doc:
+            page_entries, has_next = checker.parse_listing(doc)
+        for entry in page_entries:
+            entry.url = urljoin(response.url, entry.url)
+            name = _normalize(entry.name)
+            if all(word in name for word in words):
+                entries.setdefault(entry.url, entry)
+
+        if not has_next or not page_entries:
+            break
+
+    return list(entries.values())
+
+
+def fetch_catalog(scheduler: AdaptiveScheduler) -> list[CheckResult]:
+    """
+    Verifica os volumes das buscas de CATALOG_QUERIES pela listagem.
+    Volumes novos sao registrados como produtos; apenas itens ambiguos
+    (sem selo de estoque) tem a pagina do produto baixada. No modo supervisor,
+    volumes configurados no shard de outro worker ficam com ele; os que nao
+    estao em lista nenhuma sao adotados por este worker (o unico que le o catalogo).
+    """
+    checker = STORE_CHECKERS["panini"]
+    known = {product.url: product for product in PRODUCTS}
+    results = []
+    ambiguous = []
+    # Volumes resolvidos pela listagem so voltam a ser verificados depois da proxima varredura
+    covered_until = time.time() + CATALOG_INTERVAL * (1 + SCHEDULE_JITTER)
+
+    for query in CATALOG_QUERIES:
+        try:
+            entries = discover_catalog(query, checker)
+        except requests.RequestException as e:
+            logger.error(f"Erro ao ler catalogo '{query}': {e}")
+            continue
+
+        logger.info(f"Catalogo '{query}': {len(entries)} volumes")
+        for entry in entries:
+            if sharded_elsewhere(entry.url):
+                # Volume adotado antes de entrar em uma lista volta para o dono
+                adopted = known.pop(entry.url, None)
+                if adopted is not None:
+                    PRODUCTS.remove(adopted)
+                    scheduler.remove(entry.url)
+                continue
+
+            product = known.get(entry.url)
+            if product is None:
+                product = known[entry.url] = Product(name=entry.name, url=entry.url, store=checker.name)
+                PRODUCTS.append(product)
+                scheduler.add(product, due=time.time() + CHECK_INTERVAL)
+                logger.info(f"Novo volume no catalogo: {entry.name}")
+
+            if entry.available is None:
+                ambiguous.append(product)
+            else:
+                scheduler.cover(product.url, covered_until)
+                results.append(CheckResult(product=product, available=entry.available, price=entry.price, elapsed=0.0))
+
+    return results + run_checks(ambiguous)
+
+
+def check_catalog(scheduler: AdaptiveScheduler) -> list[CheckResult]:
+    """Executa um ciclo completo do modo catalogo."""
+    return run_cycle(f"catalogo: {len(CATALOG_QUERIES)} buscas", lambda: fetch_catalog(scheduler))
+
+
+# ============================================================================
+# ARQUIVO DE PRODUTOS (RECARGA A QUENTE)
+# ============================================================================
+
+
+def load_data_file(path: Path):
+    """Le um arquivo JSON ou YAML (pela extensao); PyYAML so e importado para YAML."""
+    with open(path, encoding="utf-8") as f:
+        if path.suffix.lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML nao instalado (pip install pyyaml)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class ProductCatalog:
+    """
+    Produtos carregados de um arquivo JSON, YAML ou CSV, indexados por URL e SKU.
+    O arquivo e verificado pelo mtime; uma mudanca gera apenas a diferenca
+    (adicionados, removidos, alterados) em relacao a ultima leitura valida.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.by_url: dict[str, Product] = {}
+        self.by_sku: dict[str, Product] = {}
+        self._skus: dict[str, str] = {}
+        self._stamp = None
+
+    def __len__(self):
+        return len(self.by_url)
+
+    def find(self, key: str) -> Optional[Product]:
+        """Busca um produto pela URL ou pelo SKU."""
+        return self.by_url.get(key) or self.by_sku.get(key.lower())
+
+    def _read_rows(self) -> list[dict]:
+        if self.path.suffix.lower() == ".csv":
+            with open(self.path, encoding="utf-8", newline="") as f:
+                return list(csv.DictReader(f))
+
+        data = load_data_file(self.path)
+        if isinstance(data, dict):
+            data = data.get("products")
+        if not isinstance(data, list):
+            raise ValueError("o arquivo deve conter uma lista de produtos")
+        return data
+
+    @staticmethod
+    def _parse_row(row: dict) -> Product:
+        name = str(row.get("name") or "").strip()
+        url = str(row.get("url") or "").strip()
+        if not name or not url:
+            raise ValueError("'name' e 'url' sao obrigatorios")
+
+        release_date = row.get("release_date")
+        product = Product(
+            name=name,
+            url=url,
+            store=str(row.get("store") or "panini").strip().lower(),
+            priority=float(row.get("priority") or 1.0),
+            release_date=str(release_date).strip() if release_date else None,
+        )
+        get_store_checker(product)
+        return product
+
+    def load(self) -> dict[str, Product]:
+        """Le o arquivo inteiro; linhas invalidas sao ignoradas com aviso."""
+        products = {}
+        for number, row in enumerate(self._read_rows(), start=1):
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("entrada deve ser um objeto")
+                product = self._parse_row(row)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"{self.path.name}: produto {number} ignorado: {e}")
+                continue
+            products[product.url] = product
+        return products
+
+    def poll(self) -> Optional[tuple[list[Product], list[Product], list[Product]]]:
+        """
+        Rele o arquivo se o mtime ou o tamanho mudaram.
+        Retorna (adicionados, removidos, alterados), ou None se nada mudou ou a leitura falhou.
+        """
+        try:
+            stat = self.path.stat()
+        except OSError as e:
+            if self._stamp != "missing":
+                logger.error(f"Arquivo de produtos indisponivel: {e}")
+                self._stamp = "missing"
+            return None
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+
+        try:
+            products = self.load()
+        except Exception as e:
+            # Arquivo invalido (ex.: gravacao pela metade): mantem a ultima versao valida
+            logger.error(f"Erro ao ler {self.path}: {e}")
+            return None
+
+        previous = self.by_url
+        added = [product for url, product in products.items() if url not in previous]
+        removed = [product for url, product in previous.items() if url not in products]
+        changed = [product for url, product in products.items() if url in previous and previous[url] != product]
+
+        # Indice por SKU atualizado apenas com a diferenca
+        self.by_url = products
+        for product in removed:
+            sku = self._skus.pop(product.url, None)
+            if sku is not None:
+                self.by_sku.pop(sku, None)
+        for product in added:
+            sku = get_store_checker(product).sku(product.url)
+            if sku:
+                self._skus[product.url] = sku
+                self.by_sku[sku] = product
+        for product in changed:
+            sku = self._skus.get(product.url)
+            if sku is not None:
+                self.by_sku[sku] = product
+        return added, removed, changed
+
+
+product_catalog = ProductCatalog(PRODUCTS_FILE) if PRODUCTS_FILE else None
+
+
+def find_product(key: str) -> Optional[Product]:
+    """Busca um produto monitorado pela URL, pelo SKU ou pelo ultimo trecho da URL."""
+    if product_catalog is not None:
+        product = product_catalog.find(key)
+        if product is not None:
+            return product
+
+    lowered = key.lower()
+    for product in list(PRODUCTS):
+        if product.url == key or product_label(product.url).lower() == lowered:
+            return product
+        if get_store_checker(product).sku(product.url) == lowered:
+            return product
+    return None
+
+
+def select_products(terms: Iterable[str]) -> list[Product]:
+    """
+    Produtos escolhidos com --products: cada termo casa pela URL, pelo SKU ou
+    pelo ultimo trecho da URL e, se nenhum casar, como trecho do nome.
+    """
+    selected = set()
+    for term in terms:
+        product = find_product(term)
+        if product is not None:
+            selected.add(product.url)
+            continue
+        needle = _normalize(term)
+        matches = {p.url for p in PRODUCTS if needle in _normalize(p.name)}
+        if not matches:
+            logger.warning(f"Nenhum produto corresponde a '{term}'")
+        selected |= matches
+    return [product for product in PRODUCTS if product.url in selected]
+
+
+def reload_products(catalog: ProductCatalog, scheduler: AdaptiveScheduler) -> bool:
+    """
+    Aplica as mudancas do arquivo de produtos. Apenas produtos adicionados ou
+    removidos tocam o agendador e o estado; os demais mantem horario e historico.
+    """
+    started = time.perf_counter()
+    changes = catalog.poll()
+    if changes is None:
+        return False
+    added, removed, changed = [[product for product in group if owns_product(product)] for group in changes]
+    if not (added or removed or changed):
+        return False
+
+    removed_urls = {product.url for product in removed}
+    updated = {product.url: product for product in added + changed}
+    if subscriber_registry is not None:
+        # Produtos que saem do arquivo mas seguem em listas de assinantes continuam
+        # verificados com a definicao do assinante; os que entram deixam de ser extras
+        subscriber_registry.extra.difference_update(updated)
+        for url in removed_urls & subscriber_registry.index.keys():
+            updated[url] = subscriber_registry.products[url]
+            subscriber_registry.extra.add(url)
+    PRODUCTS[:] = [updated.pop(p.url, p) for p in PRODUCTS if p.url not in removed_urls] + list(updated.values())
+
+    for product in added + changed:
+        scheduler.add(product)
+    for url in removed_urls:
+        if subscriber_registry is not None and url in subscriber_registry.extra:
+            scheduler.add(subscriber_registry.products[url])
+            continue
+        scheduler.remove(url)
+        latest_availability.pop(url, None)
+        latest_prices.pop(url, None)
+    if removed_urls:
+        # Apenas o aviso dos canais globais; os de assinantes seguem o arquivo de assinantes
+        state_store.update_notified((), removed_urls)
+
+    logger.info(
+        f"Arquivo de produtos recarregado: +{len(added)} -{len(removed)} ~{len(changed)} "
+        f"({len(PRODUCTS)} produtos, {(time.perf_counter() - started) * 1000:.1f} ms)"
+    )
+    return True
+
+
+# ============================================================================
+# ASSINANTES (LISTAS DE PRODUTOS POR PESSOA)
+# ============================================================================
+
+
+@dataclass
+class Subscriber:
+    """Assinante: canais de notificacao proprios e a lista de URLs que acompanha."""
+
+    name: str
+    services: list[str]
+    channels: dict[str, str]
+    urls: frozenset[str]
+
+    def options(self, service: str) -> dict[str, str]:
+        """Argumentos do notificador do canal (ex.: {"topic": ...} para o ntfy)."""
+        options = {option: self.channels.get(f"{service}_{option}") for option in CHANNEL_OPTIONS.get(service, ())}
+        return {option: value for option, value in options.items() if value}
+
+    def to_dict(self):
+        return {"name": self.name, "services": self.services, "products": len(self.urls)}
+
+
+class SubscriberRegistry:
+    """
+    Assinantes carregados de um arquivo JSON ou YAML, com um indice invertido
+    URL -> assinantes. O indice define quem recebe o aviso de cada produto; a
+    verificacao continua sendo uma por URL, nao uma por assinante.
+
+    `extra` guarda as URLs que so existem por causa dos assinantes (fora do
+    arquivo de produtos e da lista embutida): elas sao verificadas, mas o
+    aviso nao vai para os canais globais.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.subscribers: dict[str, Subscriber] = {}
+        self.index: dict[str, frozenset[str]] = {}
+        self.products: dict[str, Product] = {}
+        self.extra: set[str] = set()
+        self._stamp = None
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def watchers(self, url: str) -> list[Optional[str]]:
+        """Destinatarios do aviso de uma URL: None (canais globais) e os nomes dos assinantes."""
+        names = sorted(self.index.get(url, ()))
+        return names if url in self.extra else [None, *names]
+
+    @staticmethod
+    def _parse_product(ref) -> Product:
+        """Produto de uma lista: URL, SKU ou label de um produto monitorado, URL nova ou objeto completo."""
+        if isinstance(ref, dict):
+            return ProductCatalog._parse_row(ref)
+        key = str(ref).strip()
+        product = find_product(key)
+        if product is not None:
+            return product
+        if not key.startswith(("http://", "https://")):
+            raise ValueError(f"produto desconhecido '{key}'")
+        return ProductCatalog._parse_row({"name": product_label(key), "url": key})
+
+    def _parse_subscriber(self, row: dict, products: dict[str, Product]) -> Subscriber:
+        name = str(row.get("name") or "").strip()
+        if not name:
+            raise ValueError("'name' e obrigatorio")
+        services = row.get("notify") or row.get("services") or []
+        if isinstance(services, str):
+            services = services.split(",")
+        services = [service.strip().lower() for service in services if service.strip()]
+        if not services:
+            raise ValueError("'notify' e obrigatorio")
+        channels = {}
+        for service in services:
+            if service not in CHANNEL_OPTIONS:
+                raise ValueError(f"canal desconhecido '{service}'")
+            for position, option in enumerate(CHANNEL_OPTIONS[service]):
+                value = str(row.get(f"{service}_{option}") or "").strip()
+                if position == 0 and not value:
+                    raise ValueError(f"'{service}_{option}' e obrigatorio para o canal {service}")
+                if value:
+                    channels[f"{service}_{option}"] = value
+
+        urls = set()
+        for ref in row.get("products") or []:
+            try:
+                product = self._parse_product(ref)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"{self.path.name}: assinante {name}: {e}")
+                continue
+            # A primeira definicao de uma URL vale para todos os assinantes
+            product = products.setdefault(product.url, product)
+            urls.add(product.url)
+        return Subscriber(name=name, services=services, channels=channels, urls=frozenset(urls))
+
+    def load(self) -> tuple[dict[str, Subscriber], dict[str, Product]]:
+        """Le o arquivo inteiro; assinantes invalidos ou repetidos sao ignorados com aviso."""
+        data = load_data_file(self.path)
+        if isinstance(data, dict):
+            data = data.get("subscribers")
+        if not isinstance(data, list):
+            raise ValueError("o arquivo deve conter uma lista de assinantes")
+
+        subscribers, products = {}, {}
+        for number, row in enumerate(data, start=1):
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("entrada deve ser um objeto")
+                subscriber = self._parse_subscriber(row, products)
+                if subscriber.name in subscribers:
+                    raise ValueError(f"nome repetido '{subscriber.name}'")
+            except (TypeError, ValueError) as e:
+                logger.warning(f"{self.path.name}: assinante {number} ignorado: {e}")
+                continue
+            subscribers[subscriber.name] = subscriber
+        return subscribers, products
+
+    def poll(self) -> Optional[list[tuple[str, str]]]:
+        """
+        Rele o arquivo se o mtime ou o tamanho mudaram. Retorna os pares
+        (assinante, URL) que deixaram de existir, ou None se nada mudou ou a
+        leitura falhou (a ultima versao valida e mantida).
+        """
+        try:
+            stat = self.path.stat()
+        except OSError as e:
+            if self._stamp != "missing":
+                logger.error(f"Arquivo de assinantes indisponivel: {e}")
+                self._stamp = "missing"
+            return None
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+
+        try:
+            subscribers, products = self.load()
+        except Exception as e:
+            logger.error(f"Erro ao ler {self.path}: {e}")
+            return None
+
+        stale = [
+            (name, url)
+            for name, subscriber in self.subscribers.items()
+            for url in subscriber.urls
+            if name not in subscribers or url not in subscribers[name].urls
+        ]
+        index: dict[str, set[str]] = defaultdict(set)
+        for subscriber in subscribers.values():
+            for url in subscriber.urls:
+                index[url].add(subscriber.name)
+
+        self.subscribers = subscribers
+        self.products = products
+        self.index = {url: frozenset(names) for url, names in index.items()}
+        return stale
+
+    def status(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "watched_products": len(self.index),
+            "subscriber_only_products": len(self.extra),
+        }
+
+
+subscriber_registry = SubscriberRegistry(SUBSCRIBERS_FILE) if SUBSCRIBERS_FILE else None
+
+
+def notification_recipients(url: str) -> list[Optional[str]]:
+    """Quem recebe o aviso de um produto: os canais globais (None) e/ou assinantes."""
+    if subscriber_registry is None:
+        return [None]
+    return subscriber_registry.watchers(url)
+
+
+def sync_subscribers(registry: SubscriberRegistry, scheduler: AdaptiveScheduler) -> bool:
+    """
+    Aplica as mudancas do arquivo de assinantes. URLs acompanhadas por algum
+    assinante e fora da lista de produtos sao agendadas uma unica vez; as que
+    ninguem mais acompanha saem do agendador. Avisos ja enviados a quem deixou
+    de acompanhar um produto sao esquecidos.
+    """
+    started = time.perf_counter()
+    stale = registry.poll()
+    if stale is None:
+        return False
+
+    base_urls = {product.url for product in PRODUCTS if product.url not in registry.extra}
+    wanted = {
+        url: product for url, product in registry.products.items() if url not in base_urls and owns_product(product)
+    }
+    removed_urls = registry.extra - wanted.keys()
+    added = [product for url, product in wanted.items() if url not in registry.extra]
+
+    registry.extra = set(wanted)
+    PRODUCTS[:] = [wanted.pop(p.url, p) for p in PRODUCTS if p.url not in removed_urls] + list(wanted.values())
+    for product in PRODUCTS:
+        if product.url in registry.extra:
+            scheduler.add(product)
+    for url in removed_urls:
+        scheduler.remove(url)
+        latest_availability.pop(url, None)
+        latest_prices.pop(url, None)
+    if stale:
+        state_store.update_notified((), [notify_key(name, url) for name, url in stale])
+
+    logger.info(
+        f"Arquivo de assinantes recarregado: {len(registry)} assinantes, {len(registry.index)} produtos acompanhados "
+        f"(+{len(added)} -{len(removed_urls)} so de assinantes, {(time.perf_counter() - started) * 1000:.1f} ms)"
+    )
+    return True
+
+
+# ============================================================================
+# MODO SUPERVISOR (VARIOS PROCESSOS)
+# ============================================================================
+
+
+class HashRing:
+    """
+    Anel de hash consistente com nos virtuais: cada URL pertence a um unico
+    worker, e mudar o numero de workers move apenas ~1/N das URLs.
+    """
+
+    REPLICAS = 64
+
+    def __init__(self, nodes: int):
+        points = sorted(
+            (self._hash(f"worker-{node}-{replica}"), node) for node in range(nodes) for replica in range(self.REPLICAS)
+        )
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def owner(self, key: str) -> int:
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+shard_ring = HashRing(WORKERS) if WORKER_INDEX >= 0 else None
+
+
+def owns_product(product: Product) -> bool:
+    """Indica se o produto pertence a este processo (sempre verdadeiro fora do modo supervisor)."""
+    return shard_ring is None or shard_ring.owner(product.url) == WORKER_INDEX
+
+
+def sharded_elsewhere(url: str) -> bool:
+    """URL configurada (lista embutida, arquivo de produtos ou assinantes) que pertence a outro worker."""
+    if shard_ring is None or shard_ring.owner(url) == WORKER_INDEX:
+        return False
+    if product_catalog is not None:
+        configured = url in product_catalog.by_url
+    else:
+        configured = url in BUILTIN_PRODUCT_URLS
+    return configured or (subscriber_registry is not None and url in subscriber_registry.products)
+
+
+@dataclass
+class WorkerProcess:
+    """Processo de verificacao gerenciado pelo supervisor."""
+
+    index: int
+    port: int
+    process: Optional[subprocess.Popen] = None
+    restarts: int = 0
+    restart_at: float = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "pid": self.process.pid if self.process is not None else None,
+            "alive": self.alive,
+            "restarts": self.restarts,
+            "health_port": self.port,
+        }
+
+
+class Supervisor:
+    """
+    Inicia WORKERS processos do proprio tracker, cada um com um shard dos
+    produtos, e os reinicia com backoff se morrerem. Nao ha broker: os workers
+    coordenam as notificacoes pelo banco SQLite compartilhado.
+    """
+
+    POLL_INTERVAL = 1.0
+    RESTART_BACKOFF_MAX = 60
+
+    def __init__(self, workers: int):
+        # Cada worker expoe health e metricas na porta seguinte a do supervisor
+        self.workers = [WorkerProcess(index=i, port=HEALTH_PORT + 1 + i) for i in range(workers)]
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def status(self) -> list[dict]:
+        with self._lock:
+            return [worker.to_dict() for worker in self.workers]
+
+    def _spawn(self, worker: WorkerProcess):
+        env = {
+            **os.environ,
+            "WORKERS": str(len(self.workers)),
+            "WORKER_INDEX": str(worker.index),
+            "HEALTH_PORT": str(worker.port),
+        }
+        if DRY_RUN:
+            env["DRY_RUN"] = "true"
+        worker.process = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+        logger.info(f"Worker {worker.index} iniciado (pid {worker.process.pid}, health na porta {worker.port})")
+
+    def stop(self, signum=None, frame=None):
+        """
+        Handler de SIGTERM/SIGINT: apenas marca o pedido, sem tomar nenhum lock.
+        O sinal pode chegar com o lock tomado pelo loop de run(), entao os
+        workers sao encerrados depois que o loop termina, em _shutdown().
+        """
+        self._stopping = True
+
+    def _shutdown(self):
+        """Encerra os workers (SIGTERM) e aguarda ate 10 segundos antes de forcar."""
+        with self._lock:
+            for worker in self.workers:
+                if worker.alive:
+                    worker.process.terminate()
+            for worker in self.workers:
+                if worker.process is not None:
+                    try:
+                        worker.process.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        worker.process.kill()
+        logger.info("Workers encerrados")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        with self._lock:
+            for worker in self.workers:
+                self._spawn(worker)
+
+        while not self._stopping:
+            now = time.time()
+            with self._lock:
+                for worker in self.workers:
+                    if worker.alive:
+                        continue
+                    if worker.restart_at == 0.0:
+                        delay = min(self.RESTART_BACKOFF_MAX, 2**worker.restarts)
+                        worker.restart_at = now + delay
+                        logger.error(
+                            f"Worker {worker.index} terminou (codigo {worker.process.returncode}), reiniciando em {delay}s"
+                        )
+                    elif now >= worker.restart_at:
+                        worker.restarts += 1
+                        worker.restart_at = 0.0
+                        self._spawn(worker)
+                all_alive = all(worker.alive for worker in self.workers)
+
+            health_status.last_check = datetime.now().isoformat()
+            health_status.last_check_success = all_alive
+            publish_health()
+            time.sleep(self.POLL_INTERVAL)
+
+        self._shutdown()
+
+
+supervisor: Optional[Supervisor] = None
+
+
+def check_all_products() -> list[CheckResult]:
+    """Verifica todos os produtos e notifica se algum estiver disponivel."""
+    return check_products(PRODUCTS)
+
+
+def run_scheduler(scheduler: AdaptiveScheduler):
+    """Loop principal: verifica cada produto quando o seu horario vence."""
+    # Com varios workers, apenas o worker 0 le as paginas de listagem
+    next_catalog = time.time() if CATALOG_QUERIES and WORKER_INDEX <= 0 else None
+    reloadable = product_catalog is not None or subscriber_registry is not None
+    next_reload = time.time() + PRODUCTS_RELOAD_INTERVAL if reloadable else None
+    # A limpeza da partida vale pelo primeiro intervalo; com varios workers, so o worker 0 limpa
+    prunes = HISTORY_RETENTION_DAYS > 0 and HISTORY_PRUNE_INTERVAL > 0 and WORKER_INDEX <= 0
+    next_prune = time.time() + HISTORY_PRUNE_INTERVAL if prunes else None
+
+    while True:
+        wait = scheduler.seconds_until_next()
+        for deadline in (next_catalog, next_reload, next_prune):
+            if deadline is not None:
+                deadline_wait = max(0.0, deadline - time.time())
+                wait = deadline_wait if wait is None else min(wait, deadline_wait)
+        if wait is None:
+            time.sleep(CHECK_INTERVAL)
+            continue
+        if wait > 0:
+            time.sleep(wait)
+
+        # O arquivo so e relido entre ciclos: verificacoes em andamento terminam
+        # normalmente e resultados de produtos removidos sao descartados
+        if next_reload is not None and time.time() >= next_reload:
+            next_reload = time.time() + PRODUCTS_RELOAD_INTERVAL
+            try:
+                if product_catalog is not None:
+                    reload_products(product_catalog, scheduler)
+                if subscriber_registry is not None:
+                    sync_subscribers(subscriber_registry, scheduler)
+            except Exception as e:
+                logger.error(f"Erro ao recarregar produtos: {e}")
+
+        if next_prune is not None and time.time() >= next_prune:
+            next_prune = time.time() + HISTORY_PRUNE_INTERVAL
+            try:
+                state_store.prune_history(HISTORY_RETENTION_DAYS)
+            except Exception as e:
+                logger.error(f"Erro ao limpar o historico: {e}")
+
+        # Varredura do catalogo: os volumes resolvidos pela listagem ficam cobertos
+        # ate depois da proxima varredura e nao sao verificados individualmente
+        if next_catalog is not None and time.time() >= next_catalog:
+            next_catalog = time.time() + CATALOG_INTERVAL
+            try:
+                for result in check_catalog(scheduler):
+                    scheduler.reschedule(result)
+            except Exception as e:
+                logger.error(f"Erro durante verificacao do catalogo: {e}")
+
+        due = scheduler.pop_due()
+        if not due:
+            continue
+        SCHEDULER_LAG.set(scheduler.last_lag)
+
+        try:
+            results = check_products(due)
+        except Exception as e:
+            logger.error(f"Erro durante verificacao: {e}")
+            # Falha do ciclo inteiro: reagenda os produtos com backoff
+            results = [CheckResult(product=p, available=None, price=None, elapsed=0.0, error=str(e)) for p in due]
+
+        for result in results:
+            scheduler.reschedule(result)
+
+        wait = scheduler.seconds_until_next()
+        if wait is not None:
+            logger.info(f"Proxima verificacao em {wait:.0f} segundos ({wait / 60:.1f} min)")
+
+
+def build_scheduler() -> AdaptiveScheduler:
+    """
+    Carrega os produtos deste processo e agenda todos para verificacao imediata.
+    Com arquivo de produtos, a lista embutida e substituida pelo conteudo do
+    arquivo; no modo supervisor, cada worker fica apenas com o seu shard.
+    Produtos que so aparecem nas listas de assinantes entram em seguida.
+    """
+    scheduler = AdaptiveScheduler()
+    if product_catalog is not None:
+        PRODUCTS.clear()
+        reload_products(product_catalog, scheduler)
+    else:
+        PRODUCTS[:] = [product for product in PRODUCTS if owns_product(product)]
+        for product in PRODUCTS:
+            scheduler.add(product)
+    if subscriber_registry is not None:
+        sync_subscribers(subscriber_registry, scheduler)
+    return scheduler
+
+
+def run_worker():
+    """Processo de verificacao iniciado pelo supervisor: sem banner nem notificacao de inicio."""
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(f"%(asctime)s - worker {WORKER_INDEX} - %(levelname)s - %(message)s"))
+
+    scheduler = build_scheduler()
+    logger.info(f"Worker {WORKER_INDEX + 1}/{WORKERS}: {len(PRODUCTS)} produtos, health na porta {HEALTH_PORT}")
+
+    threading.Thread(target=start_health_server, daemon=True).start()
+    start_parse_pool()
+    run_scheduler(scheduler)
+
+
+def result_to_dict(result: CheckResult) -> dict:
+    """Resultado de uma verificacao no formato da saida JSON do --once."""
+    return {
+        "name": result.product.name,
+        "url": result.product.url,
+        "available": result.available,
+        "price": result.price,
+        "price_cents": parse_brl_cents(result.price),
+        "error": result.error,
+        "elapsed_ms": round(result.elapsed * 1000, 1),
+    }
+
+
+def run_once(terms: Optional[list[str]] = None) -> int:
+    """
+    Uma unica passada sobre os produtos, para timers do systemd ou cron: sem
+    health check nem notificacao de inicio. Imprime o resultado em JSON no
+    stdout e retorna o codigo de saida: 0 = todos verificados, 1 = algum
+    produto sem resultado, 2 = falha do ciclo ou nenhum produto selecionado.
+    """
+    global rate_limiter
+
+    started = time.monotonic()
+    # Processo unico: o limite por host nao e dividido entre workers
+    if WORKERS > 1:
+        rate_limiter = HostRateLimiter(RATE_LIMIT_PER_HOST, RATE_LIMIT_BURST)
+
+    build_scheduler()
+    products = select_products(terms) if terms else list(PRODUCTS)
+    report = {"checked_at": datetime.now().isoformat(), "dry_run": DRY_RUN}
+
+    if not products:
+        logger.error("Nenhum produto selecionado")
+        report["error"] = "nenhum produto selecionado"
+        exit_code = 2
+    else:
+        try:
+            start_parse_pool()
+            results = check_products(products)
+        except Exception as e:
+            report["error"] = str(e)
+            exit_code = 2
+        else:
+            unknown = sum(result.available is None for result in results)
+            report["checked"] = len(results)
+            report["available"] = sum(result.available is True for result in results)
+            report["unknown"] = unknown
+            report["products"] = [result_to_dict(result) for result in results]
+            exit_code = 1 if unknown else 0
+
+    # A fila de notificacoes roda em thread daemon: aguarda a entrega antes de sair
+    if not notification_dispatcher.flush(ONCE_NOTIFY_TIMEOUT):
+        logger.warning(f"Notificacoes ainda pendentes apos {ONCE_NOTIFY_TIMEOUT:.0f}s")
+    report["notifications"] = {"delivered": notification_dispatcher.delivered, "failed": notification_dispatcher.failed}
+    report["elapsed_s"] = round(time.monotonic() - started, 3)
+    # Timers do systemd nunca passam pelo loop principal: cada execucao limpa o historico
+    state_store.prune_history(HISTORY_RETENTION_DAYS)
+    state_store.close()
+
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return exit_code
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Monitora a disponibilidade dos mangas Berserk")
+    parser.add_argument(
+        "--once", action="store_true", help="Verifica os produtos uma vez, imprime o resultado em JSON e sai"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Verifica normalmente, mas nao envia notificacoes")
+    parser.add_argument(
+        "--products",
+        help="Com --once, verifica apenas estes produtos: URL, SKU ou trecho do nome, separados por virgula",
+    )
+    args = parser.parse_args(argv)
+    if args.products and not args.once:
+        parser.error("--products so pode ser usado com --once")
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Funcao principal."""
+    global health_status, supervisor, DRY_RUN
+
+    args = parse_args(argv)
+    if args.dry_run:
+        DRY_RUN = True
+    memory_monitor.start_tracing(TRACEMALLOC_FRAMES)
+    if PROFILE_CYCLES > 0:
+        try:
+            cycle_profiler.arm(PROFILE_CYCLES, PROFILER)
+        except ValueError as e:
+            logger.error(f"PROFILE_CYCLES/PROFILER invalidos: {e}")
+
+    if args.once:
+        terms = [term.strip() for term in args.products.split(",") if term.strip()] if args.products else None
+        return run_once(terms)
+
+    if WORKER_INDEX >= 0:
+        run_worker()
+        return 0
+
+    logger.info(
+        """
+    ========================================================
+              BERSERK MANGA TRACKER
+              
        Monitorando disponibilidade dos mangas Berserk
        Notificacoes via: {service}
     ========================================================
@@ -403,12 +4964,28 @@ def main():
         )
     )
 
+    scheduler = build_scheduler()
+    if product_catalog is not None:
+        logger.info(f"Arquivo de produtos: {product_catalog.path} (verificado a cada {PRODUCTS_RELOAD_INTERVAL:.0f}s)")
+    if subscriber_registry is not None:
+        logger.info(
+            f"Arquivo de assinantes: {subscriber_registry.path} ({len(subscriber_registry)} assinantes, "
+            f"{len(subscriber_registry.index)} produtos acompanhados)"
+        )
+
     logger.info(f"Intervalo de verificacao: {CHECK_INTERVAL} segundos ({CHECK_INTERVAL//60} min)")
+    logger.info(f"Intervalo adaptativo: {MIN_CHECK_INTERVAL}s a {MAX_CHECK_INTERVAL}s por produto")
     logger.info(f"Produtos monitorados: {len(PRODUCTS)}")
+    if CATALOG_QUERIES:
+        logger.info(f"Catalogo: {', '.join(CATALOG_QUERIES)} (a cada {CATALOG_INTERVAL}s)")
+    logger.info(f"Concorrencia: {MAX_CONCURRENCY} | Limite por host: {RATE_LIMIT_PER_HOST} req/s")
+    if WORKERS > 1:
+        logger.info(f"Modo supervisor: {WORKERS} workers (portas {HEALTH_PORT + 1} a {HEALTH_PORT + WORKERS})")
+    logger.info(f"Backend de parse: {parser_backend}")
     logger.info(f"Servico de notificacao: {NOTIFICATION_SERVICE}")
     logger.info(f"Health check: http://0.0.0.0:{HEALTH_PORT}/health")
 
-    if NOTIFICATION_SERVICE == "ntfy":
+    if "ntfy" in notification_services():
         logger.info(f"Ntfy topic: {NTFY_TOPIC}")
 
     # Inicia servidor de health check em thread separada
@@ -416,26 +4993,30 @@ def main():
     health_thread.start()
 
     # Envia notificacao de teste ao iniciar
-    send_notification(
-        title="Berserk Tracker Iniciado", message=f"Monitorando {len(PRODUCTS)} produtos. Intervalo: {CHECK_INTERVAL//60} min"
-    )
+    if not DRY_RUN:
+        notification_dispatcher.submit(
+            NotificationJob(
+                title="Berserk Tracker Iniciado",
+                message=f"Monitorando {len(PRODUCTS)} produtos. Intervalo: {CHECK_INTERVAL//60} min",
+            )
+        )
 
-    # Verificacao inicial
-    try:
-        check_all_products()
-    except Exception as e:
-        logger.error(f"Erro na verificacao inicial: {e}")
+    state_store.prune_history(HISTORY_RETENTION_DAYS)
 
-    # Loop principal
-    while True:
-        time.sleep(CHECK_INTERVAL)
+    # Nenhum worker esta rodando: reservas de notificacao restantes sao de uma execucao anterior
+    state_store.release_claims()
 
-        try:
-            check_all_products()
-        except Exception as e:
-            logger.error(f"Erro durante verificacao: {e}")
-            time.sleep(60)
+    if WORKERS > 1:
+        supervisor = Supervisor(WORKERS)
+        supervisor.run()
+        return 0
+
+    start_parse_pool()
+
+    # Todos os produtos vencem imediatamente: a primeira passada e completa
+    run_scheduler(scheduler)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
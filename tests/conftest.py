@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Fixtures comuns: estado do tracker isolado em um diretorio temporario por teste."""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+import berserk_tracker as bt  # noqa: E402
+from fake_store import FakeStoreServer  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Banco SQLite, caches e disjuntores novos, gravando em tmp_path."""
+    monkeypatch.setattr(bt, "get_data_path", lambda: tmp_path)
+    monkeypatch.setattr(bt, "state_store", bt.StateStore())
+    monkeypatch.setattr(bt, "response_cache", bt.ResponseCache())
+    monkeypatch.setattr(bt, "price_tracker", bt.PriceTracker(bt.PRICE_HISTORY_SIZE))
+    monkeypatch.setattr(bt, "circuit_breakers", bt.HostCircuitBreakers())
+    monkeypatch.setattr(bt, "rate_limiter", bt.HostRateLimiter(0, 1))
+    monkeypatch.setattr(bt, "NOTIFICATION_SERVICE", "none")
+    yield tmp_path
+    bt.state_store.close()
+
+
+@pytest.fixture
+def product():
+    return bt.Product(name="Berserk Vol. 1", url="http://loja.test/panini/in-stock/1")
+
+
+@pytest.fixture
+def fake_store():
+    """Inicia lojas falsas locais (benchmarks/fake_store.py) com as opcoes dadas; paradas ao fim do teste."""
+    servers = []
+
+    def start(**options) -> FakeStoreServer:
+        server = FakeStoreServer(**options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def health_url():
+    """Servidor de health check em uma porta livre de localhost; retorna a URL base."""
+    server = bt.HealthServer(("127.0.0.1", 0), bt.HealthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
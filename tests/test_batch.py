@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Consulta em lote pela API GraphQL: parse da resposta e volta para as paginas HTML."""
+
+import pytest
+
+import berserk_tracker as bt
+
+CHECKER = bt.STORE_CHECKERS["panini"]
+
+
+@pytest.fixture
+def graphql_store(fake_store, monkeypatch):
+    def start(**options):
+        store = fake_store(**options)
+        monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", store.base_url + "/graphql")
+        monkeypatch.setattr(bt, "CYCLE_DEADLINE", 0)
+        return store
+
+    return start
+
+
+def volumes(store, ids) -> list[bt.Product]:
+    return [bt.Product(name=f"Vol. {i}", url=f"{store.base_url}/panini/in-stock/{i}") for i in ids]
+
+
+def test_sku_comes_from_the_end_of_the_url():
+    assert CHECKER.sku("https://panini.com.br/berserk-edicao-de-luxo-vol-40-amaxs040r") == "amaxs040r"
+    assert CHECKER.sku("https://panini.com.br/berserk-vol-40-AMAXS040R.html") == "amaxs040r"
+    assert CHECKER.sku("https://panini.com.br/berserk-edicao-de-luxo") is None
+
+
+def test_batch_is_opt_in(monkeypatch):
+    monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", "")
+
+    assert CHECKER.batch_size == 0
+    assert bt.check_batches([bt.Product(name="Vol. 40", url="https://panini.com.br/vol-40-amaxs040r")]) == {}
+
+
+def test_one_query_checks_the_whole_batch(graphql_store):
+    store = graphql_store()
+    selected = volumes(store, range(1, 11))
+
+    results = bt.run_checks(selected)
+
+    assert store.requests == 1
+    for i, result in enumerate(results, start=1):
+        expected = (True, "R$ 79,90") if i % 5 == 0 else (False, None)
+        assert (result.available, result.price) == expected
+
+
+def test_skus_missing_from_the_response_fall_back_to_html(graphql_store):
+    store = graphql_store()
+    # SKUs nao numericos nao sao encontrados pela API da loja falsa
+    selected = volumes(store, ["5", "7", "a1", "b2"])
+
+    results = bt.run_checks(selected)
+
+    assert store.requests == 1 + 2
+    assert [result.available for result in results] == [True, False, True, True]
+
+
+def test_api_failure_falls_back_to_html_for_every_product(graphql_store):
+    store = graphql_store(graphql=False)
+    selected = volumes(store, range(1, 5))
+
+    results = bt.run_checks(selected)
+
+    assert store.requests == 1 + 4
+    assert all(result.available for result in results)
+    assert bt.circuit_breakers.breaker(store.base_url).state == bt.CircuitBreaker.CLOSED
+
+
+def test_response_without_products_is_rejected(monkeypatch):
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"errors": [{"message": "schema"}]}
+
+    monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", "http://loja.test/graphql")
+    monkeypatch.setattr(bt.http_client, "post", lambda *args, **kwargs: Response())
+
+    with pytest.raises(ValueError):
+        CHECKER.fetch_batch(["40"])
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Modo catalogo: listagem paginada, itens ambiguos, shards de outros workers e agendamento dos volumes listados."""
+
+import time
+
+import pytest
+
+import berserk_tracker as bt
+
+
+def test_catalog_skips_volumes_owned_by_other_workers(monkeypatch):
+    ring = bt.HashRing(2)
+    urls = [f"http://loja.test/panini/in-stock/{i}" for i in range(40)]
+    mine = [url for url in urls if ring.owner(url) == 0]
+    theirs = [url for url in urls if ring.owner(url) == 1]
+    configured = [bt.Product(name=f"Vol. {i}", url=url) for i, url in enumerate(urls[:20])]
+    adopted_before = next(url for url in theirs if url in {p.url for p in configured})
+
+    monkeypatch.setattr(bt, "shard_ring", ring)
+    monkeypatch.setattr(bt, "WORKER_INDEX", 0)
+    monkeypatch.setattr(bt, "BUILTIN_PRODUCT_URLS", frozenset(p.url for p in configured))
+    monkeypatch.setattr(bt, "product_catalog", None)
+    monkeypatch.setattr(bt, "CATALOG_QUERIES", ["berserk"])
+    entries = [bt.ListingEntry(name=f"Berserk {i}", url=url, available=True, price=None) for i, url in enumerate(urls)]
+    monkeypatch.setattr(bt, "discover_catalog", lambda query, checker: entries)
+
+    # Worker 0 com o seu shard e um volume de outro worker adotado antes de entrar na lista
+    products = [p for p in configured if ring.owner(p.url) == 0] + [bt.Product(name="antigo", url=adopted_before)]
+    monkeypatch.setattr(bt, "PRODUCTS", products)
+    scheduler = bt.AdaptiveScheduler()
+    for product in products:
+        scheduler.add(product)
+
+    results = bt.fetch_catalog(scheduler)
+
+    checked = {result.product.url for result in results}
+    other_configured = {url for url in theirs if url in bt.BUILTIN_PRODUCT_URLS}
+    assert checked.isdisjoint(other_configured)
+    assert set(mine) <= checked
+    # Volumes fora de qualquer lista sao adotados pelo worker que le o catalogo
+    assert set(theirs) - other_configured <= checked
+    assert adopted_before not in {p.url for p in bt.PRODUCTS}
+    assert adopted_before not in scheduler.entries
+
+
+def test_listed_volumes_wait_for_the_next_sweep(monkeypatch):
+    monkeypatch.setattr(bt, "CATALOG_QUERIES", ["berserk"])
+    monkeypatch.setattr(bt, "CATALOG_INTERVAL", 1800)
+    monkeypatch.setattr(bt, "CHECK_INTERVAL", 600)
+    monkeypatch.setattr(bt, "SCHEDULE_JITTER", 0.1)
+    monkeypatch.setattr(bt, "run_checks", lambda products: [])
+    urls = [f"http://loja.test/panini/in-stock/{i}" for i in range(20)]
+    entries = [bt.ListingEntry(name=f"Berserk {i}", url=url, available=True, price=None) for i, url in enumerate(urls)]
+    monkeypatch.setattr(bt, "discover_catalog", lambda query, checker: entries)
+    known = bt.Product(name="Berserk 0", url=urls[0])
+    monkeypatch.setattr(bt, "PRODUCTS", [known])
+    scheduler = bt.AdaptiveScheduler([known])
+
+    started = time.time()
+    results = bt.fetch_catalog(scheduler)
+    for result in results:
+        scheduler.reschedule(result)
+
+    assert len(scheduler.entries) == 20
+    next_sweep = started + 1800
+    assert scheduler.pop_due(now=next_sweep) == []
+    assert len(scheduler.pop_due(now=next_sweep + 1800 * 0.1 + 1)) == 20
+
+
+@pytest.fixture
+def listing(fake_store, monkeypatch):
+    """Loja falsa com 30 volumes na busca (3 paginas de 12)."""
+    store = fake_store(catalog_size=30)
+    monkeypatch.setattr(bt, "CATALOG_SEARCH_URL", store.base_url + "/catalogsearch/result/?q={query}&p={page}")
+    monkeypatch.setattr(bt, "CATALOG_MAX_PAGES", 5)
+    monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", "")
+    return store
+
+
+def test_listing_follows_pagination_and_reads_stock_badges(listing):
+    entries = bt.discover_catalog("berserk edição de luxo", bt.STORE_CHECKERS["panini"])
+
+    assert listing.requests == 3
+    assert len(entries) == 30
+    by_volume = {int(entry.url.rsplit("/", 1)[1]): entry for entry in entries}
+    for volume, entry in by_volume.items():
+        if volume % 7 == 0:
+            assert (entry.available, entry.price) == (None, None)
+        elif volume % 5 == 0:
+            assert (entry.available, entry.price) == (True, "R$\xa079,90")
+        else:
+            assert (entry.available, entry.price) == (False, None)
+    assert by_volume[10].url == f"{listing.base_url}/panini/in-stock/010"
+
+
+def test_listing_stops_at_max_pages_and_filters_by_query(listing, monkeypatch):
+    monkeypatch.setattr(bt, "CATALOG_MAX_PAGES", 2)
+    checker = bt.STORE_CHECKERS["panini"]
+
+    assert len(bt.discover_catalog("berserk", checker)) == 24
+    assert bt.discover_catalog("berserk deluxe", checker) == []
+
+
+def test_only_ambiguous_items_are_fetched(listing, monkeypatch):
+    monkeypatch.setattr(bt, "CATALOG_QUERIES", ["berserk"])
+    monkeypatch.setattr(bt, "PRODUCTS", [])
+
+    results = bt.fetch_catalog(bt.AdaptiveScheduler())
+
+    ambiguous = [volume for volume in range(1, 31) if volume % 7 == 0]
+    assert len(results) == 30
+    assert listing.requests == 3 + len(ambiguous)
+    assert len(bt.PRODUCTS) == 30
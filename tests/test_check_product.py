@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""check_product: prazo do ciclo, limite de taxa e disjuntor."""
+
+import time
+
+import berserk_tracker as bt
+
+
+def half_open(url: str) -> bt.CircuitBreaker:
+    breaker = bt.circuit_breakers.breaker(url)
+    breaker.state = bt.CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+def test_deadline_exit_releases_half_open_probe(product):
+    breaker = half_open(product.url)
+
+    result = bt.check_product(product, deadline=time.monotonic() - 1)
+
+    assert result.error == bt.DEADLINE_ERROR
+    assert breaker.state == bt.CircuitBreaker.HALF_OPEN
+    assert not breaker._probing
+    assert breaker.allow()
+
+
+def test_rate_limit_exit_releases_half_open_probe(product, monkeypatch):
+    breaker = half_open(product.url)
+    monkeypatch.setattr(bt.rate_limiter, "acquire", lambda url, deadline=None: False)
+
+    result = bt.check_product(product, deadline=time.monotonic() + 60)
+
+    assert result.error == bt.DEADLINE_ERROR
+    assert not breaker._probing
+    assert breaker.allow()
+
+
+def test_local_error_releases_half_open_probe(product, monkeypatch):
+    breaker = half_open(product.url)
+
+    def broken_parser(*args, **kwargs):
+        raise RuntimeError("parser quebrado")
+
+    monkeypatch.setattr(bt, "fetch_store_availability", broken_parser)
+
+    result = bt.check_product(product)
+
+    assert result.available is None
+    assert "parser quebrado" in result.error
+    assert breaker.state == bt.CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""CircuitBreaker: transicoes fechado -> aberto -> meio-aberto -> fechado/aberto."""
+
+import pytest
+
+import berserk_tracker as bt
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(bt, "BREAKER_WINDOW", 10)
+    monkeypatch.setattr(bt, "BREAKER_MIN_REQUESTS", 4)
+    monkeypatch.setattr(bt, "BREAKER_FAILURE_RATE", 0.5)
+    monkeypatch.setattr(bt, "BREAKER_COOLDOWN", 60)
+    monkeypatch.setattr(bt, "BREAKER_MAX_COOLDOWN", 200)
+    return bt.CircuitBreaker("loja.test")
+
+
+def expire_cooldown(breaker: bt.CircuitBreaker):
+    breaker.opened_at -= breaker.cooldown + 1
+
+
+def test_opens_only_after_min_requests_and_failure_rate(breaker):
+    for success in (False, False, False):
+        breaker.record(success)
+    assert breaker.state == bt.CircuitBreaker.CLOSED
+
+    breaker.record(True)
+    assert breaker.state == bt.CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_successes_keep_the_circuit_closed(breaker):
+    for success in (False, True, True, False, True, True):
+        breaker.record(success)
+    assert breaker.state == bt.CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_half_open_allows_a_single_probe(breaker):
+    for _ in range(4):
+        breaker.record(False)
+    expire_cooldown(breaker)
+
+    assert breaker.allow()
+    assert breaker.state == bt.CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes_and_resets(breaker):
+    for _ in range(4):
+        breaker.record(False)
+    expire_cooldown(breaker)
+    breaker.allow()
+
+    breaker.record(True)
+
+    assert breaker.state == bt.CircuitBreaker.CLOSED
+    assert breaker.cooldown == 60
+    assert len(breaker.outcomes) == 0
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_with_doubled_cooldown_up_to_the_max(breaker):
+    for _ in range(4):
+        breaker.record(False)
+
+    cooldowns = []
+    for _ in range(3):
+        expire_cooldown(breaker)
+        assert breaker.allow()
+        breaker.record(False)
+        cooldowns.append(breaker.cooldown)
+        assert breaker.state == bt.CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+    assert cooldowns == [120, 200, 200]
+
+
+def test_released_probe_can_be_taken_again(breaker):
+    for _ in range(4):
+        breaker.record(False)
+    expire_cooldown(breaker)
+    assert breaker.allow()
+
+    breaker.release()
+
+    assert breaker.state == bt.CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_local_error_releases_the_probe_in_store_availability(breaker, monkeypatch):
+    url = "http://loja.test/panini/in-stock/1"
+    monkeypatch.setattr(bt.circuit_breakers, "_breakers", {"loja.test": breaker})
+    monkeypatch.setattr(bt, "fetch_store_availability", lambda *args, **kwargs: 1 / 0)
+    for _ in range(4):
+        breaker.record(False)
+    expire_cooldown(breaker)
+
+    assert bt.check_store_availability(url, bt.STORE_CHECKERS["panini"]) == (None, None)
+    assert breaker.state == bt.CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""AvailabilityDetector: parada antecipada no marcador, inclusive dividido entre blocos."""
+
+import hashlib
+
+import pytest
+
+import berserk_tracker as bt
+from fake_store import load_pages
+
+MARKERS = bt.STORE_CHECKERS["panini"].stream_markers
+
+
+def page(name: str) -> bytes:
+    return load_pages()[name].replace("__SKU__", "040").encode("utf-8")
+
+
+def feed_in_chunks(body: bytes, size: int) -> tuple[bt.AvailabilityDetector, int]:
+    """Alimenta o detector em blocos de `size` bytes; retorna o detector e os blocos lidos."""
+    detector = bt.AvailabilityDetector(MARKERS)
+    chunks = 0
+    for offset in range(0, len(body), size):
+        chunks += 1
+        if detector.feed(body[offset : offset + size]):
+            break
+    return detector, chunks
+
+
+@pytest.mark.parametrize("split", range(1, len(b"productalert")))
+def test_marker_split_across_two_chunks(split):
+    prefix = b"<html>" + b"x" * 100
+    body = prefix + b"productalert" + b"y" * 100
+    cut = len(prefix) + split
+    detector = bt.AvailabilityDetector(MARKERS)
+
+    assert not detector.feed(body[:cut])
+    assert detector.feed(body[cut:])
+    assert detector.out_of_stock
+
+
+def test_marker_split_across_one_byte_chunks():
+    detector, chunks = feed_in_chunks(b"aaaa productalert bbbb" + b"z" * 1000, 1)
+
+    assert detector.out_of_stock
+    assert chunks == len(b"aaaa productalert")
+
+
+def test_out_of_stock_page_stops_before_the_end():
+    body = page("panini_out_of_stock.html")
+    detector, chunks = feed_in_chunks(body, 256)
+
+    assert detector.out_of_stock
+    assert chunks * 256 < len(body)
+
+
+def test_in_stock_page_is_read_whole_and_hashed():
+    body = page("panini_in_stock.html")
+    detector, _ = feed_in_chunks(body, 256)
+
+    assert not detector.out_of_stock
+    assert detector.body_hash == hashlib.blake2b(body, digest_size=16).hexdigest()
+    assert detector.take_body() == body
+    assert detector.body == bytearray()
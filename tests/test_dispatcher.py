@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""NotificationDispatcher: retentativas por canal e estado gravado apenas apos a entrega."""
+
+import pytest
+
+import berserk_tracker as bt
+
+URL = "http://loja.test/panini/vol-40"
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    """Dispatcher novo com os canais falsos 'a' e 'b'; cada um falha as primeiras `failures[canal]` tentativas."""
+    dispatcher = bt.NotificationDispatcher()
+    dispatcher.failures = {}
+    # (canal, pendente, ja notificado) no momento de cada tentativa
+    dispatcher.attempts = []
+
+    def sender(name):
+        def send(title, message, url=None):
+            dispatcher.attempts.append((name, dispatcher.is_pending(URL), URL in bt.state_store.load_notified()))
+            if dispatcher.failures.get(name, 0) > 0:
+                dispatcher.failures[name] -= 1
+                return False
+            return True
+
+        return send
+
+    monkeypatch.setattr(bt, "NOTIFIERS", {"a": sender("a"), "b": sender("b")})
+    monkeypatch.setattr(bt, "NOTIFY_RATE_LIMITS", {"a": (1000.0, 10), "b": (1000.0, 10)})
+    monkeypatch.setattr(bt, "NOTIFY_RETRIES", 2)
+    monkeypatch.setattr(bt, "NOTIFY_RETRY_BACKOFF", 0.0)
+    monkeypatch.setattr(bt, "NOTIFICATION_SERVICE", "a")
+    monkeypatch.setattr(bt, "notification_dispatcher", dispatcher)
+    return dispatcher
+
+
+def submit(dispatcher: bt.NotificationDispatcher):
+    assert bt.state_store.claim_notifications([URL]) == {URL}
+    dispatcher.submit(bt.NotificationJob(title="Disponivel", message="Vol. 40", url=URL, dedup_urls=[URL]))
+    assert dispatcher.flush(timeout=5)
+
+
+def test_retries_until_delivered_then_marks_notified(dispatcher):
+    dispatcher.failures["a"] = 2
+
+    submit(dispatcher)
+
+    # Durante as tentativas o produto esta pendente e ainda nao consta como notificado
+    assert dispatcher.attempts == [("a", True, False)] * 3
+    assert URL in bt.state_store.load_notified()
+    assert not dispatcher.is_pending(URL)
+    assert (dispatcher.delivered, dispatcher.failed) == (1, 0)
+
+
+def test_undelivered_message_releases_the_claim(dispatcher):
+    dispatcher.failures["a"] = 10
+
+    submit(dispatcher)
+
+    assert len(dispatcher.attempts) == 3
+    assert URL not in bt.state_store.load_notified()
+    assert not dispatcher.is_pending(URL)
+    assert (dispatcher.delivered, dispatcher.failed) == (0, 1)
+    # Reserva liberada: o proximo ciclo pode tentar de novo
+    assert bt.state_store.claim_notifications([URL]) == {URL}
+
+
+def test_one_confirmed_channel_is_enough(dispatcher, monkeypatch):
+    dispatcher.failures["b"] = 10
+    monkeypatch.setattr(bt, "NOTIFICATION_SERVICE", "a,b")
+
+    submit(dispatcher)
+
+    assert sorted(name for name, _, _ in dispatcher.attempts) == ["a", "b", "b", "b"]
+    assert URL in bt.state_store.load_notified()
+    assert dispatcher.delivered == 1
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""EventLog e o endpoint /events."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import berserk_tracker as bt
+
+
+@pytest.fixture
+def health_server():
+    server = bt.HealthServer(("127.0.0.1", 0), bt.HealthHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_supervisor_events_points_to_workers(health_server, monkeypatch):
+    monkeypatch.setattr(bt, "HEALTH_PORT", 9000)
+    monkeypatch.setattr(bt, "supervisor", bt.Supervisor(2))
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{health_server}/events?timeout=0", timeout=5)
+
+    assert error.value.code == 409
+    body = json.loads(error.value.read())
+    assert body["workers"] == ["http://127.0.0.1:9001/events", "http://127.0.0.1:9002/events"]
+    assert bt.event_log.clients == 0
+
+
+def test_since_none_waits_for_new_events_only():
+    log = bt.EventLog(size=4, max_clients=1)
+    log.publish("availability", {"n": 0})
+
+    assert log.since(None) == ([], False)
+
+
+def test_since_returns_missed_events_without_gap():
+    log = bt.EventLog(size=4, max_clients=1)
+    first = log.publish("availability", {"n": 0})
+    second = log.publish("price", {"n": 1})
+    third = log.publish("availability", {"n": 2})
+
+    assert log.since(first.id) == ([second, third], False)
+    assert log.since(third.id) == ([], False)
+    # Cursor logo antes do primeiro evento do buffer: nada se perdeu
+    assert log.since(first.id - 1) == ([first, second, third], False)
+
+
+def test_gap_when_events_left_the_buffer():
+    log = bt.EventLog(size=2, max_clients=1)
+    first = log.publish("availability", {"n": 0})
+    log.publish("availability", {"n": 1})
+    log.publish("availability", {"n": 2})
+
+    events, gap = log.since(first.id - 1)
+    assert gap
+    assert [event.data["n"] for event in events] == [1, 2]
+    # Ainda no limite do buffer: sem lacuna
+    assert log.since(first.id) == (list(log._events), False)
+
+
+def test_gap_for_ids_from_another_run():
+    log = bt.EventLog(size=4, max_clients=1)
+    event = log.publish("availability", {"n": 0})
+
+    assert log.since(event.id + 1000)[1]
+    assert log.since(event.id - 10**9)[1]
+
+
+def test_wait_returns_as_soon_as_an_event_is_published():
+    log = bt.EventLog(size=4, max_clients=1)
+    cursor = log.last_id
+    threading.Timer(0.05, log.publish, args=("availability", {"n": 0})).start()
+
+    events, gap = log.wait(cursor, timeout=5)
+
+    assert [event.data["n"] for event in events] == [0]
+    assert not gap
+
+
+def test_client_limit():
+    log = bt.EventLog(size=4, max_clients=1)
+
+    assert log.open_client()
+    assert not log.open_client()
+    log.close_client()
+    assert log.open_client()
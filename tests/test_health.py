@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Snapshot de saude: respostas pre-serializadas, trocadas apenas por publish_health()."""
+
+import json
+import time
+
+import pytest
+import requests
+
+import berserk_tracker as bt
+
+
+@pytest.fixture
+def status(monkeypatch):
+    status = bt.HealthStatus()
+    monkeypatch.setattr(bt, "health_status", status)
+    monkeypatch.setattr(bt, "health_snapshot", None)
+    return status
+
+
+def test_snapshot_before_the_first_check(status):
+    snapshot = bt.HealthSnapshot(status)
+
+    body = json.loads(snapshot.health_body())
+    assert snapshot.health_code == 200
+    assert snapshot.ready_code == 503
+    assert json.loads(snapshot.ready_body) == {"ready": False}
+    assert body["status"] == "healthy"
+    assert body["last_check"] is None
+    assert body["uptime_seconds"] >= 0
+
+
+def test_uptime_is_computed_per_response(status):
+    snapshot = bt.HealthSnapshot(status)
+
+    first = json.loads(snapshot.health_body())["uptime_seconds"]
+    time.sleep(0.01)
+    second = json.loads(snapshot.health_body())["uptime_seconds"]
+
+    assert second > first
+
+
+def test_failed_check_is_unhealthy_but_ready(status):
+    status.last_check = "2026-01-01T12:00:00"
+    status.last_check_success = False
+
+    snapshot = bt.HealthSnapshot(status)
+
+    assert snapshot.health_code == 503
+    assert snapshot.ready_code == 200
+    assert json.loads(snapshot.health_body())["status"] == "unhealthy"
+
+
+def test_endpoints_serve_the_published_snapshot(status, health_url):
+    bt.publish_health()
+    status.last_check = "2026-01-01T12:00:00"
+    status.products_available = 3
+
+    # Sem publish_health(), as respostas continuam as do snapshot anterior
+    assert requests.get(f"{health_url}/ready", timeout=5).status_code == 503
+    assert requests.get(f"{health_url}/health", timeout=5).json()["products_available"] == 0
+
+    bt.publish_health()
+    health = requests.get(f"{health_url}/health", timeout=5)
+    assert requests.get(f"{health_url}/ready", timeout=5).status_code == 200
+    assert health.json()["products_available"] == 3
+    assert health.headers["Content-Type"] == "application/json"
+    assert requests.get(f"{health_url}/live", timeout=5).json() == {"alive": True}
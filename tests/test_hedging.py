@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Requisicoes duplicadas (hedging): percentil por host, segunda tentativa e limite por host."""
+
+import threading
+import time
+
+import pytest
+
+import berserk_tracker as bt
+
+URL = "http://loja.test/panini/in-stock/1"
+
+
+class Response:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def attempts(monkeypatch):
+    """Tentativas falsas: a primeira demora `slow` segundos, as seguintes respondem na hora."""
+    state = {"slow": 0.5, "responses": []}
+    lock = threading.Lock()
+
+    def timed_get(url, headers, timeout):
+        with lock:
+            index = len(state["responses"])
+            response = Response("primary" if index == 0 else "hedge")
+            state["responses"].append(response)
+        if index == 0:
+            time.sleep(state["slow"])
+        return response, {"attempt": float(index)}
+
+    monkeypatch.setattr(bt, "_timed_get", timed_get)
+    monkeypatch.setattr(bt, "HEDGE_REQUESTS", True)
+    monkeypatch.setattr(bt, "HEDGED_TOTAL", bt.Counter("berserk_hedged_requests_total", "teste", ("host", "result")))
+    latency = bt.HostLatency(window=10, percentile=95, min_samples=3)
+    for _ in range(3):
+        latency.observe(URL, 0.05)
+    monkeypatch.setattr(bt, "host_latency", latency)
+    return state
+
+
+def test_hedge_delay_needs_enough_samples():
+    latency = bt.HostLatency(window=4, percentile=50, min_samples=3)
+    latency.observe(URL, 0.1)
+    latency.observe(URL, 0.3)
+    assert latency.hedge_delay(URL) is None
+
+    for seconds in (0.2, 0.4, 0.5):
+        latency.observe(URL, seconds)
+
+    # Janela de 4 amostras: [0.3, 0.2, 0.4, 0.5]
+    assert latency.hedge_delay(URL) == 0.4
+    assert latency.hedge_delay("http://outra.test/1") is None
+
+
+def test_slow_primary_is_hedged_and_the_loser_closed(attempts):
+    timings = {}
+    started = time.monotonic()
+
+    response = bt.hedged_get(URL, {}, (1, 1), timings)
+
+    assert time.monotonic() - started < 0.4
+    assert response.name == "hedge"
+    assert timings == {"attempt": 1.0}
+    assert bt.HEDGED_TOTAL._values == {("loja.test", "sent"): 1, ("loja.test", "won"): 1}
+    # A tentativa original termina depois e e descartada
+    time.sleep(0.6)
+    assert attempts["responses"][0].closed
+
+
+def test_no_hedge_without_a_token_from_the_rate_limiter(attempts, monkeypatch):
+    attempts["slow"] = 0.2
+    monkeypatch.setattr(bt, "rate_limiter", bt.HostRateLimiter(0.001, 1))
+    bt.rate_limiter.acquire(URL)
+
+    response = bt.hedged_get(URL, {}, (1, 1), {})
+
+    assert response.name == "primary"
+    assert len(attempts["responses"]) == 1
+    assert bt.HEDGED_TOTAL._values == {("loja.test", "skipped"): 1}
+
+
+def test_fast_primary_is_not_hedged(attempts):
+    attempts["slow"] = 0.0
+
+    assert bt.hedged_get(URL, {}, (1, 1), {}).name == "primary"
+    assert len(attempts["responses"]) == 1
+    assert bt.HEDGED_TOTAL._values == {}
+
+
+def test_disabled_hedging_runs_in_the_calling_thread(attempts, monkeypatch):
+    monkeypatch.setattr(bt, "HEDGE_REQUESTS", False)
+    attempts["slow"] = 0.0
+    caller = threading.get_ident()
+    threads = []
+    timed_get = bt._timed_get
+
+    def record_thread(url, headers, timeout):
+        threads.append(threading.get_ident())
+        return timed_get(url, headers, timeout)
+
+    monkeypatch.setattr(bt, "_timed_get", record_thread)
+
+    assert bt.hedged_get(URL, {}, (1, 1), {}).name == "primary"
+    assert threads == [caller]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""MemoryMonitor: descarte dos caches em LOW_MEMORY."""
+
+import berserk_tracker as bt
+
+
+def test_evictions_count_entries_not_cycles(monkeypatch):
+    monkeypatch.setattr(bt, "LOW_MEMORY", True)
+    monitor = bt.MemoryMonitor(0)
+
+    monitor.after_cycle(0)
+    assert monitor.evictions == 0
+
+    # Entradas ja gravadas no banco podem sair da memoria; as pendentes ficam
+    bt.response_cache._entries = {
+        f"http://loja.test/{i}": bt.CacheEntry(None, None, f"hash-{i}", True, None) for i in range(3)
+    }
+    bt.response_cache._dirty = {"http://loja.test/0"}
+    monitor.after_cycle(3)
+    monitor.after_cycle(3)
+
+    assert monitor.evictions == 2
+    assert [cycle["evicted"] for cycle in monitor.cycles] == [0, 2, 0]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Metricas em /metrics: formato de exposicao texto do Prometheus."""
+
+import re
+
+import berserk_tracker as bt
+
+# Amostra: nome{label="valor",...} numero
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? -?[0-9.e+-]+(inf)?$')
+
+
+def test_counter_renders_help_type_and_escaped_labels():
+    counter = bt.Counter("berserk_test_total", "Teste", ("store", "result"))
+    counter.inc(store="pan\"ini", result="ok")
+    counter.inc(2, store="pan\"ini", result="ok")
+
+    assert counter.render() == [
+        "# HELP berserk_test_total Teste",
+        "# TYPE berserk_test_total counter",
+        'berserk_test_total{store="pan\\"ini",result="ok"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = bt.Histogram("berserk_test_seconds", "Teste", ("store",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value, store="panini")
+
+    assert histogram.samples() == [
+        'berserk_test_seconds_bucket{store="panini",le="0.1"} 1',
+        'berserk_test_seconds_bucket{store="panini",le="1.0"} 3',
+        'berserk_test_seconds_bucket{store="panini",le="+Inf"} 4',
+        'berserk_test_seconds_sum{store="panini"} 6.25',
+        'berserk_test_seconds_count{store="panini"} 4',
+    ]
+
+
+def test_gauge_reads_its_function():
+    gauge = bt.Gauge("berserk_test_value", "Teste", func=lambda: 7)
+
+    assert gauge.samples() == ["berserk_test_value 7"]
+
+
+def test_registry_renders_valid_exposition_text():
+    bt.CHECKS_TOTAL.inc(store="panini", result="available")
+    bt.FETCH_SECONDS.observe(0.2, store="panini", product="vol-1", status=200)
+
+    text = bt.metrics.render()
+
+    assert text.endswith("\n")
+    typed = set()
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert kind in ("counter", "gauge", "histogram")
+            typed.add(name)
+        elif not line.startswith("# HELP "):
+            assert SAMPLE.match(line), line
+    assert {"berserk_checks_total", "berserk_fetch_seconds", "berserk_circuit_state"} <= typed
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Modo --once: relatorio JSON no stdout e codigos de saida 0, 1 e 2."""
+
+import json
+
+import pytest
+
+import berserk_tracker as bt
+
+
+@pytest.fixture
+def once(fake_store, monkeypatch, capsys):
+    """Prepara os produtos e executa run_once; retorna (codigo de saida, relatorio)."""
+    store = fake_store()
+    monkeypatch.setattr(bt, "product_catalog", None)
+    monkeypatch.setattr(bt, "subscriber_registry", None)
+    monkeypatch.setattr(bt, "shard_ring", None)
+    monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", "")
+    monkeypatch.setattr(bt, "CYCLE_DEADLINE", 0)
+    monkeypatch.setattr(bt, "DRY_RUN", True)
+    monkeypatch.setattr(bt, "notification_dispatcher", bt.NotificationDispatcher())
+
+    def run(routes: list[str], terms=None) -> tuple[int, dict]:
+        products = [bt.Product(name=f"Berserk Vol. {i}", url=f"{store.base_url}/{route}/{i}") for i, route in enumerate(routes)]
+        monkeypatch.setattr(bt, "PRODUCTS", products)
+        code = bt.run_once(terms)
+        return code, json.loads(capsys.readouterr().out)
+
+    return run
+
+
+def test_all_products_checked_exits_zero(once):
+    code, report = once(["panini/in-stock", "panini/out-of-stock"])
+
+    assert code == 0
+    assert (report["checked"], report["available"], report["unknown"]) == (2, 1, 0)
+    assert report["dry_run"] is True
+    assert report["products"][0]["price_cents"] == 7990
+
+
+def test_product_without_result_exits_one(once):
+    code, report = once(["panini/in-stock", "missing"])
+
+    assert code == 1
+    assert report["unknown"] == 1
+    assert report["products"][1]["error"]
+
+
+def test_selection_without_match_exits_two(once):
+    code, report = once(["panini/in-stock"], terms=["vol. 99"])
+
+    assert code == 2
+    assert report["error"] == "nenhum produto selecionado"
+
+
+def test_selected_products_only(once):
+    code, report = once(["panini/in-stock", "panini/out-of-stock"], terms=["vol. 1"])
+
+    assert code == 0
+    assert [product["name"] for product in report["products"]] == ["Berserk Vol. 1"]
+
+
+def test_cycle_failure_exits_two(once, monkeypatch):
+    monkeypatch.setattr(bt, "check_products", lambda products: 1 / 0)
+
+    code, report = once(["panini/in-stock"])
+
+    assert code == 2
+    assert "division" in report["error"]
+
+
+def test_products_option_requires_once():
+    with pytest.raises(SystemExit) as error:
+        bt.parse_args(["--products", "vol. 40"])
+    assert error.value.code == 2
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""ParsePool: ida e volta pelos processos de parse e as saidas pela propria thread."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import berserk_tracker as bt
+from fake_store import load_pages
+
+CHECKER = bt.STORE_CHECKERS["panini"]
+
+
+def page(name: str) -> bytearray:
+    return bytearray(load_pages()[name].replace("__SKU__", "040").encode("utf-8"))
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(workers=1, slots=2, slot_size=1024 * 1024, timeout=10.0) -> bt.ParsePool:
+        pool = bt.ParsePool(workers, slots, slot_size, timeout)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_round_trip_matches_parse_in_thread(make_pool):
+    pool = make_pool()
+    pool.warm_up()
+
+    for name in ("panini_in_stock.html", "panini_json_ld.html"):
+        body = page(name)
+        timings = {}
+        assert pool.check_body(CHECKER, body, "utf-8", timings) == CHECKER.check_body(bytes(body), "utf-8")
+        assert "parse_queue" in timings
+
+    assert pool.status()["parsed"] == 2
+    assert pool.status()["inline"] == 0
+    assert pool.in_use() == 0
+
+
+def test_oversize_page_is_parsed_in_thread(make_pool):
+    body = page("panini_in_stock.html")
+    pool = make_pool(slot_size=len(body) - 1)
+
+    assert pool.check_body(CHECKER, body, "utf-8", {}) == CHECKER.check_body(bytes(body), "utf-8")
+    assert pool.status()["inline"] == 1
+    assert pool.status()["parsed"] == 0
+
+
+def test_full_queue_falls_back_after_timeout(make_pool):
+    pool = make_pool(slots=1, timeout=0.2)
+    taken = pool._free.get()
+    body = page("panini_in_stock.html")
+
+    started = time.monotonic()
+    result = pool.check_body(CHECKER, body, "utf-8", {})
+
+    assert 0.2 <= time.monotonic() - started < 2
+    assert result == CHECKER.check_body(bytes(body), "utf-8")
+    assert pool.status()["timeouts"] == 1
+    pool._free.put(taken)
+
+
+def test_stuck_worker_falls_back_and_holds_the_slot(make_pool, monkeypatch):
+    pool = make_pool(slots=1, timeout=0.2)
+    release = threading.Event()
+
+    def stuck(slot_name, size, encoding, store):
+        release.wait()
+        return True, None
+
+    # Executor de threads no lugar dos processos: o parse travado e simulado no proprio processo
+    pool._executor.shutdown()
+    pool._executor = ThreadPoolExecutor(1)
+    monkeypatch.setattr(bt, "_parse_in_worker", stuck)
+    body = page("panini_out_of_stock.html")
+
+    assert pool.check_body(CHECKER, body, "utf-8", {}) == CHECKER.check_body(bytes(body), "utf-8")
+    assert pool.status()["timeouts"] == 1
+    # A vaga continua com o parse abandonado ate ele terminar
+    assert pool.in_use() == 1
+
+    release.set()
+    deadline = time.monotonic() + 2
+    while pool.in_use() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.in_use() == 0
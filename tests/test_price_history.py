@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""PriceHistory: ring buffer e consulta por `since`."""
+
+import pytest
+
+import berserk_tracker as bt
+
+
+def filled(capacity: int, count: int) -> bt.PriceHistory:
+    """Serie com `count` amostras nos timestamps 0..count-1 (precos alternados para nao repetir)."""
+    history = bt.PriceHistory(capacity)
+    for t in range(count):
+        history.append(float(t), 1000 + t % 2, True)
+    return history
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 8, 11, 13, 16])
+def test_samples_since_matches_linear_scan(count):
+    history = filled(capacity=8, count=count)
+    ordered = history.samples()
+    assert [sample[0] for sample in ordered] == [float(t) for t in range(max(0, count - 8), count)]
+
+    for since in [-1.0, 0.0, 2.5, 5.0, 7.0, 10.5, 12.0, 15.0, 20.0]:
+        expected = [sample for sample in ordered if sample[0] >= since]
+        assert history.samples(since=since) == expected
+        assert history.samples(since=since, limit=2) == expected[-2:]
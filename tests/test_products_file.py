@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Arquivo de produtos: leitura JSON/YAML/CSV, diferenca entre leituras e recarga a quente."""
+
+import json
+import os
+
+import pytest
+
+import berserk_tracker as bt
+
+VOL_40 = {"name": "Berserk Vol. 40", "url": "https://panini.com.br/berserk-vol-40-amaxs040r"}
+VOL_41 = {"name": "Berserk Vol. 41", "url": "https://panini.com.br/berserk-vol-41-amaxs041r"}
+VOL_42 = {"name": "Berserk Vol. 42", "url": "https://panini.com.br/berserk-vol-42-amaxs042r", "priority": 2}
+
+
+def write(path, products):
+    """Grava o arquivo e avanca o mtime: gravacoes no mesmo instante tambem sao detectadas."""
+    path.write_text(json.dumps(products))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_invalid_rows_are_skipped(tmp_path):
+    path = tmp_path / "products.json"
+    write(path, [VOL_40, {"name": "sem url"}, {"name": "Outra loja", "url": "http://loja.test/1", "store": "x"}, "texto"])
+
+    assert list(bt.ProductCatalog(str(path)).load()) == [VOL_40["url"]]
+
+
+def test_yaml_and_csv_files(tmp_path):
+    yaml_path = tmp_path / "products.yaml"
+    yaml_path.write_text(f"products:\n  - name: {VOL_40['name']}\n    url: {VOL_40['url']}\n    priority: 2\n")
+    csv_path = tmp_path / "products.csv"
+    csv_path.write_text(f"name,url,release_date\n{VOL_41['name']},{VOL_41['url']},2026-11-20\n")
+
+    (from_yaml,) = bt.ProductCatalog(str(yaml_path)).load().values()
+    (from_csv,) = bt.ProductCatalog(str(csv_path)).load().values()
+
+    assert (from_yaml.url, from_yaml.priority) == (VOL_40["url"], 2.0)
+    assert (from_csv.url, from_csv.release_date) == (VOL_41["url"], "2026-11-20")
+
+
+def test_poll_returns_only_the_difference(tmp_path):
+    path = tmp_path / "products.json"
+    write(path, [VOL_40, VOL_41])
+    catalog = bt.ProductCatalog(str(path))
+
+    added, removed, changed = catalog.poll()
+    assert [p.url for p in added] == [VOL_40["url"], VOL_41["url"]]
+    assert catalog.poll() is None
+
+    write(path, [{**VOL_40, "priority": 3}, VOL_42])
+    added, removed, changed = catalog.poll()
+
+    assert [p.url for p in added] == [VOL_42["url"]]
+    assert [p.url for p in removed] == [VOL_41["url"]]
+    assert [(p.url, p.priority) for p in changed] == [(VOL_40["url"], 3.0)]
+    assert catalog.find("amaxs042r").url == VOL_42["url"]
+    assert catalog.find("amaxs040r").priority == 3.0
+    assert catalog.find("amaxs041r") is None
+
+
+def test_broken_file_keeps_the_last_valid_version(tmp_path):
+    path = tmp_path / "products.json"
+    write(path, [VOL_40])
+    catalog = bt.ProductCatalog(str(path))
+    catalog.poll()
+
+    path.write_text('[{"name": "Berserk')
+    assert catalog.poll() is None
+    path.unlink()
+    assert catalog.poll() is None
+
+    assert list(catalog.by_url) == [VOL_40["url"]]
+
+
+@pytest.fixture
+def reloadable(tmp_path, monkeypatch):
+    path = tmp_path / "products.json"
+    write(path, [VOL_40, VOL_41])
+    catalog = bt.ProductCatalog(str(path))
+    monkeypatch.setattr(bt, "PRODUCTS", [])
+    monkeypatch.setattr(bt, "subscriber_registry", None)
+    monkeypatch.setattr(bt, "shard_ring", None)
+    scheduler = bt.AdaptiveScheduler()
+    bt.reload_products(catalog, scheduler)
+    return path, catalog, scheduler
+
+
+def test_reload_touches_only_added_and_removed_products(reloadable):
+    path, catalog, scheduler = reloadable
+    kept_due = scheduler.entries[VOL_40["url"]].next_due = 123.0
+    bt.state_store.update_notified(added=[VOL_41["url"]], removed=())
+
+    write(path, [VOL_40, VOL_42])
+    assert bt.reload_products(catalog, scheduler)
+
+    assert [p.url for p in bt.PRODUCTS] == [VOL_40["url"], VOL_42["url"]]
+    assert set(scheduler.entries) == {VOL_40["url"], VOL_42["url"]}
+    assert scheduler.entries[VOL_40["url"]].next_due == kept_due
+    assert VOL_41["url"] not in bt.state_store.load_notified()
+    assert not bt.reload_products(catalog, scheduler)
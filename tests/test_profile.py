@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""POST /debug/profile: token com PROFILE_TOKEN, apenas localhost sem ele."""
+
+import pytest
+import requests
+
+import berserk_tracker as bt
+
+
+@pytest.fixture(autouse=True)
+def profiler(monkeypatch):
+    monkeypatch.setattr(bt, "cycle_profiler", bt.CycleProfiler())
+
+
+def test_localhost_can_arm_without_token(health_url, monkeypatch):
+    monkeypatch.setattr(bt, "PROFILE_TOKEN", "")
+
+    response = requests.post(f"{health_url}/debug/profile?cycles=2", timeout=5)
+
+    assert response.status_code == 202
+    assert bt.cycle_profiler.status()["remaining_cycles"] == 2
+
+
+def test_token_is_required_when_configured(health_url, monkeypatch):
+    monkeypatch.setattr(bt, "PROFILE_TOKEN", "segredo")
+
+    missing = requests.post(f"{health_url}/debug/profile", timeout=5)
+    wrong = requests.post(f"{health_url}/debug/profile", headers={"Authorization": "Bearer outro"}, timeout=5)
+    right = requests.post(f"{health_url}/debug/profile", headers={"Authorization": "Bearer segredo"}, timeout=5)
+
+    assert (missing.status_code, wrong.status_code, right.status_code) == (401, 401, 202)
+
+
+def test_remote_client_is_rejected_without_token(monkeypatch):
+    monkeypatch.setattr(bt, "PROFILE_TOKEN", "")
+    sent = []
+    handler = object.__new__(bt.HealthHandler)
+    handler.client_address = ("192.168.1.20", 50000)
+    handler.headers = {}
+    handler._send_json = lambda status, body: sent.append(status)
+
+    assert not handler._profile_allowed()
+    assert sent == [403]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""ResponseCache: GET condicional (304), corpo inalterado pelo hash e persistencia no banco."""
+
+import berserk_tracker as bt
+
+CHECKER = bt.STORE_CHECKERS["panini"]
+
+
+def test_second_fetch_is_a_conditional_get(fake_store):
+    store = fake_store()
+    url = f"{store.base_url}/panini/in-stock/1"
+
+    first = bt.fetch_store_availability(url, CHECKER)
+    assert bt.response_cache.conditional_headers(bt.response_cache.get(url))["If-None-Match"].startswith('"')
+    second = bt.fetch_store_availability(url, CHECKER)
+
+    assert first == second
+    assert first[0] is True
+    assert bt.response_cache.stats() == {"not_modified": 1, "unchanged": 0, "misses": 1}
+    assert store.requests == 2
+
+
+def test_unchanged_body_skips_the_parse_without_validators(fake_store, monkeypatch):
+    store = fake_store(conditional=False)
+    url = f"{store.base_url}/panini/in-stock/2"
+    bt.fetch_store_availability(url, CHECKER)
+
+    def fail(body, encoding):
+        raise AssertionError("pagina inalterada nao deve ser analisada de novo")
+
+    monkeypatch.setattr(CHECKER, "check_body", fail)
+    assert bt.fetch_store_availability(url, CHECKER)[0] is True
+    assert bt.response_cache.stats()["unchanged"] == 1
+
+
+def test_out_of_stock_is_cached_without_body_hash(fake_store):
+    store = fake_store()
+    url = f"{store.base_url}/panini/out-of-stock/3"
+
+    assert bt.fetch_store_availability(url, CHECKER) == (False, None)
+
+    entry = bt.response_cache.get(url)
+    assert entry.available is False
+    assert entry.body_hash is None
+    assert entry.etag
+
+
+def test_saved_entries_survive_a_restart(fake_store):
+    store = fake_store()
+    url = f"{store.base_url}/panini/in-stock/4"
+    bt.fetch_store_availability(url, CHECKER)
+    bt.response_cache.save()
+
+    restarted = bt.ResponseCache()
+
+    assert restarted.get(url) == bt.response_cache.get(url)
+    assert restarted.conditional_headers(None) == {}
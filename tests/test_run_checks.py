@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""run_checks com CYCLE_DEADLINE: resultados no prazo, contagem unica por verificacao e disjuntor."""
+
+import time
+
+import pytest
+
+import berserk_tracker as bt
+
+
+@pytest.fixture
+def checks_total(monkeypatch):
+    counter = bt.Counter("berserk_checks_total", "teste", ("store", "result"))
+    monkeypatch.setattr(bt, "CHECKS_TOTAL", counter)
+    return counter
+
+
+@pytest.fixture
+def slow_store(monkeypatch):
+    """Produtos com 'slow' na URL demoram 0.5s; os demais respondem na hora, disponiveis."""
+
+    def fetch(url, checker, timings, deadline=None):
+        if "slow" in url:
+            time.sleep(0.5)
+        return True, "R$ 10,00"
+
+    monkeypatch.setattr(bt, "fetch_store_availability", fetch)
+    monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", "")
+
+
+def products(fast: int, slow: int) -> list[bt.Product]:
+    return [bt.Product(name=f"Vol. {i}", url=f"http://loja.test/fast/{i}") for i in range(fast)] + [
+        bt.Product(name=f"Vol. lento {i}", url=f"http://loja.test/slow/{i}") for i in range(slow)
+    ]
+
+
+def test_deadline_marks_late_checks_and_keeps_order(slow_store, checks_total, monkeypatch):
+    monkeypatch.setattr(bt, "CYCLE_DEADLINE", 0.2)
+    monkeypatch.setattr(bt, "MAX_CONCURRENCY", 8)
+    selected = products(fast=4, slow=2)
+
+    started = time.monotonic()
+    results = bt.run_checks(selected)
+
+    assert time.monotonic() - started < 0.45
+    assert [result.product.url for result in results] == [product.url for product in selected]
+    assert [result.available for result in results[:4]] == [True] * 4
+    for result in results[4:]:
+        assert result.error == bt.DEADLINE_ERROR
+        assert result.retry_after == 0.0
+
+
+def test_late_checks_are_counted_once(slow_store, checks_total, monkeypatch):
+    monkeypatch.setattr(bt, "CYCLE_DEADLINE", 0.2)
+    monkeypatch.setattr(bt, "MAX_CONCURRENCY", 8)
+
+    bt.run_checks(products(fast=3, slow=2))
+    # As verificacoes lentas terminam em segundo plano depois do prazo
+    time.sleep(0.6)
+
+    assert checks_total._values == {("panini", "available"): 3, ("panini", "deadline"): 2}
+
+
+def test_without_deadline_everything_is_counted(slow_store, checks_total, monkeypatch):
+    monkeypatch.setattr(bt, "CYCLE_DEADLINE", 0)
+
+    results = bt.run_checks(products(fast=2, slow=1))
+
+    assert all(result.available for result in results)
+    assert checks_total._values == {("panini", "available"): 3}
+
+
+def test_batches_do_not_start_after_the_deadline(monkeypatch, checks_total):
+    calls = []
+    monkeypatch.setattr(bt, "check_batch", lambda checker, group, deadline=None: calls.append(group) or {})
+    monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", "http://loja.test/graphql")
+    selected = [bt.Product(name=f"Vol. {i}", url=f"http://loja.test/berserk-vol-{i}-amaxs0{i:02d}r") for i in range(5)]
+
+    assert bt.check_batches(selected, deadline=time.monotonic() - 1) == {}
+    assert calls == []
+
+
+def test_deadline_timeouts_do_not_trip_the_breaker(fake_store, checks_total, monkeypatch):
+    # Loja saudavel, mas mais lenta que o prazo: os timeouts encurtados pelo prazo nao sao falhas do host
+    store = fake_store(latency=0.3)
+    monkeypatch.setattr(bt, "CYCLE_DEADLINE", 0.5)
+    monkeypatch.setattr(bt, "MAX_CONCURRENCY", 8)
+    monkeypatch.setattr(bt, "PANINI_GRAPHQL_URL", "")
+    selected = [bt.Product(name=f"Vol. {i}", url=f"{store.base_url}/panini/in-stock/{i}") for i in range(24)]
+
+    results = bt.run_checks(selected)
+    # Verificacoes abandonadas no prazo terminam em segundo plano
+    time.sleep(0.5)
+
+    breaker = bt.circuit_breakers.breaker(store.base_url)
+    assert breaker.state == bt.CircuitBreaker.CLOSED
+    assert breaker.outcomes.count(False) == 0
+    late = [result for result in results if result.available is None]
+    assert late
+    assert all(result.error == bt.DEADLINE_ERROR and result.retry_after == 0.0 for result in late)
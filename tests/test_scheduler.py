@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""AdaptiveScheduler: intervalo adaptativo, prioridade, janela de lancamento e backoff de erro."""
+
+from datetime import date, timedelta
+
+import pytest
+
+import berserk_tracker as bt
+
+NOW = 1_000_000.0
+
+
+@pytest.fixture(autouse=True)
+def intervals(monkeypatch):
+    monkeypatch.setattr(bt, "CHECK_INTERVAL", 1000)
+    monkeypatch.setattr(bt, "MIN_CHECK_INTERVAL", 250)
+    monkeypatch.setattr(bt, "MAX_CHECK_INTERVAL", 4000)
+    monkeypatch.setattr(bt, "ERROR_BACKOFF_BASE", 60)
+    monkeypatch.setattr(bt, "ERROR_BACKOFF_MAX", 300)
+    monkeypatch.setattr(bt, "RELEASE_WINDOW_DAYS", 7)
+    monkeypatch.setattr(bt, "SCHEDULE_JITTER", 0.0)
+
+
+def result(product, available=True, price="R$ 10,00", error=None, retry_after=None) -> bt.CheckResult:
+    return bt.CheckResult(
+        product=product, available=available, price=price, elapsed=0.0, error=error, retry_after=retry_after
+    )
+
+
+def next_delay(scheduler: bt.AdaptiveScheduler, check: bt.CheckResult) -> float:
+    scheduler.reschedule(check, now=NOW)
+    return scheduler.entries[check.product.url].next_due - NOW
+
+
+def test_unchanged_pages_slow_down_and_changes_speed_up(product):
+    scheduler = bt.AdaptiveScheduler([product])
+
+    delays = [next_delay(scheduler, result(product)) for _ in range(3)]
+    assert delays == [1000, 1250, 1562.5]
+
+    assert next_delay(scheduler, result(product, available=False, price=None)) == 781.25
+
+
+def test_interval_is_clamped(product):
+    scheduler = bt.AdaptiveScheduler([product])
+
+    for _ in range(20):
+        delay = next_delay(scheduler, result(product))
+    assert delay == 4000
+
+    for i in range(20):
+        delay = next_delay(scheduler, result(product, price=f"R$ {i},00"))
+    assert delay == 250
+
+
+def test_priority_divides_the_interval(product):
+    product.priority = 2.0
+    scheduler = bt.AdaptiveScheduler([product])
+
+    assert next_delay(scheduler, result(product)) == 500
+
+
+def test_release_window_uses_the_minimum_interval(product):
+    product.release_date = (date.today() + timedelta(days=3)).isoformat()
+    scheduler = bt.AdaptiveScheduler([product])
+    assert next_delay(scheduler, result(product)) == 250
+
+    product.release_date = (date.today() + timedelta(days=30)).isoformat()
+    assert next_delay(scheduler, result(product)) == 1250
+
+
+def test_errors_back_off_exponentially_and_reset_on_success(product):
+    scheduler = bt.AdaptiveScheduler([product])
+
+    delays = [next_delay(scheduler, result(product, available=None, price=None, error="503")) for _ in range(4)]
+    assert delays == [60, 120, 240, 300]
+
+    assert next_delay(scheduler, result(product)) == 1000
+    assert scheduler.entries[product.url].errors == 0
+
+
+def test_retry_after_skips_the_error_backoff(product):
+    scheduler = bt.AdaptiveScheduler([product])
+    deferred = result(product, available=None, price=None, error=bt.DEADLINE_ERROR, retry_after=0.0)
+
+    assert next_delay(scheduler, deferred) == 0
+    assert scheduler.entries[product.url].errors == 0
+
+
+def test_pop_due_returns_each_due_product_once_in_order():
+    products = [bt.Product(name=f"Vol. {i}", url=f"http://loja.test/{i}") for i in range(3)]
+    scheduler = bt.AdaptiveScheduler()
+    for i, product in enumerate(products):
+        scheduler.add(product, due=NOW - i)
+    scheduler.remove(products[2].url)
+
+    assert scheduler.pop_due(now=NOW) == [products[1], products[0]]
+    assert scheduler.pop_due(now=NOW) == []
+    assert scheduler.seconds_until_next(now=NOW) is None
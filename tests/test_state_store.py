@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""StateStore: historico de verificacoes e reservas de notificacao."""
+
+import time
+
+import berserk_tracker as bt
+
+URL = "http://loja.test/panini/vol-40"
+OTHER = "http://loja.test/panini/vol-41"
+
+
+def test_prune_history_keeps_recent_checks():
+    store = bt.state_store
+    now = time.time()
+    with store._lock:
+        store.conn.executemany(
+            "INSERT INTO checks (url, checked_at, available, price, latency_ms) VALUES (?, ?, 1, NULL, 1.0)",
+            [("http://loja.test/a", now - 40 * 86400), ("http://loja.test/a", now - 86400)],
+        )
+
+    store.prune_history(30)
+
+    remaining = store.conn.execute("SELECT checked_at FROM checks").fetchall()
+    assert [row[0] for row in remaining] == [now - 86400]
+
+
+def test_prune_history_disabled_with_zero_retention():
+    store = bt.state_store
+    with store._lock:
+        store.conn.execute(
+            "INSERT INTO checks (url, checked_at, available, price, latency_ms) VALUES (?, 0, 1, NULL, 1.0)",
+            ("http://loja.test/a",),
+        )
+
+    store.prune_history(0)
+
+    assert store.conn.execute("SELECT COUNT(*) FROM checks").fetchone()[0] == 1
+
+
+def test_claims_are_exclusive_until_released():
+    keys = [URL, OTHER]
+
+    assert bt.state_store.claim_notifications(keys) == set(keys)
+    assert bt.state_store.claim_notifications(keys) == set()
+
+    bt.state_store.release_claims([keys[1]])
+    assert bt.state_store.claim_notifications(keys) == {keys[1]}
+
+
+def test_notified_urls_are_not_claimed():
+    bt.state_store.update_notified(added=[URL], removed=())
+
+    assert bt.state_store.claim_notifications([URL, OTHER]) == {OTHER}
+
+
+def test_expired_claims_from_dead_workers_are_dropped(monkeypatch):
+    assert bt.state_store.claim_notifications([URL]) == {URL}
+    monkeypatch.setattr(bt.StateStore, "CLAIM_TTL", -1)
+
+    assert bt.state_store.claim_notifications([URL]) == {URL}
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Verificadores por loja: mesmo resultado em todos os backends de parse sobre o corpus gravado."""
+
+import pytest
+
+import berserk_tracker as bt
+from fake_store import load_pages
+
+# (loja, pagina do corpus, resultado esperado); o preco da Panini no HTML vem com espaco nao separavel
+CORPUS = [
+    ("panini", "panini_in_stock.html", (True, "R$\xa079,90")),
+    ("panini", "panini_json_ld.html", (True, "R$ 79,90")),
+    ("panini", "panini_out_of_stock.html", (False, None)),
+    ("amazon", "amazon_in_stock.html", (True, "R$ 79,90")),
+    ("amazon", "amazon_out_of_stock.html", (False, None)),
+]
+
+BACKENDS = [
+    pytest.param("selectolax", marks=pytest.mark.skipif(not bt.selectolax_available, reason="selectolax ausente")),
+    pytest.param("lxml", marks=pytest.mark.skipif(not bt.lxml_available, reason="lxml ausente")),
+    "html.parser",
+]
+
+
+def check(checker: bt.StoreChecker, body: bytes) -> tuple:
+    """Caminho de fetch_store_availability: marcador no stream e, sem ele, a analise da loja."""
+    detector = bt.AvailabilityDetector(checker.stream_markers)
+    detector.feed(body)
+    return (False, None) if detector.out_of_stock else checker.check_body(body, "utf-8")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("store, page, expected", CORPUS)
+def test_backends_agree_on_the_corpus(backend, store, page, expected, monkeypatch):
+    monkeypatch.setattr(bt, "parser_backend", backend)
+    body = load_pages()[page].replace("__SKU__", "040").encode("utf-8")
+
+    assert check(bt.STORE_CHECKERS[store], body) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_panini_fast_path_matches_the_dom_parse(backend, monkeypatch):
+    monkeypatch.setattr(bt, "parser_backend", backend)
+    checker = bt.STORE_CHECKERS["panini"]
+    body = load_pages()["panini_in_stock.html"].replace("__SKU__", "040").encode("utf-8")
+
+    with bt.parse_html(body, "utf-8") as doc:
+        assert checker.parse(doc) == checker.check_body(body, "utf-8")
+
+
+def test_checker_is_found_by_store_name_or_host():
+    by_host = bt.Product(name="Vol. 1", url="https://www.amazon.com.br/dp/X", store="Desconhecida")
+    by_name = bt.Product(name="Vol. 1", url="http://loja.test/1", store="Panini")
+
+    assert bt.get_store_checker(by_host) is bt.STORE_CHECKERS["amazon"]
+    assert bt.get_store_checker(by_name) is bt.STORE_CHECKERS["panini"]
+    with pytest.raises(ValueError):
+        bt.get_store_checker(bt.Product(name="Vol. 1", url="http://loja.test/1", store="outra"))
+
+
+def test_unknown_backend_falls_back_to_html_parser():
+    assert bt.resolve_parser_backend("nenhum") == "html.parser"
+    assert bt.resolve_parser_backend("html.parser") == "html.parser"
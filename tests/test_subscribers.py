@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Assinantes: chaves de notificacao e distribuicao dos avisos entre destinatarios."""
+
+import json
+
+import pytest
+
+import berserk_tracker as bt
+
+BASE = bt.Product(name="Vol. 40", url="http://loja.test/panini/vol-40")
+EXTRA = bt.Product(name="Vol. 41", url="http://loja.test/panini/vol-41")
+
+
+def test_notify_key():
+    assert bt.notify_key(None, BASE.url) == BASE.url
+    assert bt.notify_key("ana", BASE.url) == f"{BASE.url}#ana"
+
+
+def test_subscriber_keys_are_claimed_independently():
+    bt.state_store.update_notified(added=[bt.notify_key("ana", BASE.url)], removed=())
+
+    keys = [bt.notify_key(None, BASE.url), bt.notify_key("ana", BASE.url), bt.notify_key("bia", BASE.url)]
+    assert bt.state_store.claim_notifications(keys) == {BASE.url, f"{BASE.url}#bia"}
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    """Tracker com BASE na lista global; ana acompanha BASE e EXTRA, bia apenas BASE."""
+    path = tmp_path / "subscribers.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"name": "ana", "notify": "none", "products": [BASE.url, {"name": EXTRA.name, "url": EXTRA.url}]},
+                {"name": "bia", "notify": "none", "products": [BASE.url]},
+            ]
+        )
+    )
+    monkeypatch.setattr(bt, "PRODUCTS", [BASE])
+    monkeypatch.setattr(bt, "product_catalog", None)
+    monkeypatch.setattr(bt, "subscriber_registry", bt.SubscriberRegistry(str(path)))
+    monkeypatch.setattr(bt, "notification_dispatcher", bt.NotificationDispatcher())
+    monkeypatch.setattr(bt, "latest_availability", {})
+    monkeypatch.setattr(bt, "latest_prices", {})
+    monkeypatch.setattr(bt, "event_log", bt.EventLog(100, 1))
+    monkeypatch.setattr(bt, "memory_monitor", bt.MemoryMonitor(0))
+    monkeypatch.setattr(bt, "DRY_RUN", False)
+
+    jobs = []
+    submit = bt.notification_dispatcher.submit
+    monkeypatch.setattr(bt.notification_dispatcher, "submit", lambda job: (jobs.append(job), submit(job)))
+
+    scheduler = bt.AdaptiveScheduler()
+    scheduler.add(BASE)
+    bt.sync_subscribers(bt.subscriber_registry, scheduler)
+    return jobs
+
+
+def cycle(available: bool):
+    results = [bt.CheckResult(product=p, available=available, price="R$ 10,00", elapsed=0.0) for p in bt.PRODUCTS]
+    bt.run_cycle("teste", lambda: results)
+    assert bt.notification_dispatcher.flush(5)
+
+
+def recipients(jobs) -> dict:
+    return {job.subscriber: sorted(job.dedup_urls) for job in jobs}
+
+
+def test_each_url_is_scheduled_once(tracker):
+    assert [product.url for product in bt.PRODUCTS] == [BASE.url, EXTRA.url]
+    assert bt.notification_recipients(BASE.url) == [None, "ana", "bia"]
+    # Produto so de assinante nao vai para os canais globais
+    assert bt.notification_recipients(EXTRA.url) == ["ana"]
+
+
+def test_results_fan_out_once_per_recipient(tracker):
+    cycle(available=True)
+
+    assert recipients(tracker) == {
+        None: [BASE.url],
+        "ana": sorted([f"{BASE.url}#ana", f"{EXTRA.url}#ana"]),
+        "bia": [f"{BASE.url}#bia"],
+    }
+    assert bt.state_store.load_notified() == {BASE.url, f"{BASE.url}#ana", f"{EXTRA.url}#ana", f"{BASE.url}#bia"}
+
+
+def test_notified_recipients_are_not_notified_again(tracker):
+    cycle(available=True)
+    tracker.clear()
+
+    cycle(available=True)
+
+    assert tracker == []
+
+
+def test_unavailable_product_clears_every_recipient(tracker):
+    cycle(available=True)
+
+    bt.PRODUCTS[:] = [BASE]
+    cycle(available=False)
+
+    assert bt.state_store.load_notified() == {f"{EXTRA.url}#ana"}